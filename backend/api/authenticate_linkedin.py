@@ -1,6 +1,62 @@
-# This file is no longer needed.
-# LinkedIn credentials are now stored in .env file as:
-# LINKEDIN_EMAIL=your-email@example.com
-# LINKEDIN_PASSWORD=your-password
-#
-# The playwright_post.py script now authenticates directly using these credentials.
+import asyncio
+import os
+from playwright.async_api import async_playwright
+from dotenv import load_dotenv
+
+from playwright_post import LINKEDIN_FEED, linkedin_session_valid, log_in_to_linkedin
+
+load_dotenv()
+
+
+async def authenticate_linkedin(auth_file: str = "linkedin_auth.json"):
+    """
+    Log in to LinkedIn and save the session to linkedin_auth.json.
+    playwright_post.py reuses it and refreshes it with the .env credentials
+    when it expires, so this only needs to be run once (or to get past a
+    security challenge by hand).
+    """
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False)
+        context = await browser.new_context(
+            storage_state=auth_file if os.path.exists(auth_file) else None
+        )
+        page = await context.new_page()
+        
+        if await linkedin_session_valid(context):
+            print(f"✓ Saved session in {auth_file} is still valid")
+            await browser.close()
+            return
+        
+        if os.getenv("LINKEDIN_EMAIL") and os.getenv("LINKEDIN_PASSWORD"):
+            print("→ Logging in with the credentials from .env...")
+            try:
+                await log_in_to_linkedin(page)
+            except ValueError as e:
+                print(f"⚠️  {e}")
+        
+        if not await linkedin_session_valid(context):
+            print("\n⚠️  MANUAL LOGIN REQUIRED")
+            print("→ Please log in in the browser window that opened")
+            print("→ Complete any 2FA/verification if prompted")
+            if "linkedin.com" not in page.url:
+                await page.goto(LINKEDIN_FEED)
+            input("\nPress Enter after you've successfully logged in and see your feed...")
+        
+        if not await linkedin_session_valid(context):
+            print("\n❌ Not logged in. Please try again.")
+            await browser.close()
+            return
+        
+        print("\n✓ Login verified!")
+        
+        # Save the authenticated session
+        await context.storage_state(path=auth_file)
+        
+        print(f"✓ Authentication saved to {auth_file}")
+        print("\nYou can now use playwright_post.py without logging in again!")
+        
+        await browser.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(authenticate_linkedin())
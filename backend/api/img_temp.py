@@ -1,18 +1,135 @@
-from fastapi import FastAPI, File, UploadFile
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Optional
+from fastapi import FastAPI, File, Form, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import requests
+from fastapi.responses import JSONResponse, Response
+import httpx
 import uvicorn
 import uuid
 import os
 from dotenv import load_dotenv
 
+from services.admission import AdmissionController, QueueFullError
+from services.api_metrics import CONTENT_TYPE, MetricsMiddleware, api_metrics
+from services.http_client import PooledHTTPClient
+from services.image_ingest import ImageUpload, IngestError, exceeds_upload_limit
+from services.image_normalize import ImageNormalizer
+from services.image_store import ImageStore, ImageFileResponse
+from services.near_duplicates import NearDuplicateIndex, perceptual_hash
+from services.result_cache import ResultCache
+from services.shared_slots import SharedSlots
+from services.upload_pipeline import PipelineError, stage_image, call_external_agent
+
 load_dotenv()
 
+EXTERNAL_AGENT_URL = os.getenv("EXTERNAL_AGENT_URL")
+# The agent run takes tens of seconds, so it gets its own read timeout
+EXTERNAL_AGENT_TIMEOUT = float(os.getenv("EXTERNAL_AGENT_TIMEOUT", 300))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+# Public URL of this service; when set, images are served from the local
+# store instead of being uploaded to tmpfiles.org
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "")
+# SQLite file through which workers share the agent concurrency limit
+AGENT_SLOTS_PATH = os.getenv("AGENT_SLOTS_PATH", "")
+
+# Bounds concurrent agent calls; excess requests wait in a fair, bounded queue.
+# With AGENT_SLOTS_PATH set, the concurrency limit holds across all workers
+agent_limiter = AdmissionController(
+    max_concurrent=int(os.getenv("AGENT_MAX_CONCURRENCY", 8)),
+    max_queue=int(os.getenv("AGENT_MAX_QUEUE", 64)),
+    max_queued_per_user=int(os.getenv("AGENT_MAX_QUEUED_PER_USER", 16)),
+    on_admit=partial(api_metrics.observe_stage, "admission_wait"),
+    shared=(
+        SharedSlots(AGENT_SLOTS_PATH, int(os.getenv("AGENT_MAX_CONCURRENCY", 8)))
+        if AGENT_SLOTS_PATH else None
+    ),
+)
+api_metrics.watch_admission(agent_limiter)
+
+# Shared outbound HTTP client, image store, result cache, near-duplicate
+# index and normalizer, created in lifespan
+http_client: Optional[PooledHTTPClient] = None
+image_store: Optional[ImageStore] = None
+result_cache: Optional[ResultCache] = None
+near_duplicates: Optional[NearDuplicateIndex] = None
+image_normalizer: Optional[ImageNormalizer] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared clients on startup and close them on shutdown."""
+    global http_client, image_store, result_cache, near_duplicates, image_normalizer
+
+    http_client = PooledHTTPClient(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", 20)),
+        max_per_host=int(os.getenv("HTTP_MAX_PER_HOST", 20)),
+        connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", 5)),
+        read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", 30)),
+    )
+
+    result_cache = ResultCache(
+        directory=os.getenv("RESULT_CACHE_DIR", "result_cache") or None,
+        ttl=int(os.getenv("RESULT_CACHE_TTL", 7 * 24 * 3600)),
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 512)),
+        max_disk_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 ** 2)),
+    )
+    sweep_interval = float(os.getenv("CACHE_SWEEP_INTERVAL", 300))
+    eviction_tasks = [asyncio.create_task(result_cache.run_eviction(sweep_interval))]
+
+    if os.getenv("METRICS_DIR"):
+        # Workers share their metrics through this directory
+        api_metrics.registry.use_directory(os.getenv("METRICS_DIR"))
+        eviction_tasks.append(asyncio.create_task(
+            api_metrics.registry.run_flush(float(os.getenv("METRICS_FLUSH_INTERVAL", 5)))
+        ))
+
+    if os.getenv("NEAR_DUPLICATES", "true").lower() == "true":
+        near_duplicates = NearDuplicateIndex(
+            path=os.getenv("NEAR_DUPLICATE_INDEX", "near_duplicates.jsonl") or None,
+            threshold=int(os.getenv("NEAR_DUPLICATE_THRESHOLD", 6)),
+            ttl=result_cache.ttl,
+        )
+        await near_duplicates.refresh()
+        eviction_tasks.append(asyncio.create_task(near_duplicates.run_eviction(sweep_interval)))
+
+    if PUBLIC_BASE_URL:
+        image_store = ImageStore(
+            root=os.getenv("IMAGE_STORE_DIR", "image_store"),
+            secret=os.getenv("IMAGE_URL_SECRET") or None,
+            url_ttl=int(os.getenv("IMAGE_URL_TTL", 3600)),
+            max_age=int(os.getenv("IMAGE_STORE_MAX_AGE", 24 * 3600)),
+            max_bytes=int(os.getenv("IMAGE_STORE_MAX_BYTES", 2 * 1024 ** 3)),
+        )
+        eviction_tasks.append(asyncio.create_task(image_store.run_eviction(sweep_interval)))
+
+    if os.getenv("IMAGE_NORMALIZE", "true").lower() == "true":
+        image_normalizer = ImageNormalizer(
+            max_workers=int(os.getenv("IMAGE_NORMALIZE_WORKERS", 2)),
+            max_edge=int(os.getenv("IMAGE_MAX_EDGE", 2048)),
+            output_format=os.getenv("IMAGE_OUTPUT_FORMAT", "webp"),
+            quality=int(os.getenv("IMAGE_QUALITY", 85)),
+        )
+
+    yield
+
+    if image_normalizer:
+        image_normalizer.shutdown()
+    for task in eviction_tasks:
+        task.cancel()
+    api_metrics.registry.flush()
+    if agent_limiter.shared:
+        agent_limiter.shared.close()
+    await http_client.aclose()
+
+
 app = FastAPI(
     title="Image Upload API",
     description="API for uploading images to temporary storage",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -24,97 +141,137 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-ALLOWED_CONTENT_TYPES = [
-    "image/png",
-    "image/jpeg",
-    "image/jpg",
-    "image/webp"
-]
 
-EXTERNAL_AGENT_URL = os.getenv("EXTERNAL_AGENT_URL")
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Reject oversized uploads from Content-Length before the body is parsed."""
+    if request.url.path == "/api/upload-temp-image" and exceeds_upload_limit(
+        request.headers.get("content-length"), MAX_UPLOAD_BYTES
+    ):
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Image exceeds maximum size of {MAX_UPLOAD_BYTES} bytes"}
+        )
+    return await call_next(request)
+
+
+# Added last so it also times requests rejected by the middleware above
+app.add_middleware(MetricsMiddleware, metrics=api_metrics, routes=app.router.routes)
+
 
 @app.post("/api/upload-temp-image")
-async def upload_temp_image(file: UploadFile = File(...)):
+async def upload_temp_image(
+    request: Request,
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Form(None),
+    bypass_cache: bool = False
+):
     """
-    Upload image to tmpfiles.org and return session ID with URL
+    Upload image to temporary storage and process through external agent.
+    Results are cached by image content; pass bypass_cache=true to force a
+    fresh agent run. Returns 429 with Retry-After when the agent queue is full.
     """
-    # Validate content type
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
+    # Validate size and sniff the real image type from its magic bytes
+    try:
+        upload = await ImageUpload.open(file, MAX_UPLOAD_BYTES)
+    except IngestError as e:
         return JSONResponse(
-            status_code=400,
-            content={"error": "Invalid image format"}
+            status_code=e.status_code,
+            content={"error": e.message}
         )
-    
+
     # Generate session ID
     session_id = str(uuid.uuid4())
-    
+
     try:
-        # Read file bytes
-        file_bytes = await file.read()
-        
-        # Step 1: Upload to tmpfiles.org
-        files = {
-            'file': (file.filename, file_bytes, file.content_type)
-        }
-        
-        tmpfiles_response = requests.post(
-            "https://tmpfiles.org/api/v1/upload",
-            files=files
+        # Repeat uploads of the same image skip the agent pipeline
+        cache_key = result_cache.make_key(
+            await upload.digest(),
+            agent_url=EXTERNAL_AGENT_URL,
+            normalization=image_normalizer.signature if image_normalizer else None
         )
-        
-        if tmpfiles_response.status_code != 200:
+        if not bypass_cache:
+            cached = await result_cache.get(cache_key)
+            if cached is not None:
+                return JSONResponse(
+                    status_code=200,
+                    content={"status": "success", "data": cached, "cached": True}
+                )
+
+        # Recompressed, resized or slightly cropped copies of an earlier image
+        # reuse its result too
+        fingerprint = await perceptual_hash(upload) if near_duplicates else None
+        if fingerprint is not None and not bypass_cache:
+            match = await near_duplicates.find(fingerprint, EXTERNAL_AGENT_URL or "")
+            cached = await result_cache.get(match[0]) if match else None
+            if cached is not None:
+                await result_cache.set(cache_key, cached)
+                return JSONResponse(
+                    status_code=200,
+                    content={
+                        "status": "success",
+                        "data": cached,
+                        "cached": True,
+                        "near_duplicate": {"distance": match[1]}
+                    }
+                )
+
+        # Queue for the agent, fairly across users; reject early when full
+        try:
+            ticket = agent_limiter.reserve(user_id or getattr(request.client, "host", "anonymous"))
+        except QueueFullError as e:
             return JSONResponse(
-                status_code=500,
-                content={"error": "Temporary file upload failed"}
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)},
+                content={"error": "Too many uploads in progress, please retry later"}
             )
-        
-        # Parse tmpfiles.org response
-        tmpfiles_data = tmpfiles_response.json()
-        
-        # Extract the URL and convert to direct link
-        if tmpfiles_data.get("status") == "success":
-            temp_url = tmpfiles_data["data"]["url"]
-            # Convert tmpfiles.org URL to direct download URL
-            temp_url = temp_url.replace("tmpfiles.org/", "tmpfiles.org/dl/")
-        else:
-            return JSONResponse(
-                   status_code=500,
-                content={"error": "Failed to get temporary file URL"}
+
+        # Step 1: Normalize the image, then store it locally or stream it to
+        # tmpfiles.org
+        try:
+            temp_url, normalization = await stage_image(
+                http_client, upload, image_store, PUBLIC_BASE_URL, image_normalizer
             )
-        
+        except BaseException:
+            ticket.cancel()
+            raise
+
         # Step 2: POST the session ID and temporary link to the webhook
-        webhook_response = requests.post(
-            EXTERNAL_AGENT_URL,
-            json={
-                "session_id": session_id,
-                "image_url": temp_url
-            }
-        )
-        
-        if webhook_response.status_code != 200:
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "error": "Webhook request failed",
-                    "status_code": webhook_response.status_code,
-                    "response": webhook_response.text
-                }
+        async with ticket:
+            data = await call_external_agent(
+                http_client,
+                EXTERNAL_AGENT_URL,
+                session_id,
+                temp_url,
+                read_timeout=EXTERNAL_AGENT_TIMEOUT
             )
-        
-        # Parse response from webhook
-        result = webhook_response.json()
-        
+        await result_cache.set(cache_key, data)
+        if fingerprint is not None:
+            await near_duplicates.add(fingerprint, cache_key, EXTERNAL_AGENT_URL or "")
+
         # Return the expected format with status and data
         # The webhook response should contain the strategies and analytics
         return JSONResponse(
             status_code=200,
             content={
                 "status": "success",
-                "data": result.get("data", result)  # Use data field if present, otherwise use entire result
+                "data": data,
+                "cached": False,
+                "normalization": normalization
             }
         )
-            
-    except requests.exceptions.RequestException as e:
+
+    except IngestError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"error": e.message}
+        )
+    except PipelineError as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": e.message, **e.details}
+        )
+    except httpx.HTTPError as e:
         return JSONResponse(
             status_code=500,
             content={"error": f"Request failed: {str(e)}"}
@@ -126,6 +283,59 @@ async def upload_temp_image(file: UploadFile = File(...)):
         )
 
 
+@app.api_route("/api/images/{name}", methods=["GET", "HEAD"])
+async def get_image(request: Request, name: str, expires: int, sig: str):
+    """
+    Serve an image from the local store through a signed, expiring URL.
+    Supports Range requests.
+    """
+    if image_store is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Image not found"}
+        )
+
+    # Check the signature first, so unsigned requests can't probe which images exist
+    if not image_store.verify(name, expires, sig):
+        return JSONResponse(
+            status_code=403,
+            content={"error": "Invalid or expired image URL"}
+        )
+
+    found = image_store.open(name)
+    if found is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Image not found"}
+        )
+
+    path, content_type = found
+    return ImageFileResponse(path, content_type, request.headers.get("range"))
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Result cache and near-duplicate index hit/miss counters."""
+    return {
+        **result_cache.stats(),
+        "near_duplicates": near_duplicates.stats() if near_duplicates else None
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request, pipeline stage and agent queue metrics (Prometheus text format)."""
+    return Response(api_metrics.registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/admission/stats")
+async def admission_stats():
+    """Agent queue depth, in-flight calls and wait times."""
+    return agent_limiter.stats()
+
+
 if __name__ == "__main__":
+    # Run from the backend directory: python -m api.img_temp
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run("img_temp:app", host="0.0.0.0", port=port, reload=False)
+    workers = int(os.getenv("WORKERS", 1))
+    uvicorn.run("api.img_temp:app", host="0.0.0.0", port=port, workers=workers, reload=False)
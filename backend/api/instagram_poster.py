@@ -1,12 +1,52 @@
 import asyncio
+import json
+import logging
 import sys
 import os
 from pathlib import Path
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from typing import List, Optional
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
 
+# Allow running as a script from backend/api
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from services.browser_pool import BrowserPool
+from services.flow_tracing import FlowTracer
+from services.posting_flow import (
+    AnyOf, ResponseCapture, ResponseMatches, Step, TextChanges, UrlMatches, Visible,
+    capture_response, click, format_durations, run_flow
+)
+from services.resource_policy import COMMON_TRACKERS, ResourcePolicy
+from services.selector_resolver import SelectorResolver
+from services.text_input import insert_text
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+HEADLESS = os.getenv("HEADLESS", "false").lower() in ("1", "true", "yes")
+
+INSTAGRAM_HOME = "https://www.instagram.com/"
+INSTAGRAM_CONTEXT_OPTIONS = {
+    'viewport': {'width': 1366, 'height': 768},
+    'user_agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0',
+    'locale': 'en-US',
+    'timezone_id': 'America/New_York'
+}
+# Feed photos, video, fonts and logging beacons; the create dialog needs
+# none of them (the upload preview is a blob: URL, which is not routed)
+INSTAGRAM_RESOURCE_POLICY = ResourcePolicy(
+    block_types=("image", "media", "font"),
+    block_urls=COMMON_TRACKERS + [
+        r"instagram\.com/logging",
+        r"graph\.instagram\.com/logging",
+        r"connect\.facebook\.net",
+        r"facebook\.com/tr",
+    ],
+    # UI sprites and icons
+    allow_urls=[r"static\.cdninstagram\.com"]
+)
+
 
 async def login_to_instagram(page) -> None:
     instagram_username = os.getenv("INSTAGRAM_USERNAME")
@@ -65,10 +105,186 @@ async def login_to_instagram(page) -> None:
         raise ValueError("Login failed. Please check your Instagram credentials in .env file")
 
 
-async def post_to_instagram(caption_text: str, image_path: str) -> str:
-    auth_file = Path("instagram_auth.json")
-    if not auth_file.exists():
-        raise FileNotFoundError("instagram_auth.json not found. Please run authenticate_instagram.py first.")
+CREATE_BUTTON_SELECTORS = [
+    'a[href="#"]>svg[aria-label="New post"]',
+    'a[href="#"]>svg[aria-label="Create"]',
+    'svg[aria-label="New post"]',
+    'svg[aria-label="Create"]',
+    'a:has-text("Create")',
+    '[aria-label="New post"]',
+    '[aria-label="Create"]'
+]
+SELECT_COMPUTER_SELECTORS = [
+    'button:has-text("Select from computer")',
+    'button:has-text("Select From Computer")',
+    ':has-text("Select from computer")',
+    'button[type="button"]:has-text("Select")'
+]
+FILE_INPUT_SELECTORS = [
+    'input[type="file"][accept*="image"]',
+    'input[type="file"]'
+]
+NEXT_BUTTON_SELECTORS = [
+    'button:has-text("Next")',
+    'button:has-text("Crop")'
+]
+CAPTION_SELECTORS = [
+    'textarea[aria-label*="caption"]',
+    'textarea[placeholder*="caption"]',
+    'div[contenteditable="true"][aria-label*="caption"]',
+    'textarea[aria-label="Write a caption..."]'
+]
+SHARE_BUTTON_SELECTORS = [
+    'button:has-text("Share")',
+    'button:has-text("Post")'
+]
+# Creates the post; its JSON body has the new media's shortcode
+CONFIGURE_RESPONSE = r"/media/configure"
+# Title of the create-post dialog; changes on every screen (Crop, Edit, ...)
+DIALOG_TITLE_SELECTOR = 'div[role="dialog"] h1'
+SHARED_SELECTORS = [
+    ':text("Your post has been shared")',
+    ':text("Post shared")',
+    'img[alt*="checkmark"]'
+]
+
+
+async def open_instagram_home(page) -> None:
+    """Open the home feed, where the Create button lives."""
+    await page.goto(INSTAGRAM_HOME, timeout=60000, wait_until="domcontentloaded")
+
+
+def instagram_flow(caption_text: str, image_file: Path) -> List[Step]:
+    """Steps from the home feed to a shared post."""
+    caption_visible = Visible("caption_input", CAPTION_SELECTORS)
+    
+    async def upload(run):
+        await run.element.set_input_files(str(image_file.absolute()))
+    
+    async def fill_caption(run):
+        await run.element.click()
+        await insert_text(run.page, run.element, caption_text)
+    
+    async def fill_focused(run):
+        # Caption box not recognised; use whatever has focus
+        focused = await run.page.evaluate_handle("document.activeElement")
+        await insert_text(run.page, focused.as_element(), caption_text)
+    
+    return [
+        Step(
+            "create_button",
+            action=click,
+            ready=Visible("create_button", CREATE_BUTTON_SELECTORS),
+            done=Visible("post_dialog", SELECT_COMPUTER_SELECTORS + FILE_INPUT_SELECTORS, state="attached"),
+            timeout=15000,
+            done_timeout=10000,
+            error="Could not find Create button"
+        ),
+        Step(
+            "select_from_computer",
+            action=click,
+            ready=Visible("select_from_computer", SELECT_COMPUTER_SELECTORS),
+            timeout=3000,
+            optional=True
+        ),
+        Step(
+            "upload",
+            action=upload,
+            ready=Visible("file_input", FILE_INPUT_SELECTORS, state="attached"),
+            done=Visible("next_button", NEXT_BUTTON_SELECTORS),
+            timeout=5000,
+            done_timeout=30000,
+            error="Could not upload image"
+        ),
+        # Crop and filter screens; each Next changes the dialog title
+        Step(
+            "next_button",
+            action=click,
+            ready=Visible("next_button", NEXT_BUTTON_SELECTORS),
+            done=AnyOf(TextChanges(DIALOG_TITLE_SELECTOR), caption_visible),
+            timeout=3000,
+            done_timeout=10000,
+            done_optional=True,
+            optional=True,
+            repeat=3,
+            until=caption_visible
+        ),
+        Step(
+            "caption",
+            action=fill_caption,
+            ready=caption_visible,
+            fallback=fill_focused,
+            timeout=5000,
+            error="Could not enter caption"
+        ),
+        Step(
+            "share_button",
+            action=click,
+            ready=Visible("share_button", SHARE_BUTTON_SELECTORS),
+            done=AnyOf(
+                ResponseMatches(CONFIGURE_RESPONSE, method="POST"),
+                Visible("shared", SHARED_SELECTORS),
+                UrlMatches(r"instagram\.com/p/")
+            ),
+            timeout=5000,
+            done_timeout=60000,
+            done_optional=True,
+            error="Could not find Share button"
+        ),
+    ]
+
+
+def instagram_post_url_from_response(capture: ResponseCapture) -> Optional[str]:
+    """The new post's URL from the media/configure response's shortcode."""
+    if capture.body is None:
+        return None
+    try:
+        media = json.loads(capture.body).get("media") or {}
+    except (ValueError, AttributeError):
+        return None
+    code = media.get("code")
+    return f"https://www.instagram.com/p/{code}/" if code else None
+
+
+async def find_instagram_post_url(page) -> str:
+    """The new post's URL from the page URL or the first post link."""
+    post_url = page.url
+    
+    if "instagram.com" in post_url and "/p/" in post_url:
+        return post_url
+    
+    try:
+        profile_link = await page.wait_for_selector('a[href*="/p/"]', timeout=5000)
+        href = await profile_link.get_attribute('href')
+        if href:
+            return f"https://www.instagram.com{href}" if href.startswith('/') else href
+    except:
+        pass
+    
+    return page.url
+
+
+async def post_to_instagram(
+    caption_text: str,
+    image_path: str,
+    pool: Optional[BrowserPool] = None,
+    auth_file: str = "instagram_auth.json",
+    resolver: Optional[SelectorResolver] = None,
+    tracer: Optional[FlowTracer] = None
+) -> str:
+    """
+    Post an image with a caption to Instagram.
+
+    Pass a long-lived pool to reuse its browser and logged-in context;
+    without one, a browser is launched for this post only. The post runs
+    as an event-driven flow (see instagram_flow); each step's element is
+    found by a selector resolver, which remembers the selector that worked
+    last time. Page opening, every flow step and URL discovery are
+    recorded as spans by ``tracer``.
+    """
+    auth_path = Path(auth_file)
+    if not auth_path.exists():
+        raise FileNotFoundError(f"{auth_file} not found. Please run authenticate_instagram.py first.")
     
     image_file = Path(image_path)
     if not image_file.exists():
@@ -77,204 +293,40 @@ async def post_to_instagram(caption_text: str, image_path: str) -> str:
     if not image_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
         raise ValueError(f"Invalid image format: {image_file.suffix}")
     
-    async with async_playwright() as p:
-        browser = await p.firefox.launch(
-            headless=False,
-            firefox_user_prefs={
-                'dom.webdriver.enabled': False,
-                'useAutomationExtension': False
-            }
-        )
+    if pool is None:
+        async with BrowserPool(headless=HEADLESS) as pool:
+            return await post_to_instagram(caption_text, image_path, pool, auth_file, resolver, tracer)
+    
+    resolver = resolver or SelectorResolver()
+    tracer = tracer or FlowTracer()
+    
+    with tracer.trace("instagram") as trace:
+        opening = trace.span("open_page")
+        async with pool.page(
+            f"instagram:{auth_path.resolve()}",
+            "firefox",
+            storage_state=str(auth_path),
+            warm=open_instagram_home,
+            policy=INSTAGRAM_RESOURCE_POLICY,
+            **INSTAGRAM_CONTEXT_OPTIONS
+        ) as page:
+            opening.end()
+            async with tracer.recording(page.context, trace):
+                with capture_response(page, CONFIGURE_RESPONSE, "POST") as created:
+                    await run_flow(page, "instagram", instagram_flow(caption_text, image_file), resolver, trace)
+                with trace.span("post_url") as span:
+                    # Exact when the configure response was seen; otherwise
+                    # fall back to the page URL and post links
+                    post_url = None
+                    if await created.wait(5000):
+                        post_url = instagram_post_url_from_response(created)
+                    scraped = post_url is None
+                    if scraped:
+                        post_url = await find_instagram_post_url(page)
+                    span.end("fallback" if scraped else "ok")
         
-        try:
-            context = await browser.new_context(
-                storage_state="instagram_auth.json",
-                viewport={'width': 1366, 'height': 768},
-                user_agent='Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0',
-                locale='en-US',
-                timezone_id='America/New_York'
-            )
-            page = await context.new_page()
-            
-            await page.goto("https://www.instagram.com/", timeout=60000)
-            await asyncio.sleep(3)
-            
-            # Click Create button
-            print("→ Clicking Create button...", file=sys.stderr)
-            create_button_selectors = [
-                'a[href="#"]>svg[aria-label="New post"]',
-                'a[href="#"]>svg[aria-label="Create"]',
-                'svg[aria-label="New post"]',
-                'svg[aria-label="Create"]',
-                'a:has-text("Create")',
-                '[aria-label="New post"]',
-                '[aria-label="Create"]'
-            ]
-            
-            clicked = False
-            for selector in create_button_selectors:
-                try:
-                    await page.click(selector, timeout=3000)
-                    clicked = True
-                    print("→ Create button clicked", file=sys.stderr)
-                    break
-                except:
-                    continue
-            
-            if not clicked:
-                raise ValueError("Could not find Create button")
-            
-            await asyncio.sleep(2)
-            
-            # Click "Select from computer" button
-            print("→ Looking for 'Select from computer' button...", file=sys.stderr)
-            select_computer_selectors = [
-                'button:has-text("Select from computer")',
-                'button:has-text("Select From Computer")',
-                ':has-text("Select from computer")',
-                'button[type="button"]:has-text("Select")'
-            ]
-            
-            select_clicked = False
-            for selector in select_computer_selectors:
-                try:
-                    await page.click(selector, timeout=3000)
-                    select_clicked = True
-                    print("→ 'Select from computer' clicked", file=sys.stderr)
-                    break
-                except:
-                    continue
-            
-            if not select_clicked:
-                print("→ 'Select from computer' button not found, trying direct file input...", file=sys.stderr)
-            
-            await asyncio.sleep(1)
-            
-            await asyncio.sleep(1)
-            
-            # Upload image via file input
-            print("→ Uploading image...", file=sys.stderr)
-            file_input_selectors = [
-                'input[type="file"][accept*="image"]',
-                'input[type="file"]'
-            ]
-            
-            uploaded = False
-            for selector in file_input_selectors:
-                try:
-                    file_input = await page.wait_for_selector(selector, timeout=5000, state='attached')
-                    await file_input.set_input_files(str(image_file.absolute()))
-                    uploaded = True
-                    print("→ Image uploaded successfully", file=sys.stderr)
-                    break
-                except:
-                    continue
-            
-            if not uploaded:
-                raise ValueError("Could not upload image")
-            
-            await asyncio.sleep(3)
-            
-            # Click Next buttons to go through crop/filter screens
-            print("→ Navigating through editing screens...", file=sys.stderr)
-            next_button_selectors = [
-                'button:has-text("Next")',
-                'button:has-text("Crop")'
-            ]
-            
-            for i in range(3):
-                next_clicked = False
-                for selector in next_button_selectors:
-                    try:
-                        await page.click(selector, timeout=3000)
-                        next_clicked = True
-                        print(f"→ Clicked Next (step {i+1})", file=sys.stderr)
-                        await asyncio.sleep(2)
-                        break
-                    except:
-                        continue
-                
-                if not next_clicked:
-                    print(f"→ No more Next buttons (reached caption screen)", file=sys.stderr)
-                    break
-            
-            # Enter caption/description
-            print("→ Entering caption...", file=sys.stderr)
-            caption_selectors = [
-                'textarea[aria-label*="caption"]',
-                'textarea[placeholder*="caption"]',
-                'div[contenteditable="true"][aria-label*="caption"]',
-                'textarea[aria-label="Write a caption..."]'
-            ]
-            
-            caption_filled = False
-            for selector in caption_selectors:
-                try:
-                    caption_input = await page.wait_for_selector(selector, timeout=5000, state='visible')
-                    await caption_input.click()
-                    await asyncio.sleep(0.5)
-                    await caption_input.fill(caption_text)
-                    caption_filled = True
-                    print("→ Caption entered", file=sys.stderr)
-                    break
-                except:
-                    continue
-            
-            if not caption_filled:
-                print("→ Caption input not found, trying keyboard...", file=sys.stderr)
-                try:
-                    await page.keyboard.type(caption_text, delay=50)
-                    caption_filled = True
-                except:
-                    pass
-            
-            await asyncio.sleep(1)
-            
-            # Click Share button to publish
-            print("→ Publishing post...", file=sys.stderr)
-            share_button_selectors = [
-                'button:has-text("Share")',
-                'button:has-text("Post")'
-            ]
-            
-            shared = False
-            for selector in share_button_selectors:
-                try:
-                    await page.click(selector, timeout=5000)
-                    shared = True
-                    print("→ Share button clicked", file=sys.stderr)
-                    break
-                except:
-                    continue
-            
-            if not shared:
-                raise ValueError("Could not find Share button")
-            
-            print("→ Waiting for post to complete...", file=sys.stderr)
-            await asyncio.sleep(5)
-            
-            try:
-                await page.wait_for_selector('img[alt*="Photo"]', timeout=10000)
-            except:
-                pass
-            
-            post_url = page.url
-            
-            if "instagram.com" in post_url and "/p/" in post_url:
-                return post_url
-            
-            try:
-                profile_link = await page.wait_for_selector('a[href*="/p/"]', timeout=5000)
-                href = await profile_link.get_attribute('href')
-                if href:
-                    return f"https://www.instagram.com{href}" if href.startswith('/') else href
-            except:
-                pass
-            
-            return page.url
-            
-        finally:
-            await browser.close()
+        logger.info(f"Step durations (ms): {format_durations(trace.durations())}")
+        return post_url
 
 
 async def main():
@@ -286,6 +338,9 @@ async def main():
     caption_text = sys.argv[1]
     image_path = sys.argv[2]
     
+    # Step progress and timings from the flow engine
+    logging.basicConfig(level=logging.INFO, format="→ %(message)s", stream=sys.stderr)
+    
     try:
         post_url = await post_to_instagram(caption_text, image_path)
         print(post_url)
@@ -1,21 +1,419 @@
 import asyncio
+import logging
+import re
 import sys
 import os
+import time
+from functools import partial
 from pathlib import Path
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from typing import List, Optional
+from urllib.parse import unquote
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
 
+# Allow running as a script from backend/api
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from services.browser_pool import BrowserPool
+from services.flow_tracing import FlowTracer
+from services.posting_flow import (
+    AnyOf, Hidden, ResponseCapture, ResponseCaptured, ResponseMatches, Step, Visible, capture_response,
+    click, format_durations, run_flow
+)
+from services.resource_policy import COMMON_TRACKERS, ResourcePolicy
+from services.selector_resolver import SelectorResolver
+from services.text_input import insert_text
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+HEADLESS = os.getenv("HEADLESS", "false").lower() in ("1", "true", "yes")
+
+LINKEDIN_HOME = "https://www.linkedin.com/"
+LINKEDIN_FEED = "https://www.linkedin.com/feed/"
+# Returns the logged-in member; 401 once the session has expired
+SESSION_PROBE_URL = "https://www.linkedin.com/voyager/api/me"
+
+START_POST_SELECTORS = [
+    'button:has-text("Start a post")',
+    '.share-box-feed-entry__trigger',
+    'button.share-box-feed-entry__trigger',
+    '[aria-label="Start a post"]',
+    'button.artdeco-button:has-text("Start a post")',
+    '.share-box__open',
+    'button[data-test-share-box-trigger]'
+]
+COMPOSE_MODAL_SELECTORS = [
+    '.share-creation-state__editor',
+    '[role="dialog"]',
+    '.artdeco-modal'
+]
+EDITOR_SELECTORS = [
+    '.ql-editor[contenteditable="true"]',
+    '[contenteditable="true"][role="textbox"]',
+    '.share-creation-state__editor [contenteditable="true"]',
+    'div[contenteditable="true"]',
+    '[data-placeholder="What do you want to talk about?"]',
+    '.ql-editor p'
+]
+FILE_INPUT_SELECTORS = [
+    'input[type="file"][accept*="image"]',
+    'input[type="file"]',
+    '.share-creation-state__media-upload input[type="file"]'
+]
+MEDIA_BUTTON_SELECTORS = [
+    'button[aria-label*="Add a photo"]',
+    'button[aria-label*="Add media"]',
+    '.share-creation-state__footer-action-button--media',
+    'button:has-text("Media")'
+]
+POST_SUBMIT_SELECTORS = [
+    'button.share-actions__primary-action:has-text("Post")',
+    'button:has-text("Post"):not(:has-text("Start a post"))',
+    '[aria-label="Post"]',
+    '.share-actions__primary-action'
+]
+POST_LINK_SELECTORS = [
+    '.feed-shared-update-v2 a[href*="/feed/update/"]',
+    'a[href*="/posts/"][href*="activity"]',
+    '.feed-shared-actor__container-link'
+]
+# Create-post API calls (legacy and dash endpoints); the body carries the
+# new post's URN
+CREATE_POST_RESPONSE = r"/voyager/api/(contentcreation/normShares|voyagerContentcreationDashShares)"
+POST_URN_PATTERNS = [
+    re.compile(r"urn:li:activity:\d+"),
+    re.compile(r"urn:li:(?:share|ugcPost):\d+"),
+]
+# Feed images, video, fonts, ad pixels and tracking beacons; image uploads
+# are XHRs and go through
+LINKEDIN_RESOURCE_POLICY = ResourcePolicy(
+    block_types=("image", "media", "font"),
+    block_urls=COMMON_TRACKERS + [
+        r"px\.ads\.linkedin\.com",
+        r"snap\.licdn\.com",
+        r"linkedin\.com/li/track",
+        r"linkedin\.com/sensorCollect",
+        r"platform\.linkedin\.com/litms",
+    ]
+)
+
+
+async def linkedin_session_valid(context) -> bool:
+    """
+    Cheap check that a context still holds a live LinkedIn session.
+
+    Looks at the session cookies first, then asks the API who is logged
+    in; no page is loaded. Expired or revoked sessions get a 401 or a
+    redirect to the login page.
+    """
+    cookies = {cookie["name"]: cookie for cookie in await context.cookies(LINKEDIN_HOME)}
+    session, csrf = cookies.get("li_at"), cookies.get("JSESSIONID")
+    if session is None or csrf is None:
+        return False
+    if 0 < session.get("expires", -1) < time.time():
+        return False
+    
+    try:
+        response = await context.request.get(
+            SESSION_PROBE_URL,
+            headers={"csrf-token": csrf["value"].strip('"'), "x-restli-protocol-version": "2.0.0"},
+            max_redirects=0,
+            timeout=10000
+        )
+    except PlaywrightError as e:
+        logger.info(f"LinkedIn session probe failed: {e}")
+        return False
+    return response.status == 200
+
+
+async def log_in_to_linkedin(page) -> None:
+    """Log in with the .env credentials and land on the feed."""
+    linkedin_email = os.getenv("LINKEDIN_EMAIL")
+    linkedin_password = os.getenv("LINKEDIN_PASSWORD")
+    
+    if not linkedin_email or not linkedin_password:
+        raise ValueError("LinkedIn session expired and LINKEDIN_EMAIL and LINKEDIN_PASSWORD are not set in .env file")
+    
+    # Navigate to LinkedIn login
+    await page.goto("https://www.linkedin.com/login", wait_until="networkidle")
+    
+    # Check if already logged in (redirects to feed)
+    if "feed" not in page.url:
+        # Perform login
+        try:
+            # Fill email
+            await page.fill('input[name="session_key"]', linkedin_email, timeout=5000)
+            # Fill password
+            await page.fill('input[name="session_password"]', linkedin_password, timeout=5000)
+            # Click sign in button
+            await page.click('button[type="submit"]', timeout=5000)
+            
+            # Wait for the login to land somewhere
+            try:
+                await page.wait_for_url(re.compile(r"/(feed|checkpoint|challenge)"), timeout=15000)
+            except PlaywrightTimeoutError:
+                pass
+            
+            # Check if we need to handle security challenge
+            current_url = page.url
+            
+            # Check for CAPTCHA or verification
+            if "checkpoint" in current_url or "challenge" in current_url:
+                print("⚠️  LinkedIn security challenge detected. Please complete it in the browser...", file=sys.stderr)
+                # Wait for user to complete challenge and reach feed
+                try:
+                    await page.wait_for_url("**/feed/**", timeout=120000)  # 2 minutes
+                except PlaywrightTimeoutError:
+                    raise ValueError("Security challenge not completed or login failed. Please verify manually.")
+            else:
+                # Wait for navigation to feed (shorter timeout)
+                try:
+                    await page.wait_for_url("**/feed/**", timeout=15000)
+                except PlaywrightTimeoutError:
+                    # Check if we're already on feed or home page
+                    if "linkedin.com" in page.url and ("feed" in page.url or "mynetwork" in page.url or page.url.endswith("linkedin.com/")):
+                        # Navigate to feed explicitly
+                        await page.goto("https://www.linkedin.com/feed/", wait_until="networkidle")
+                    else:
+                        raise ValueError("Login failed. Please check your LinkedIn credentials in .env file.")
+                        
+        except PlaywrightTimeoutError:
+            raise ValueError("Login failed. Please check your LinkedIn credentials in .env file.")
+    
+
+
+async def open_linkedin_feed(page, auth_file: Optional[str] = None, credentials: bool = True) -> None:
+    """
+    Open the LinkedIn feed. A saved session is reused while the probe says
+    it is valid; only an expired or missing one logs in again, after which
+    the refreshed session is written to ``auth_file``. Without
+    ``credentials``, the LINKEDIN_EMAIL account is not used to log in
+    (the session belongs to another account) and an expired one fails.
+    """
+    if await linkedin_session_valid(page.context):
+        await page.goto(LINKEDIN_FEED, wait_until="domcontentloaded")
+    
+    if "/feed" not in page.url:
+        if not credentials:
+            raise ValueError(f"LinkedIn session in {auth_file} expired. Please run authenticate_linkedin.py again.")
+        logger.info("LinkedIn session missing or expired, logging in")
+        await log_in_to_linkedin(page)
+        if auth_file:
+            await page.context.storage_state(path=auth_file)
+            logger.info(f"LinkedIn session saved to {auth_file}")
+    
+    # Verify we're on the feed
+    try:
+        await page.wait_for_selector('[data-test-id="feed-container"]', timeout=10000)
+    except PlaywrightTimeoutError:
+        # Try alternative selector
+        try:
+            await page.wait_for_selector('.scaffold-finite-scroll', timeout=5000)
+        except PlaywrightTimeoutError:
+            raise ValueError("Authentication failed. Could not access LinkedIn feed.")
+
+
+def linkedin_flow(
+    post_text: str,
+    image_file: Path,
+    created: Optional[ResponseCapture] = None
+) -> List[Step]:
+    """
+    Steps from the feed to a published post.
+
+    With ``created``, the capture of the create-post response, the feed is
+    not waited for once that response has been read.
+    """
+    
+    async def enter_text(run):
+        await run.element.click()
+        await insert_text(run.page, run.element, post_text)
+    
+    async def enter_text_in_modal(run):
+        modal = await run.page.wait_for_selector('[role="dialog"]', timeout=2000)
+        await modal.click()
+        editor = await run.page.evaluate_handle("document.activeElement")
+        await insert_text(run.page, editor.as_element(), post_text)
+    
+    async def upload(run):
+        await run.element.set_input_files(str(image_file.absolute()))
+    
+    async def upload_via_media_button(run):
+        # The file input only appears after the media button is clicked
+        if not await run.resolver.click(
+            run.page, "linkedin", "media_button", MEDIA_BUTTON_SELECTORS, timeout=2000
+        ):
+            raise ValueError("Could not upload image. LinkedIn layout may have changed.")
+        file_input, _ = await run.resolver.resolve(
+            run.page, "linkedin", "file_input", FILE_INPUT_SELECTORS, timeout=2000, state='attached'
+        )
+        if file_input is None:
+            raise ValueError("Could not upload image. LinkedIn layout may have changed.")
+        await file_input.set_input_files(str(image_file.absolute()))
+    
+    return [
+        Step(
+            "start_post_button",
+            action=click,
+            ready=Visible("start_post_button", START_POST_SELECTORS),
+            done=Visible("compose_modal", COMPOSE_MODAL_SELECTORS),
+            timeout=10000,
+            done_timeout=5000,
+            error="Could not find 'Start a post' button or the post creation modal. "
+                  "LinkedIn layout may have changed."
+        ),
+        Step(
+            "editor",
+            action=enter_text,
+            ready=Visible("editor", EDITOR_SELECTORS),
+            fallback=enter_text_in_modal,
+            timeout=3000,
+            error="Could not find post text editor. LinkedIn layout may have changed."
+        ),
+        # The Post button is enabled once the image has been processed
+        Step(
+            "upload",
+            action=upload,
+            ready=Visible("file_input", FILE_INPUT_SELECTORS, state="attached"),
+            fallback=upload_via_media_button,
+            done=Visible(
+                "post_submit_enabled",
+                [f"{selector}:not([disabled])" for selector in POST_SUBMIT_SELECTORS]
+            ),
+            timeout=3000,
+            done_timeout=30000,
+            error="Could not upload image. LinkedIn layout may have changed."
+        ),
+        Step(
+            "post_submit_button",
+            action=click,
+            ready=Visible(
+                "post_submit_enabled",
+                [f"{selector}:not([disabled])" for selector in POST_SUBMIT_SELECTORS]
+            ),
+            done=AnyOf(
+                ResponseMatches(CREATE_POST_RESPONSE, method="POST"),
+                Hidden('.share-creation-state__editor'),
+                Visible("success_toast", ['.artdeco-toast-item'])
+            ),
+            timeout=3000,
+            done_timeout=15000,
+            done_optional=True,
+            error="Could not find or click 'Post' button. LinkedIn layout may have changed."
+        ),
+        # The new post shows up at the top of the feed; only needed for
+        # scraping its URL when the create-post response wasn't captured
+        Step(
+            "feed_updated",
+            ready=AnyOf(
+                Visible("post_link", POST_LINK_SELECTORS[:2], state="attached"),
+                *([ResponseCaptured(created)] if created is not None else [])
+            ),
+            timeout=5000,
+            optional=True,
+            until=ResponseCaptured(created) if created is not None else None
+        ),
+    ]
+
 
-async def post_to_linkedin(post_text: str, image_path: str) -> str:
+def linkedin_post_url_from_response(capture: ResponseCapture) -> Optional[str]:
+    """
+    The new post's URL from the create-post response: its activity URN if
+    present, else its share/ugcPost URN (both resolve under /feed/update/).
+    """
+    if capture.response is None or capture.body is None:
+        return None
+    sources = [capture.response.headers.get("x-restli-id", ""), unquote(capture.body)]
+    for pattern in POST_URN_PATTERNS:
+        for source in sources:
+            match = pattern.search(source)
+            if match:
+                return f"https://www.linkedin.com/feed/update/{match.group(0)}/"
+    return None
+
+
+async def find_linkedin_post_url(page) -> str:
+    """Scrape the new post's URL from the feed, or from the profile's activity."""
+    # Try to find the most recent post (should be ours)
+    # Look for post links in the feed
+    post_url = None
+    for selector in POST_LINK_SELECTORS:
+        try:
+            # Get all matching elements
+            elements = await page.query_selector_all(selector)
+            if elements:
+                # Get the first one (most recent)
+                href = await elements[0].get_attribute('href')
+                if href and ('activity' in href or 'feed/update' in href):
+                    # Construct full URL if relative
+                    if href.startswith('/'):
+                        post_url = f"https://www.linkedin.com{href}"
+                    else:
+                        post_url = href
+                    break
+        except Exception:
+            continue
+    
+    # If we couldn't find the post link, try navigating to profile and getting latest post
+    if not post_url:
+        try:
+            # Click on user profile to go to recent activity
+            await page.click('img.global-nav__me-photo', timeout=5000)
+            
+            # Look for "View Profile" link
+            await page.click('a:has-text("View Profile")', timeout=5000)
+            await page.wait_for_load_state('networkidle')
+            
+            # Find the most recent post/activity
+            activity_links = await page.query_selector_all('a[href*="activity"]')
+            if activity_links:
+                href = await activity_links[0].get_attribute('href')
+                if href:
+                    post_url = href if href.startswith('http') else f"https://www.linkedin.com{href}"
+        except Exception:
+            pass
+    
+    # If still no URL, use current page URL as fallback
+    if not post_url:
+        current_url = page.url
+        if 'linkedin.com' in current_url:
+            post_url = current_url
+        else:
+            # Return feed URL as last resort
+            post_url = "https://www.linkedin.com/feed/"
+    
+    return post_url
+
+
+async def post_to_linkedin(
+    post_text: str,
+    image_path: str,
+    pool: Optional[BrowserPool] = None,
+    resolver: Optional[SelectorResolver] = None,
+    auth_file: str = "linkedin_auth.json",
+    tracer: Optional[FlowTracer] = None,
+    credentials: bool = True
+) -> str:
     """
     Post to LinkedIn with text and image using credentials from .env.
     
     Args:
         post_text: The text content for the post
         image_path: Path to the image file to upload
+        pool: Long-lived browser pool; the account's context (and so its
+            login) is reused across posts. Without one, a browser is
+            launched for this post only.
+        resolver: Finds each step's element by racing its candidate
+            selectors, trying the one that worked last time first
+        auth_file: Saved LinkedIn session (see authenticate_linkedin.py).
+            It is reused while still valid and rewritten whenever the
+            credentials had to be used to log in again.
+        credentials: Whether LINKEDIN_EMAIL and LINKEDIN_PASSWORD may log
+            in. Pass False when ``auth_file`` is another account's session.
+        tracer: Records the post's spans (page opening, each flow step,
+            URL discovery) into its latency histograms
         
     Returns:
         The URL of the newly created post
@@ -29,8 +427,13 @@ async def post_to_linkedin(post_text: str, image_path: str) -> str:
     linkedin_email = os.getenv("LINKEDIN_EMAIL")
     linkedin_password = os.getenv("LINKEDIN_PASSWORD")
     
-    if not linkedin_email or not linkedin_password:
-        raise ValueError("LINKEDIN_EMAIL and LINKEDIN_PASSWORD must be set in .env file")
+    # A saved session is enough until it expires
+    if not credentials:
+        if not Path(auth_file).exists():
+            raise FileNotFoundError(f"{auth_file} not found. Please run authenticate_linkedin.py first.")
+        linkedin_email = None
+    elif not Path(auth_file).exists() and (not linkedin_email or not linkedin_password):
+        raise ValueError("LINKEDIN_EMAIL and LINKEDIN_PASSWORD must be set in .env file, or run authenticate_linkedin.py")
     
     image_file = Path(image_path)
     if not image_file.exists():
@@ -39,312 +442,43 @@ async def post_to_linkedin(post_text: str, image_path: str) -> str:
     if not image_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
         raise ValueError(f"Invalid image format: {image_file.suffix}")
     
-    async with async_playwright() as p:
-        # Launch browser
-        browser = await p.chromium.launch(headless=False)
+    if pool is None:
+        async with BrowserPool(headless=HEADLESS) as pool:
+            return await post_to_linkedin(post_text, image_path, pool, resolver, auth_file, tracer, credentials)
+    
+    resolver = resolver or SelectorResolver()
+    tracer = tracer or FlowTracer()
+    
+    with tracer.trace("linkedin") as trace:
+        opening = trace.span("open_page")
+        async with pool.page(
+            f"linkedin:{linkedin_email or Path(auth_file).resolve()}",
+            "chromium",
+            storage_state=auth_file if Path(auth_file).exists() else None,
+            warm=partial(open_linkedin_feed, auth_file=auth_file, credentials=credentials),
+            policy=LINKEDIN_RESOURCE_POLICY
+        ) as page:
+            opening.end()
+            async with tracer.recording(page.context, trace):
+                with capture_response(page, CREATE_POST_RESPONSE, "POST") as created:
+                    await run_flow(
+                        page, "linkedin", linkedin_flow(post_text, image_file, created), resolver, trace
+                    )
+                with trace.span("post_url") as span:
+                    # Exact and immediate when the create-post response was seen
+                    # (only its body may still be in flight); scraping the feed
+                    # and profile is the fallback
+                    post_url = None
+                    if created.response is not None and await created.wait(5000):
+                        post_url = linkedin_post_url_from_response(created)
+                    scraped = post_url is None
+                    if scraped:
+                        post_url = await find_linkedin_post_url(page)
+                    span.end("fallback" if scraped else "ok")
         
-        try:
-            # Create new context
-            context = await browser.new_context()
-            
-            # Open a new tab
-            page = await context.new_page()
-            
-            # Navigate to LinkedIn login
-            await page.goto("https://www.linkedin.com/login", wait_until="networkidle")
-            
-            # Check if already logged in (redirects to feed)
-            if "feed" not in page.url:
-                # Perform login
-                try:
-                    # Fill email
-                    await page.fill('input[name="session_key"]', linkedin_email, timeout=5000)
-                    # Fill password
-                    await page.fill('input[name="session_password"]', linkedin_password, timeout=5000)
-                    # Click sign in button
-                    await page.click('button[type="submit"]', timeout=5000)
-                    
-                    # Wait a bit for the page to process
-                    await asyncio.sleep(3)
-                    
-                    # Check if we need to handle security challenge
-                    current_url = page.url
-                    
-                    # Check for CAPTCHA or verification
-                    if "checkpoint" in current_url or "challenge" in current_url:
-                        print("⚠️  LinkedIn security challenge detected. Please complete it in the browser...", file=sys.stderr)
-                        # Wait for user to complete challenge and reach feed
-                        try:
-                            await page.wait_for_url("**/feed/**", timeout=120000)  # 2 minutes
-                        except PlaywrightTimeoutError:
-                            raise ValueError("Security challenge not completed or login failed. Please verify manually.")
-                    else:
-                        # Wait for navigation to feed (shorter timeout)
-                        try:
-                            await page.wait_for_url("**/feed/**", timeout=15000)
-                        except PlaywrightTimeoutError:
-                            # Check if we're already on feed or home page
-                            if "linkedin.com" in page.url and ("feed" in page.url or "mynetwork" in page.url or page.url.endswith("linkedin.com/")):
-                                # Navigate to feed explicitly
-                                await page.goto("https://www.linkedin.com/feed/", wait_until="networkidle")
-                            else:
-                                raise ValueError("Login failed. Please check your LinkedIn credentials in .env file.")
-                                
-                except PlaywrightTimeoutError:
-                    raise ValueError("Login failed. Please check your LinkedIn credentials in .env file.")
-            
-            # Verify we're on the feed
-            try:
-                await page.wait_for_selector('[data-test-id="feed-container"]', timeout=10000)
-            except PlaywrightTimeoutError:
-                # Try alternative selector
-                try:
-                    await page.wait_for_selector('.scaffold-finite-scroll', timeout=5000)
-                except PlaywrightTimeoutError:
-                    raise ValueError("Authentication failed. Could not access LinkedIn feed.")
-            
-            # Wait for page to fully load
-            await asyncio.sleep(2)
-            
-            # Click "Start a post" button - try multiple selectors
-            post_button_selectors = [
-                'button:has-text("Start a post")',
-                '.share-box-feed-entry__trigger',
-                'button.share-box-feed-entry__trigger',
-                '[aria-label="Start a post"]',
-                'button.artdeco-button:has-text("Start a post")',
-                '.share-box__open',
-                'button[data-test-share-box-trigger]'
-            ]
-            
-            clicked = False
-            for selector in post_button_selectors:
-                try:
-                    await page.wait_for_selector(selector, timeout=3000, state='visible')
-                    await page.click(selector, timeout=2000)
-                    clicked = True
-                    break
-                except PlaywrightTimeoutError:
-                    continue
-                except Exception:
-                    continue
-            
-            if not clicked:
-                raise ValueError("Could not find 'Start a post' button. LinkedIn layout may have changed.")
-            
-            # Wait for the post editor modal to appear
-            try:
-                await page.wait_for_selector('.share-creation-state__editor', timeout=5000)
-            except PlaywrightTimeoutError:
-                # Try alternative selectors
-                try:
-                    await page.wait_for_selector('[role="dialog"]', timeout=5000)
-                except PlaywrightTimeoutError:
-                    try:
-                        await page.wait_for_selector('.artdeco-modal', timeout=5000)
-                    except PlaywrightTimeoutError:
-                        raise ValueError("Post creation modal did not appear. LinkedIn layout may have changed.")
-            
-            # Wait a moment for modal to fully load
-            await asyncio.sleep(1.5)
-            
-            # Insert post text into the editor FIRST
-            editor_selectors = [
-                '.ql-editor[contenteditable="true"]',
-                '[contenteditable="true"][role="textbox"]',
-                '.share-creation-state__editor [contenteditable="true"]',
-                'div[contenteditable="true"]',
-                '[data-placeholder="What do you want to talk about?"]',
-                '.ql-editor p'
-            ]
-            
-            text_inserted = False
-            for selector in editor_selectors:
-                try:
-                    editor = await page.wait_for_selector(selector, timeout=3000, state='visible')
-                    await editor.click()
-                    await asyncio.sleep(0.5)
-                    # Try typing the text
-                    await editor.type(post_text, delay=30)
-                    text_inserted = True
-                    break
-                except PlaywrightTimeoutError:
-                    continue
-                except Exception as e:
-                    # Try next selector
-                    continue
-            
-            if not text_inserted:
-                # Last resort: try using keyboard after clicking in the modal
-                try:
-                    modal = await page.wait_for_selector('[role="dialog"]', timeout=2000)
-                    await modal.click()
-                    await page.keyboard.type(post_text, delay=30)
-                    text_inserted = True
-                except Exception:
-                    raise ValueError("Could not find post text editor. LinkedIn layout may have changed.")
-            
-            # Wait after typing text
-            await asyncio.sleep(1)
-            
-            # Now upload image - find file input and upload
-            file_input_selectors = [
-                'input[type="file"][accept*="image"]',
-                'input[type="file"]',
-                '.share-creation-state__media-upload input[type="file"]'
-            ]
-            
-            uploaded = False
-            for selector in file_input_selectors:
-                try:
-                    file_input = await page.wait_for_selector(selector, timeout=3000, state='attached')
-                    await file_input.set_input_files(str(image_file.absolute()))
-                    uploaded = True
-                    break
-                except PlaywrightTimeoutError:
-                    continue
-            
-            if not uploaded:
-                # Try clicking the media button first
-                media_button_selectors = [
-                    'button[aria-label*="Add a photo"]',
-                    'button[aria-label*="Add media"]',
-                    '.share-creation-state__footer-action-button--media',
-                    'button:has-text("Media")'
-                ]
-                
-                for selector in media_button_selectors:
-                    try:
-                        await page.click(selector, timeout=2000)
-                        await asyncio.sleep(0.5)
-                        
-                        # Try file input again after clicking media button
-                        for input_selector in file_input_selectors:
-                            try:
-                                file_input = await page.wait_for_selector(input_selector, timeout=2000, state='attached')
-                                await file_input.set_input_files(str(image_file.absolute()))
-                                uploaded = True
-                                break
-                            except PlaywrightTimeoutError:
-                                continue
-                        
-                        if uploaded:
-                            break
-                    except PlaywrightTimeoutError:
-                        continue
-            
-            if not uploaded:
-                raise ValueError("Could not upload image. LinkedIn layout may have changed.")
-            
-            # Wait for image to finish uploading and processing
-            await asyncio.sleep(3)
-            
-            # Wait a moment for any auto-save or validation
-            await asyncio.sleep(1)
-            
-            # Click the Post button
-            post_submit_selectors = [
-                'button.share-actions__primary-action:has-text("Post")',
-                'button:has-text("Post"):not(:has-text("Start a post"))',
-                '[aria-label="Post"]',
-                '.share-actions__primary-action'
-            ]
-            
-            posted = False
-            for selector in post_submit_selectors:
-                try:
-                    post_button = await page.wait_for_selector(selector, timeout=3000)
-                    # Check if button is enabled
-                    is_disabled = await post_button.get_attribute('disabled')
-                    if is_disabled is None:
-                        await post_button.click()
-                        posted = True
-                        break
-                except PlaywrightTimeoutError:
-                    continue
-            
-            if not posted:
-                raise ValueError("Could not find or click 'Post' button. LinkedIn layout may have changed.")
-            
-            # Wait for the post to be published and modal to close
-            try:
-                await page.wait_for_selector('.share-creation-state__editor', state='hidden', timeout=15000)
-            except PlaywrightTimeoutError:
-                # Modal might have different structure, continue anyway
-                pass
-            
-            # Wait for navigation or success indicator
-            await asyncio.sleep(3)
-            
-            # Look for the newly created post in the feed
-            # LinkedIn typically shows a success message or the post appears at the top
-            try:
-                # Wait for any success notification
-                await page.wait_for_selector('.artdeco-toast-item', timeout=5000)
-                await asyncio.sleep(2)
-            except PlaywrightTimeoutError:
-                # No toast notification, continue
-                pass
-            
-            # Try to find the most recent post (should be ours)
-            # Look for post links in the feed
-            post_link_selectors = [
-                '.feed-shared-update-v2 a[href*="/feed/update/"]',
-                'a[href*="/posts/"][href*="activity"]',
-                '.feed-shared-actor__container-link'
-            ]
-            
-            post_url = None
-            for selector in post_link_selectors:
-                try:
-                    # Get all matching elements
-                    elements = await page.query_selector_all(selector)
-                    if elements:
-                        # Get the first one (most recent)
-                        href = await elements[0].get_attribute('href')
-                        if href and ('activity' in href or 'feed/update' in href):
-                            # Construct full URL if relative
-                            if href.startswith('/'):
-                                post_url = f"https://www.linkedin.com{href}"
-                            else:
-                                post_url = href
-                            break
-                except Exception:
-                    continue
-            
-            # If we couldn't find the post link, try navigating to profile and getting latest post
-            if not post_url:
-                try:
-                    # Click on user profile to go to recent activity
-                    await page.click('img.global-nav__me-photo', timeout=5000)
-                    await asyncio.sleep(1)
-                    
-                    # Look for "View Profile" link
-                    await page.click('a:has-text("View Profile")', timeout=5000)
-                    await page.wait_for_load_state('networkidle')
-                    
-                    # Find the most recent post/activity
-                    activity_links = await page.query_selector_all('a[href*="activity"]')
-                    if activity_links:
-                        href = await activity_links[0].get_attribute('href')
-                        if href:
-                            post_url = href if href.startswith('http') else f"https://www.linkedin.com{href}"
-                except Exception:
-                    pass
-            
-            # If still no URL, use current page URL as fallback
-            if not post_url:
-                current_url = page.url
-                if 'linkedin.com' in current_url:
-                    post_url = current_url
-                else:
-                    # Return feed URL as last resort
-                    post_url = "https://www.linkedin.com/feed/"
-            
-            return post_url
-            
-        finally:
-            await browser.close()
+        logger.info(f"Step durations (ms): {format_durations(trace.durations())}")
+        return post_url
+
 
 
 async def main():
@@ -356,6 +490,9 @@ async def main():
     post_text = sys.argv[1]
     image_path = sys.argv[2]
     
+    # Step progress and timings from the flow engine
+    logging.basicConfig(level=logging.INFO, format="→ %(message)s", stream=sys.stderr)
+    
     try:
         post_url = await post_to_linkedin(post_text, image_path)
         print(post_url)
@@ -0,0 +1,45 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Allow running as a script from backend/api
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from services.publisher import Publisher
+
+
+async def main():
+    if len(sys.argv) not in (3, 4):
+        print("Error: Invalid arguments", file=sys.stderr)
+        print("Usage: python publish_all.py <result_json_file> <image_path> [platforms]", file=sys.stderr)
+        sys.exit(1)
+    
+    result_file = sys.argv[1]
+    image_path = sys.argv[2]
+    platforms = [p.strip() for p in sys.argv[3].split(",") if p.strip()] if len(sys.argv) == 4 else None
+    
+    logging.basicConfig(level=logging.INFO, format="→ %(message)s", stream=sys.stderr)
+    
+    try:
+        with open(result_file) as f:
+            result = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not read {result_file}: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    publisher = Publisher(headless=os.getenv("HEADLESS", "false").lower() in ("1", "true", "yes"))
+    try:
+        await publisher.start(platforms)
+        outcomes = await publisher.publish_all(result, image_path, platforms)
+    finally:
+        await publisher.close()
+    
+    print(json.dumps(outcomes, indent=2))
+    if not outcomes or any(outcome["error"] for outcome in outcomes.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1 @@
+"""Offline benchmarks for the API and the social posters."""
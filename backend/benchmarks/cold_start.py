@@ -0,0 +1,241 @@
+"""
+Cold start benchmark.
+
+Starts each app under uvicorn ``--runs`` times, every run in a fresh
+scratch directory, and measures the time from spawning the process until
+the liveness check answers and until the readiness check does. Each run
+also imports the app module alone under ``python -X importtime`` and
+records the modules with the most self import time. For the orchestrator,
+the init steps from ``/api/v1/startup`` are reported too. Run from
+backend/:
+
+    python -m benchmarks.cold_start --apps main --runs 5
+    python -m benchmarks.cold_start --json current.json --baseline baseline.json
+
+Exits non-zero when a run fails (the app did not import, or did not become
+ready within ``--timeout``). With ``--baseline``, also when an import,
+liveness or readiness p95 grew by more than ``--max-regression``; with
+``--budget``, when a readiness p95 exceeds that many seconds. Without the
+agent modules or a working Gemini key, readiness waits for the agent client
+forever; pass ``--no-warmup`` to leave it out.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from benchmarks.stats import percentile
+from benchmarks.upload_benchmark import APPS, BACKEND_DIR, AppServer
+
+# Liveness and readiness paths per app
+PROBES = {
+    "img_temp": ("/metrics", "/metrics"),
+    "main": ("/api/v1/health", "/api/v1/ready"),
+}
+
+TIMINGS = ("import_ms", "live_ms", "ready_ms")
+
+
+def import_profile(app: str, env: Dict[str, str], workdir: str) -> Dict[str, Any]:
+    """Import the app module alone; its total import time and every module's self time."""
+    module = APPS[app].split(":")[0]
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir,
+        env={**env, "PYTHONPATH": str(BACKEND_DIR)},
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    total_us = 0
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not name[1:].startswith(" "):
+            # Top-level import; nested ones are part of its cumulative time
+            total_us += int(cumulative_us)
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000})
+    return {"total_ms": total_us / 1000, "modules": modules}
+
+
+async def measure_start(app: str, env: Dict[str, str], workdir: str, timeout: float) -> Dict[str, Any]:
+    """One cold start: ms from spawn until live and until ready, plus the app's own profile."""
+    live_path, ready_path = PROBES[app]
+    server = AppServer(app, env, workdir)
+    started = time.perf_counter()
+    server.spawn()
+    try:
+        await server.wait_for(live_path, timeout, interval=0.01)
+        live_ms = (time.perf_counter() - started) * 1000
+        await server.wait_for(ready_path, timeout, interval=0.01)
+        ready_ms = (time.perf_counter() - started) * 1000
+
+        profile = None
+        if app == "main":
+            async with httpx.AsyncClient() as client:
+                profile = (await client.get(f"{server.base_url}/api/v1/startup")).json()
+    finally:
+        server.stop()
+    return {"live_ms": live_ms, "ready_ms": ready_ms, "profile": profile}
+
+
+def summarize(samples: List[Dict[str, Any]], failures: int, top: int) -> Dict[str, Any]:
+    """p50/p95/max of each timing, p50 of each init step, and the slowest imports on average."""
+    report: Dict[str, Any] = {"runs": len(samples) + failures, "failures": failures}
+    for timing in TIMINGS:
+        values = [sample[timing] for sample in samples]
+        report[timing] = {
+            "p50": round(percentile(values, 50), 1),
+            "p95": round(percentile(values, 95), 1),
+            "max": round(max(values, default=0.0), 1),
+        }
+
+    steps: Dict[str, List[float]] = {}
+    for sample in samples:
+        for step in (sample["profile"] or {}).get("steps", []):
+            steps.setdefault(step["name"], []).append(step["duration_ms"])
+    report["steps"] = {name: round(percentile(values, 50), 1) for name, values in steps.items()}
+
+    self_ms: Dict[str, float] = {}
+    for sample in samples:
+        for module in sample["modules"]:
+            self_ms[module["module"]] = self_ms.get(module["module"], 0.0) + module["self_ms"]
+    slowest = sorted(self_ms.items(), key=lambda item: item[1], reverse=True)[:top]
+    report["slowest_imports"] = [
+        {"module": name, "self_ms": round(total / max(len(samples), 1), 1)} for name, total in slowest
+    ]
+    return report
+
+
+async def benchmark_app(app: str, runs: int, env: Dict[str, str], timeout: float, top: int) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    failures = 0
+    for run in range(runs):
+        with tempfile.TemporaryDirectory(prefix="cold-start-") as workdir:
+            try:
+                imported = await asyncio.to_thread(import_profile, app, env, workdir)
+            except RuntimeError as e:
+                print(f"{app} run {run}: {e}", file=sys.stderr)
+                failures += 1
+                continue
+        with tempfile.TemporaryDirectory(prefix="cold-start-") as workdir:
+            try:
+                sample = await measure_start(app, env, workdir, timeout)
+            except RuntimeError as e:
+                print(f"{app} run {run}: {e}", file=sys.stderr)
+                failures += 1
+                continue
+        sample.update(import_ms=imported["total_ms"], modules=imported["modules"])
+        samples.append(sample)
+        print(
+            f"{app} run {run}: import {sample['import_ms']:.0f} ms, live {sample['live_ms']:.0f} ms, "
+            f"ready {sample['ready_ms']:.0f} ms",
+            file=sys.stderr
+        )
+    return summarize(samples, failures, top)
+
+
+def print_report(report: Dict[str, Dict[str, Any]]) -> None:
+    for app, result in report.items():
+        print(f"\n{app}: {result['runs']} runs, {result['failures']} failed")
+        print(f"  {'timing':<28}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for timing in TIMINGS:
+            stats = result[timing]
+            print(f"  {timing:<28}{stats['p50']:>10.0f}{stats['p95']:>10.0f}{stats['max']:>10.0f}")
+        if result["steps"]:
+            print(f"  {'init step':<28}{'p50 ms':>10}")
+            for name, value in result["steps"].items():
+                print(f"  {name:<28}{value:>10.0f}")
+        if result["slowest_imports"]:
+            print(f"  {'module (self time)':<48}{'ms':>10}")
+            for module in result["slowest_imports"]:
+                print(f"  {module['module']:<48}{module['self_ms']:>10.1f}")
+
+
+def regressions(
+    report: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    max_regression: float,
+    budget: Optional[float] = None
+) -> List[str]:
+    """Timings whose p95 grew by more than max_regression, and readiness over the budget (seconds)."""
+    found = []
+    for app, result in report.items():
+        for timing in TIMINGS:
+            before = baseline.get(app, {}).get(timing)
+            after = result[timing]["p95"]
+            if before and before["p95"] > 0 and after > before["p95"] * (1 + max_regression):
+                found.append(f"{app}/{timing}: p95 {before['p95']:.0f} -> {after:.0f} ms")
+        if budget is not None and result["ready_ms"]["p95"] > budget * 1000:
+            found.append(f"{app}/ready_ms: p95 {result['ready_ms']['p95']:.0f} ms over the {budget:g} s budget")
+    return found
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", default="main", help="Comma-separated: " + ", ".join(APPS))
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per app")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for readiness")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to report")
+    parser.add_argument("--no-warmup", action="store_true", help="Set STARTUP_WARMUP=false (agent created on first job)")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Report to compare p95s against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 growth (fraction)")
+    parser.add_argument("--budget", type=float, help="Maximum readiness p95 (seconds)")
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    apps = [a.strip() for a in args.apps.split(",") if a.strip()]
+    unknown = [a for a in apps if a not in APPS]
+    if unknown:
+        print(f"Error: Unknown apps: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    env = {
+        **os.environ,
+        # Settings requires a key; nothing calls Gemini during startup
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "benchmark"),
+    }
+    if args.no_warmup:
+        env["STARTUP_WARMUP"] = "false"
+
+    report = {
+        app: await benchmark_app(app, args.runs, env, args.timeout, args.top)
+        for app in apps
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline or args.budget is not None:
+        baseline = {}
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        found = regressions(report, baseline, args.max_regression, args.budget)
+        if found:
+            print("\nRegressions:\n  " + "\n  ".join(found))
+            return 1
+    failed = [app for app, result in report.items() if result["failures"]]
+    if failed:
+        print(f"\nFailed runs: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
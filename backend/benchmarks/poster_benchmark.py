@@ -0,0 +1,250 @@
+"""
+Offline poster benchmark.
+
+Drives ``post_to_instagram`` and ``post_to_linkedin`` against the local
+stand-in pages (see poster_standin.py) through a real BrowserPool, and
+reports p50/p95 per flow step and end to end. Run from backend/:
+
+    python -m benchmarks.poster_benchmark --runs 20 --variant mixed
+    python -m benchmarks.poster_benchmark --json current.json --baseline baseline.json
+
+With ``--baseline``, exits non-zero when any p95 is more than
+``--max-regression`` slower than in the baseline report.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import httpx
+from PIL import Image
+from playwright.async_api import BrowserContext, Route
+
+from api.instagram_poster import INSTAGRAM_RESOURCE_POLICY, post_to_instagram
+from api.playwright_post import LINKEDIN_RESOURCE_POLICY, post_to_linkedin
+from benchmarks.poster_standin import DEFAULT_DELAYS, StandInServer
+from benchmarks.stats import percentile
+from services.browser_pool import BrowserPool
+from services.flow_tracing import FlowTracer
+from services.selector_resolver import SelectorResolver
+
+HOSTS = {
+    "www.instagram.com": ("instagram", INSTAGRAM_RESOURCE_POLICY),
+    "www.linkedin.com": ("linkedin", LINKEDIN_RESOURCE_POLICY),
+}
+
+
+class StandInRouter:
+    """Answers a context's Instagram and LinkedIn requests from the stand-in."""
+
+    def __init__(self, standin: StandInServer, block_resources: bool = True):
+        self.block_resources = block_resources
+        self.client = httpx.AsyncClient(base_url=standin.base_url, follow_redirects=False)
+
+    async def install(self, account: str, context: BrowserContext) -> None:
+        # Registered after the resource policy, so it sees requests first
+        for host in HOSTS:
+            await context.route(f"https://{host}/**", self.handle)
+
+    async def handle(self, route: Route) -> None:
+        request = route.request
+        url = urlsplit(request.url)
+        platform, policy = HOSTS[url.hostname]
+        if self.block_resources and policy.verdict(request.url, request.resource_type):
+            # Let the platform's resource policy abort it, as in production
+            await route.fallback()
+            return
+
+        path = f"/{platform}{url.path}" + (f"?{url.query}" if url.query else "")
+        try:
+            response = await self.client.request(
+                request.method,
+                path,
+                content=request.post_data_buffer,
+                headers={"content-type": request.headers.get("content-type", "")}
+            )
+        except httpx.HTTPError:
+            await route.abort()
+            return
+        headers = {
+            name: response.headers[name]
+            for name in ("content-type", "location")
+            if name in response.headers
+        }
+        await route.fulfill(status=response.status_code, headers=headers, body=response.content)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def summarize(traces: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per platform: per span name and end to end, count, p50 and p95 in ms."""
+    report: Dict[str, Dict[str, Any]] = {}
+    for platform in sorted({trace["platform"] for trace in traces}):
+        platform_traces = [trace for trace in traces if trace["platform"] == platform]
+        steps: Dict[str, List[float]] = {}
+        for trace in platform_traces:
+            for span in trace["spans"]:
+                steps.setdefault(span["name"], []).append(span["duration_ms"])
+        steps["end_to_end"] = [trace["duration_ms"] for trace in platform_traces]
+        report[platform] = {
+            "runs": len(platform_traces),
+            "failures": sum(trace["outcome"] != "ok" for trace in platform_traces),
+            "steps": {
+                name: {
+                    "count": len(values),
+                    "p50_ms": round(percentile(values, 50), 1),
+                    "p95_ms": round(percentile(values, 95), 1),
+                }
+                for name, values in steps.items()
+            },
+        }
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, Any]]) -> None:
+    for platform, result in report.items():
+        print(f"\n{platform}: {result['runs']} runs, {result['failures']} failed")
+        print(f"  {'step':<24}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, stats in result["steps"].items():
+            print(f"  {name:<24}{stats['count']:>5}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}")
+
+
+def regressions(
+    report: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    max_regression: float
+) -> List[str]:
+    """Steps whose p95 grew by more than max_regression (a fraction) over the baseline."""
+    found = []
+    for platform, result in report.items():
+        for name, stats in result["steps"].items():
+            before = baseline.get(platform, {}).get("steps", {}).get(name)
+            if before and before["p95_ms"] > 0 and stats["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+                found.append(
+                    f"{platform}/{name}: p95 {before['p95_ms']:.0f} -> {stats['p95_ms']:.0f} ms"
+                )
+    return found
+
+
+async def run_benchmark(
+    platforms: Sequence[str],
+    runs: int,
+    standin: StandInServer,
+    workdir: str,
+    headless: bool = True,
+    standby: bool = False,
+    block_resources: bool = True,
+    fresh_selectors: bool = False
+) -> List[Dict[str, Any]]:
+    """Post ``runs`` times per platform; returns the traces, oldest first."""
+    image_path = os.path.join(workdir, "benchmark.jpg")
+    Image.new("RGB", (1080, 1080), (120, 140, 160)).save(image_path, "JPEG")
+    instagram_auth = os.path.join(workdir, "instagram_auth.json")
+    with open(instagram_auth, "w") as f:
+        json.dump({"cookies": [], "origins": []}, f)
+    linkedin_auth = os.path.join(workdir, "linkedin_auth.json")
+    # Typed into the stand-in login form only
+    os.environ.setdefault("LINKEDIN_EMAIL", "benchmark@example.com")
+    os.environ.setdefault("LINKEDIN_PASSWORD", "benchmark")
+
+    tracer = FlowTracer(keep=runs * len(platforms))
+    resolver = SelectorResolver(None)
+    router = StandInRouter(standin, block_resources)
+    try:
+        async with BrowserPool(
+            headless=headless,
+            standby=standby,
+            block_resources=block_resources,
+            on_context=router.install
+        ) as pool:
+            for run in range(runs):
+                if fresh_selectors:
+                    resolver = SelectorResolver(None)
+                for platform in platforms:
+                    try:
+                        if platform == "instagram":
+                            await post_to_instagram(
+                                f"Benchmark post {run} #bench", image_path, pool,
+                                instagram_auth, resolver, tracer
+                            )
+                        else:
+                            await post_to_linkedin(
+                                f"Benchmark post {run}\n\n#bench", image_path, pool,
+                                resolver, linkedin_auth, tracer
+                            )
+                    except Exception as e:
+                        print(f"{platform} run {run} failed: {type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        await router.aclose()
+    return list(reversed(tracer.recent()))
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Posts per platform")
+    parser.add_argument("--platforms", default="instagram,linkedin", help="Comma-separated platforms")
+    parser.add_argument("--variant", default="a", choices=["a", "b", "mixed"], help="Stand-in layout variant")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stand-in response latency (seconds)")
+    for name, default in DEFAULT_DELAYS.items():
+        parser.add_argument(f"--{name}-delay", type=float, default=default, help=f"Stand-in {name} delay (ms)")
+    parser.add_argument("--headed", action="store_true", help="Show the browsers")
+    parser.add_argument("--standby", action="store_true", help="Keep a warmed standby page per account")
+    parser.add_argument("--no-block", action="store_true", help="Disable the resource policies")
+    parser.add_argument("--fresh-selectors", action="store_true", help="Forget selector winners between runs")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Report to compare p95s against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 growth (fraction)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log poster steps")
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="→ %(message)s",
+        stream=sys.stderr
+    )
+    platforms = [p.strip() for p in args.platforms.split(",") if p.strip()]
+    unknown = [p for p in platforms if p not in ("instagram", "linkedin")]
+    if unknown:
+        print(f"Error: Unknown platforms: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    delays = {name: getattr(args, f"{name}_delay") for name in DEFAULT_DELAYS}
+    with tempfile.TemporaryDirectory(prefix="poster-bench-") as workdir:
+        with StandInServer(delays, args.variant, args.latency) as standin:
+            traces = await run_benchmark(
+                platforms,
+                args.runs,
+                standin,
+                workdir,
+                headless=not args.headed,
+                standby=args.standby,
+                block_resources=not args.no_block,
+                fresh_selectors=args.fresh_selectors
+            )
+
+    report = summarize(traces)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.max_regression)
+        if found:
+            print("\nRegressions:\n  " + "\n  ".join(found))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
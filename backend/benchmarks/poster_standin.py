@@ -0,0 +1,296 @@
+"""
+Local stand-ins for the Instagram and LinkedIn compose flows.
+
+Minimal pages built from the selectors the posters use (Create, Select from
+computer, Next, the caption box, Share; Start a post, ``.ql-editor``, the
+media button, Post), with client-side render delays and layout variants,
+and fake create-post APIs that answer like the real ones. The benchmark
+routes the posters' requests for www.instagram.com and www.linkedin.com
+here.
+"""
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from PIL import Image
+
+# Client-side delays in milliseconds, each jittered by +-50% per use
+DEFAULT_DELAYS = {
+    "render": 300,      # feed renders its Create / Start a post button
+    "dialog": 200,      # compose dialog opens
+    "upload": 800,      # image processed after the file is chosen
+    "step": 150,        # Crop -> Edit -> caption screens
+    "publish": 400,     # success toast after the create-post response
+}
+
+# Layout variants: "a" matches the posters' first-choice selectors, "b"
+# only later candidates (and, on LinkedIn, needs the media-button fallback)
+VARIANTS = ("a", "b")
+
+COMMON_SCRIPT = """
+const later = (ms, fn) => setTimeout(fn, ms * (0.5 + Math.random()));
+const el = (html) => {
+    const t = document.createElement('template');
+    t.innerHTML = html.trim();
+    return t.content.firstChild;
+};
+// Rich editors handle pasted text themselves
+const pasteAsText = (editor) => editor.addEventListener('paste', (e) => {
+    e.preventDefault();
+    document.execCommand('insertText', false, e.clipboardData.getData('text/plain'));
+});
+"""
+
+INSTAGRAM_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Instagram</title>
+<style>svg, [aria-label="Create"] { display: inline-block; width: 24px; height: 24px; background: #000; }
+[role="dialog"] { border: 1px solid #ccc; padding: 8px; }</style></head>
+<body>
+<nav id="nav"></nav>
+<main><img src="/static/feed-1.jpg" alt="post"><img src="/static/feed-2.jpg" alt="post"></main>
+<script>
+const DELAYS = %(delays)s, VARIANT = %(variant)s;
+%(common)s
+later(DELAYS.render, () => {
+    const create = VARIANT === 'a'
+        ? el('<a href="#"><svg aria-label="New post" viewBox="0 0 24 24"></svg></a>')
+        : el('<div role="button" tabindex="0" aria-label="Create"></div>');
+    create.addEventListener('click', (e) => { e.preventDefault(); later(DELAYS.dialog, openDialog); });
+    document.getElementById('nav').appendChild(create);
+});
+
+function openDialog() {
+    const dialog = el('<div role="dialog"><h1>Create new post</h1>'
+        + '<button type="button">Select from computer</button>'
+        + '<input type="file" accept="image/jpeg,image/png,image/webp" style="display:none"></div>');
+    document.body.appendChild(dialog);
+    const title = dialog.querySelector('h1');
+    const screens = ['Crop', 'Edit', 'Create new post'];
+    let index = 0, next = null;
+
+    const show = () => {
+        title.textContent = screens[index];
+        if (index < screens.length - 1) {
+            if (!next) {
+                next = el('<button type="button">Next</button>');
+                next.addEventListener('click', () => { index += 1; later(DELAYS.step, show); });
+                dialog.appendChild(next);
+            }
+            return;
+        }
+        next.remove();
+        const caption = VARIANT === 'a'
+            ? el('<div contenteditable="true" role="textbox" aria-label="Write a caption..."></div>')
+            : el('<textarea aria-label="Write a caption..."></textarea>');
+        if (VARIANT === 'a') pasteAsText(caption);
+        const share = el('<button type="button">Share</button>');
+        share.addEventListener('click', async () => {
+            const response = await fetch('/api/v1/media/configure/', {
+                method: 'POST',
+                body: new URLSearchParams({ caption: caption.value || caption.innerText })
+            });
+            await response.json();
+            later(DELAYS.publish, () => dialog.replaceChildren(el('<div>Your post has been shared</div>')));
+        });
+        dialog.append(caption, share);
+    };
+    dialog.querySelector('input').addEventListener('change', () => later(DELAYS.upload, show));
+}
+</script></body></html>
+"""
+
+LINKEDIN_LOGIN_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>LinkedIn Login</title></head>
+<body><form method="post" action="/login">
+<input name="session_key" type="text"><input name="session_password" type="password">
+<button type="submit">Sign in</button>
+</form></body></html>
+"""
+
+LINKEDIN_FEED_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Feed | LinkedIn</title>
+<style>[role="dialog"] { border: 1px solid #ccc; padding: 8px; }
+.ql-editor { min-height: 40px; border: 1px solid #eee; }</style></head>
+<body>
+<div id="share-box"></div>
+<div data-test-id="feed-container" class="scaffold-finite-scroll" id="feed">
+<div class="feed-shared-update-v2"><img src="/static/feed-1.jpg" alt="post">
+<a href="/feed/update/urn:li:activity:1000/">Earlier post</a></div>
+</div>
+<script>
+const DELAYS = %(delays)s, VARIANT = %(variant)s;
+%(common)s
+later(DELAYS.render, () => {
+    const start = VARIANT === 'a'
+        ? el('<button class="share-box-feed-entry__trigger">Start a post</button>')
+        : el('<button aria-label="Start a post" data-test-share-box-trigger>Create</button>');
+    start.addEventListener('click', () => later(DELAYS.dialog, openModal));
+    document.getElementById('share-box').appendChild(start);
+});
+
+function openModal() {
+    const modal = el('<div role="dialog" class="artdeco-modal">'
+        + '<div class="share-creation-state__editor">'
+        + '<div class="ql-editor" contenteditable="true" role="textbox" '
+        + 'data-placeholder="What do you want to talk about?"></div></div>'
+        + '<button aria-label="Add media" class="share-creation-state__footer-action-button--media">Media</button>'
+        + '<button class="share-actions__primary-action" disabled>Post</button></div>');
+    document.body.appendChild(modal);
+    const editor = modal.querySelector('.ql-editor');
+    const post = modal.querySelector('.share-actions__primary-action');
+    pasteAsText(editor);
+
+    const fileInput = () => {
+        const input = el('<input type="file" accept="image/*" style="display:none">');
+        input.addEventListener('change', () => later(DELAYS.upload, () => { post.disabled = false; }));
+        modal.appendChild(input);
+    };
+    // Variant b only attaches the file input once Media is clicked
+    if (VARIANT === 'a') fileInput();
+    else modal.querySelector('[aria-label="Add media"]').addEventListener('click', fileInput, { once: true });
+
+    post.addEventListener('click', async () => {
+        const response = await fetch('/voyager/api/contentcreation/normShares', {
+            method: 'POST',
+            headers: { 'content-type': 'application/json' },
+            body: JSON.stringify({ commentary: editor.innerText })
+        });
+        const urn = (await response.json()).data.status.urn;
+        modal.remove();
+        later(DELAYS.publish, () => {
+            document.body.appendChild(el('<div class="artdeco-toast-item">Post successful.</div>'));
+            document.getElementById('feed').prepend(el('<div class="feed-shared-update-v2">'
+                + `<a href="/feed/update/${urn}/">Your post</a></div>`));
+        });
+    });
+}
+</script></body></html>
+"""
+
+
+def _pixel() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 200, 200)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# Served for every static asset (feed photos and the like)
+PIXEL = _pixel()
+
+
+class StandInServer:
+    """
+    Serves the stand-in pages on localhost from a background thread.
+
+    Requests are answered after ``latency`` seconds (jittered +-50%), like
+    a network round trip. ``variant`` is "a", "b" or "mixed" (a random
+    layout per page load).
+    """
+
+    def __init__(
+        self,
+        delays: Optional[Dict[str, float]] = None,
+        variant: str = "a",
+        latency: float = 0.02,
+        port: int = 0
+    ):
+        if variant not in VARIANTS + ("mixed",):
+            raise ValueError(f"Unknown layout variant: {variant}")
+        self.delays = {**DEFAULT_DELAYS, **(delays or {})}
+        self.variant = variant
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def page(self, template: str) -> bytes:
+        variant = random.choice(VARIANTS) if self.variant == "mixed" else self.variant
+        return (template % {
+            "delays": json.dumps(self.delays),
+            "variant": json.dumps(variant),
+            "common": COMMON_SCRIPT,
+        }).encode()
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b"", content_type: str = "text/html", **headers):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name.replace("_", "-"), value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _route(self, method: str) -> None:
+                standin.requests += 1
+                time.sleep(standin.latency * (0.5 + random.random()))
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                # Paths are prefixed with the platform by the benchmark's route
+                platform, _, rest = self.path.lstrip("/").partition("/")
+                path = "/" + rest.split("?", 1)[0]
+                if path.startswith("/static/"):
+                    return self._send(200, PIXEL, "image/png")
+
+                if platform == "instagram":
+                    if method == "GET" and path == "/":
+                        return self._send(200, standin.page(INSTAGRAM_PAGE))
+                    if method == "POST" and path.startswith("/api/v1/media/configure"):
+                        code = "".join(random.choices("ABCDEFGHabcdefgh0123456789_-", k=11))
+                        body = {"media": {"pk": str(random.getrandbits(60)), "code": code}, "status": "ok"}
+                        return self._send(200, json.dumps(body).encode(), "application/json")
+
+                if platform == "linkedin":
+                    if path == "/login":
+                        if method == "POST":
+                            return self._send(303, Location="/feed/")
+                        return self._send(200, LINKEDIN_LOGIN_PAGE.encode())
+                    if method == "GET" and path == "/feed/":
+                        return self._send(200, standin.page(LINKEDIN_FEED_PAGE))
+                    if method == "POST" and path.startswith("/voyager/api/contentcreation/normShares"):
+                        urn = f"urn:li:activity:{random.getrandbits(60)}"
+                        body = {"data": {"status": {"urn": urn}}}
+                        return self._send(200, json.dumps(body).encode(), "application/json")
+
+                self._send(404, b"Not found", "text/plain")
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+        return Handler
@@ -0,0 +1,13 @@
+"""Summary statistics shared by the benchmarks."""
+from typing import Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linearly interpolated percentile, q in [0, 100]."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
@@ -0,0 +1,373 @@
+"""
+Load test of the image upload path.
+
+Starts the local tmpfiles.org and agent webhook stubs (upload_stubs.py),
+runs each app under uvicorn pointed at them, and posts images to
+``/api/upload-temp-image`` at several concurrency levels and image sizes.
+Reports req/s, p50/p95/p99 latency and the server's peak RSS per level.
+Run from backend/:
+
+    python -m benchmarks.upload_benchmark --apps img_temp --concurrency 1,8,32
+    python -m benchmarks.upload_benchmark --json current.json --baseline baseline.json
+
+Uploads bypass the result cache unless ``--cache`` is given. With
+``--baseline``, exits non-zero when a level's p95 grew, or its req/s
+dropped, by more than ``--max-regression``. Also exits non-zero when an
+app fails to start.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from PIL import Image
+
+from benchmarks.stats import percentile
+from benchmarks.upload_stubs import AgentWebhookStub, TmpfilesStub
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+APPS = {
+    "img_temp": "api.img_temp:app",
+    "main": "main:app",
+}
+
+
+def make_image(edge: int) -> bytes:
+    """A photo-like JPEG (noise over a gradient) of edge x edge pixels."""
+    noise = Image.effect_noise((edge, edge), 48).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((edge, edge)).convert("RGB")
+    buffer = io.BytesIO()
+    Image.blend(gradient, noise, 0.3).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _descendants(pid: int) -> List[int]:
+    """Worker processes, image normalizer pools and so on, at any depth."""
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is parenthesized and may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+
+    found, pending = [], [pid]
+    while pending:
+        children = parents.get(pending.pop(), [])
+        found.extend(children)
+        pending.extend(children)
+    return found
+
+
+class AppServer:
+    """
+    One app under uvicorn in a subprocess, in its own scratch directory.
+
+    Relative paths (result cache, job store, ...) land in ``workdir``, so
+    runs don't share or leave behind state.
+    """
+
+    def __init__(self, app: str, env: Dict[str, str], workdir: str, workers: int = 1):
+        self.app = app
+        self.env = env
+        self.workdir = workdir
+        self.workers = workers
+        self.port = free_port()
+        self.process: Optional[subprocess.Popen] = None
+        self.log_path = os.path.join(workdir, "server.log")
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def spawn(self, extra_args: Sequence[str] = ()) -> None:
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(
+                [
+                    sys.executable, *extra_args, "-m", "uvicorn", APPS[self.app],
+                    "--app-dir", str(BACKEND_DIR),
+                    "--host", "127.0.0.1",
+                    "--port", str(self.port),
+                    "--workers", str(self.workers),
+                    "--log-level", "warning",
+                    "--no-access-log",
+                ],
+                cwd=self.workdir,
+                env=self.env,
+                stdout=log,
+                stderr=subprocess.STDOUT
+            )
+
+    async def wait_for(self, path: str, timeout: float = 60.0, interval: float = 0.2) -> None:
+        """Poll ``path`` until it answers 200; stops the server and raises if it never does."""
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    break
+                try:
+                    if (await client.get(f"{self.base_url}{path}")).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(interval)
+        self.stop()
+        with open(self.log_path) as log:
+            output = log.read()[-2000:]
+        raise RuntimeError(f"{self.app} did not start:\n{output}")
+
+    async def start(self, timeout: float = 60.0) -> None:
+        self.spawn()
+        await self.wait_for("/metrics", timeout)
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def rss_bytes(self) -> int:
+        """Resident memory of the server and all its child processes (Linux only)."""
+        if not self.process:
+            return 0
+        pids = [self.process.pid] + _descendants(self.process.pid)
+        return sum(_rss_bytes(pid) for pid in pids)
+
+
+async def run_level(
+    server: AppServer,
+    image: bytes,
+    concurrency: int,
+    requests: int,
+    cache: bool = False
+) -> Dict[str, Any]:
+    """Post ``requests`` uploads with ``concurrency`` in flight; returns the level's stats."""
+    url = f"{server.base_url}/api/upload-temp-image"
+    params = {} if cache else {"bypass_cache": "true"}
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = requests
+    peak_rss = server.rss_bytes()
+
+    async def sample_memory() -> None:
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, await asyncio.to_thread(server.rss_bytes))
+            await asyncio.sleep(0.25)
+
+    async def worker(client: httpx.AsyncClient, index: int) -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    url,
+                    params=params,
+                    files={"file": ("benchmark.jpg", image, "image/jpeg")},
+                    # One user per connection, so per-user admission limits don't skew the run
+                    data={"user_id": f"benchmark-{index}"}
+                )
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            # Latencies are of successful uploads, so error injection doesn't skew them
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(600.0)) as client:
+        sampler = asyncio.create_task(sample_memory())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "concurrency": concurrency,
+        "image_bytes": len(image),
+        "requests": requests,
+        "ok": statuses.get(200, 0),
+        "rejected": statuses.get(429, 0),
+        "errors": requests - statuses.get(200, 0) - statuses.get(429, 0),
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "req_per_s": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies_ms, 50), 1),
+        "p95_ms": round(percentile(latencies_ms, 95), 1),
+        "p99_ms": round(percentile(latencies_ms, 99), 1),
+        "peak_rss_mb": round(peak_rss / 1024 ** 2, 1),
+    }
+
+
+def level_key(level: Dict[str, Any], edge: int) -> str:
+    return f"c{level['concurrency']}/{edge}px"
+
+
+async def benchmark_app(
+    app: str,
+    env: Dict[str, str],
+    images: Dict[int, bytes],
+    concurrency: Sequence[int],
+    requests: int,
+    workers: int = 1,
+    warmup: int = 5,
+    cache: bool = False
+) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix=f"upload-bench-{app}-") as workdir:
+        server = AppServer(app, env, workdir, workers)
+        await server.start()
+        try:
+            idle_rss = server.rss_bytes()
+            levels = {}
+            for edge, image in images.items():
+                if warmup:
+                    await run_level(server, image, 1, warmup, cache)
+                for level_concurrency in concurrency:
+                    level = await run_level(server, image, level_concurrency, requests, cache)
+                    levels[level_key(level, edge)] = level
+                    print(
+                        f"  {app:<9}{level_key(level, edge):<14}{level['req_per_s']:>9.1f}"
+                        f"{level['p50_ms']:>10.0f}{level['p95_ms']:>10.0f}{level['p99_ms']:>10.0f}"
+                        f"{level['peak_rss_mb']:>10.0f}{level['errors']:>8}{level['rejected']:>8}",
+                        flush=True
+                    )
+        finally:
+            server.stop()
+    return {"workers": workers, "idle_rss_mb": round(idle_rss / 1024 ** 2, 1), "levels": levels}
+
+
+def regressions(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_regression: float
+) -> List[str]:
+    """Levels whose p95 grew, or req/s dropped, by more than max_regression (a fraction)."""
+    found = []
+    for app, result in report["apps"].items():
+        for key, level in result["levels"].items():
+            before = baseline.get("apps", {}).get(app, {}).get("levels", {}).get(key)
+            if not before:
+                continue
+            if before["p95_ms"] > 0 and level["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+                found.append(f"{app} {key}: p95 {before['p95_ms']:.0f} -> {level['p95_ms']:.0f} ms")
+            if level["req_per_s"] < before["req_per_s"] * (1 - max_regression):
+                found.append(f"{app} {key}: {before['req_per_s']:.1f} -> {level['req_per_s']:.1f} req/s")
+    return found
+
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", default="img_temp,main", help="Comma-separated: img_temp, main")
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 8, 32], help="Comma-separated levels")
+    parser.add_argument("--sizes", type=parse_list, default=[512, 2048], help="Image edges in pixels")
+    parser.add_argument("--requests", type=int, default=100, help="Uploads per level")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured uploads per image size")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per app")
+    parser.add_argument("--cache", action="store_true", help="Let repeat uploads hit the result cache")
+    parser.add_argument("--tmpfiles-latency", type=float, default=0.15, help="Stub latency (seconds)")
+    parser.add_argument("--agent-latency", type=float, default=1.0, help="Stub latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of failed stub requests")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed change (fraction)")
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    apps = [app.strip() for app in args.apps.split(",") if app.strip()]
+    unknown = [app for app in apps if app not in APPS]
+    if unknown:
+        print(f"Error: Unknown apps: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    images = {edge: make_image(edge) for edge in args.sizes}
+    tmpfiles = TmpfilesStub(args.tmpfiles_latency, error_rate=args.error_rate)
+    agent = AgentWebhookStub(args.agent_latency, error_rate=args.error_rate)
+    report: Dict[str, Any] = {"config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")}}
+    report["apps"] = {}
+    failed: List[str] = []
+
+    with tmpfiles, agent:
+        env = {
+            **os.environ,
+            "TMPFILES_UPLOAD_URL": tmpfiles.url,
+            "EXTERNAL_AGENT_URL": agent.url,
+            # Upload to the stub rather than serving images from this host
+            "PUBLIC_BASE_URL": "",
+            "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "benchmark"),
+            "PYTHONUNBUFFERED": "1",
+        }
+        print(f"  {'app':<9}{'level':<14}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'RSS MB':>10}{'errors':>8}{'429s':>8}")
+        for app in apps:
+            try:
+                report["apps"][app] = await benchmark_app(
+                    app, env, images, args.concurrency, args.requests,
+                    args.workers, args.warmup, args.cache
+                )
+            except RuntimeError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                failed.append(app)
+        report["failed"] = failed
+        report["stubs"] = {"tmpfiles": tmpfiles.stats(), "agent": agent.stats()}
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.max_regression)
+        if found:
+            print("\nRegressions:\n  " + "\n  ".join(found))
+            return 1
+    if failed:
+        print(f"\nFailed to benchmark: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,195 @@
+"""
+Local stand-ins for the upload path's upstreams.
+
+``TmpfilesStub`` answers ``POST /api/v1/upload`` like tmpfiles.org and
+``AgentWebhookStub`` answers the agent webhook with a
+``{"data": {"strategies", "analytics"}}`` payload. Both add configurable
+latency and fail a configurable share of requests. Run standalone with
+
+    python -m benchmarks.upload_stubs --agent-latency 2 --error-rate 0.05
+
+and point ``TMPFILES_UPLOAD_URL`` and ``EXTERNAL_AGENT_URL`` at the printed
+URLs.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# Shape of the agent workflow's output, as read by the dashboard
+SAMPLE_RESULT = {
+    "strategies": {
+        "instagram": {
+            "content": "Fresh out of the oven and ready for your morning. ☕",
+            "hashtags": ["#coffee", "#bakery", "#morningvibes"],
+            "visual_direction": "Warm, close-up product shot in natural light",
+        },
+        "linkedin": {
+            "content": "We're launching our new seasonal blend this week.\n\nHere's what went into it.",
+            "hashtags": ["#smallbusiness", "#launch"],
+        },
+        "blog": {
+            "title": "Behind the blend",
+            "content": "Every season we start with a question: what should the morning taste like? " * 20,
+        },
+    },
+    "analytics": {
+        "overall_seo_strength": 78,
+        "platform_metrics": {
+            platform: {"score": score, "est_reach": "1.2K-3.5K", "est_engagement": "4-6%"}
+            for platform, score in (("instagram", 82), ("linkedin", 74), ("blog", 69))
+        },
+    },
+}
+
+
+class StubServer(ABC):
+    """
+    A stub upstream on localhost, served from a background thread.
+
+    Each request waits ``latency`` seconds (jittered by +-``jitter`` of
+    that) and then, with probability ``error_rate``, fails with
+    ``error_status``.
+    """
+
+    path = "/"
+
+    def __init__(
+        self,
+        latency: float = 0.1,
+        jitter: float = 0.5,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        port: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return self.base_url + self.path
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors_injected": self.errors}
+
+    @abstractmethod
+    def respond(self, body: bytes, content_type: str) -> Tuple[int, Any]:
+        """Status and JSON body for a successful request."""
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real upstreams behind the pooled client
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Any) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                time.sleep(max(0.0, stub.latency * (1 + stub.jitter * (2 * random.random() - 1))))
+
+                with stub._lock:
+                    stub.requests += 1
+                    failed = random.random() < stub.error_rate
+                    stub.errors += failed
+                if self.path.split("?", 1)[0] != stub.path:
+                    return self._send(404, {"error": "Not found"})
+                if failed:
+                    return self._send(stub.error_status, {"error": "Injected failure"})
+                self._send(*stub.respond(body, self.headers.get("Content-Type", "")))
+
+        return Handler
+
+
+class TmpfilesStub(StubServer):
+    """tmpfiles.org's upload API: takes a multipart ``file`` and returns its page URL."""
+
+    path = "/api/v1/upload"
+
+    def respond(self, body, content_type):
+        if not content_type.startswith("multipart/form-data") or b'name="file"' not in body:
+            return 400, {"status": "error", "error": "No file"}
+        file_id = random.randrange(10 ** 7, 10 ** 8)
+        return 200, {"status": "success", "data": {"url": f"http://tmpfiles.org/{file_id}/image.jpg"}}
+
+
+class AgentWebhookStub(StubServer):
+    """The external agent webhook: takes a session ID and image URL, returns strategies."""
+
+    path = "/webhook/agent"
+
+    def respond(self, body, content_type):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, {"error": "Invalid JSON"}
+        if not payload.get("session_id") or not payload.get("image_url"):
+            return 400, {"error": "session_id and image_url are required"}
+        return 200, {"data": SAMPLE_RESULT}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tmpfiles-port", type=int, default=9101)
+    parser.add_argument("--agent-port", type=int, default=9102)
+    parser.add_argument("--tmpfiles-latency", type=float, default=0.15, help="Seconds")
+    parser.add_argument("--agent-latency", type=float, default=1.0, help="Seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of failed requests, both stubs")
+    args = parser.parse_args()
+
+    tmpfiles = TmpfilesStub(args.tmpfiles_latency, error_rate=args.error_rate, port=args.tmpfiles_port)
+    agent = AgentWebhookStub(args.agent_latency, error_rate=args.error_rate, port=args.agent_port)
+    with tmpfiles, agent:
+        print(f"TMPFILES_UPLOAD_URL={tmpfiles.url}")
+        print(f"EXTERNAL_AGENT_URL={agent.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,54 @@
 """FastAPI application entry point for Orca Orchestrator."""
+import os
+
+# First, so the profile covers every other import
+from services.startup_profile import startup_profiler
+if os.getenv("STARTUP_PROFILE_IMPORTS", "").lower() in ("1", "true", "yes"):
+    startup_profiler.track_imports()
+
 from contextlib import asynccontextmanager
-from typing import Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Form
+from functools import partial
+from typing import TYPE_CHECKING, Optional
+from fastapi import (
+    FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Form, Query, Request,
+    WebSocket, WebSocketDisconnect
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import ValidationError
 from pydantic_settings import BaseSettings
-import requests
+import httpx
+import asyncio
+import importlib
+import json
+import math
 import uuid
-import os
 
-from models.job import JobRequest, JobResponse, JobStatus, JobMeta
+from models.job import JobRequest, JobResponse, JobState, JobStatus, JobMeta
 from services.job_manager import job_manager
-from services.gemini_client import GeminiClient
-from agents.orca_agent import OrcaAgent
+from services.job_store import SUMMARY_FIELDS, create_job_store
+from services.admission import AdmissionController, QueueFullError, Ticket
+from services.api_metrics import CONTENT_TYPE, MetricsMiddleware, api_metrics
+from services.http_client import PooledHTTPClient
+from services.image_ingest import ImageUpload, IngestError, exceeds_upload_limit
+from services.image_normalize import ImageNormalizer
+from services.image_store import ImageStore, ImageFileResponse
+from services.metrics import Gauge
+from services.near_duplicates import Fingerprint, NearDuplicateIndex, perceptual_hash
+from services.shared_slots import SharedSlots
+from services.publish_queue import ACCOUNT_NAME, DEFAULT_ACCOUNT, PLATFORMS, PublishQueue, PublishWorkers, parse_rate_limits
+from services.result_cache import ResultCache
+from services.upload_pipeline import PipelineError, stage_image, call_external_agent
 from utils.logger import setup_logger, logger
 
+if TYPE_CHECKING:
+    # Imported on first use: the Gemini SDK and Playwright dominate a cold start
+    from agents.orca_agent import OrcaAgent
+    from services.gemini_client import GeminiClient
+    from services.publisher import Publisher
+
+startup_profiler.mark_imported()
+
 
 class Settings(BaseSettings):
     """Application settings."""
@@ -23,7 +56,60 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     api_host: str = "0.0.0.0"
     api_port: int = 8000
+    api_workers: int = 1
+    api_reload: bool = False
     external_agent_url: str = ""
+    external_agent_timeout: float = 300.0
+    http_max_connections: int = 100
+    http_max_keepalive: int = 20
+    http_max_per_host: int = 20
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 30.0
+    max_upload_bytes: int = 20 * 1024 * 1024
+    public_base_url: str = ""
+    image_store_dir: str = "image_store"
+    image_url_secret: str = ""
+    image_url_ttl: int = 3600
+    image_store_max_age: int = 24 * 3600
+    image_store_max_bytes: int = 2 * 1024 ** 3
+    result_cache_dir: str = "result_cache"
+    result_cache_ttl: int = 7 * 24 * 3600
+    result_cache_max_entries: int = 512
+    result_cache_max_bytes: int = 256 * 1024 ** 2
+    cache_sweep_interval: float = 300.0
+    job_store_backend: str = "sqlite"
+    job_store_path: str = "jobs.db"
+    agent_max_concurrency: int = 8
+    agent_max_queue: int = 64
+    agent_max_queued_per_user: int = 16
+    agent_slots_path: str = ""
+    near_duplicates: bool = True
+    near_duplicate_index: str = "near_duplicates.jsonl"
+    near_duplicate_threshold: int = 6
+    image_normalize: bool = True
+    image_normalize_workers: int = 2
+    image_max_edge: int = 2048
+    image_output_format: str = "webp"
+    image_quality: int = 85
+    publish_queue_path: str = "publish_queue.db"
+    publish_media_dir: str = "publish_media"
+    publish_workers: int = 0
+    publish_headless: bool = True
+    publish_block_resources: bool = True
+    publish_trace_dir: str = ""
+    publish_slow_trace_ms: float = 60000.0
+    publish_auth_dir: str = "."
+    publish_timeout: float = 600.0
+    publish_platform_limits: str = "instagram=50/86400:5,linkedin=100/86400:5"
+    publish_account_limits: str = "instagram=6/3600:2,linkedin=6/3600:2"
+    publish_max_attempts: int = 5
+    publish_retry_base_delay: float = 30.0
+    publish_retry_max_delay: float = 3600.0
+    metrics_dir: str = ""
+    metrics_flush_interval: float = 5.0
+    startup_warmup: bool = True
+    startup_retry_delay: float = 2.0
+    startup_retry_max_delay: float = 60.0
     
     class Config:
         env_file = ".env"
@@ -37,21 +123,230 @@ settings = Settings()
 # Initialize logger
 setup_logger("orca", settings.log_level)
 
-# Global instances
-gemini_client: Optional[GeminiClient] = None
-orca_agent: Optional[OrcaAgent] = None
+# Global instances; the agent and publisher are created after startup or on
+# first use (see warm_up)
+gemini_client: Optional["GeminiClient"] = None
+orca_agent: Optional["OrcaAgent"] = None
+http_client: Optional[PooledHTTPClient] = None
+image_store: Optional[ImageStore] = None
+result_cache: Optional[ResultCache] = None
+near_duplicates: Optional[NearDuplicateIndex] = None
+image_normalizer: Optional[ImageNormalizer] = None
+publish_queue: Optional[PublishQueue] = None
+publisher: Optional["Publisher"] = None
+publish_workers: Optional[PublishWorkers] = None
+orca_agent_lock = asyncio.Lock()
+publisher_lock = asyncio.Lock()
+publisher_task: Optional[asyncio.Task] = None
+warmup_task: Optional[asyncio.Task] = None
+# Why the last warm-up attempt failed; cleared once one succeeds
+warmup_error: Optional[str] = None
+
+# Bounds concurrent agent calls and orchestrations; excess work waits in a
+# fair, bounded queue and is rejected with 429 once that is full. With
+# AGENT_SLOTS_PATH set, the concurrency limit holds across all workers
+agent_limiter = AdmissionController(
+    max_concurrent=settings.agent_max_concurrency,
+    max_queue=settings.agent_max_queue,
+    max_queued_per_user=settings.agent_max_queued_per_user,
+    on_admit=partial(api_metrics.observe_stage, "admission_wait"),
+    shared=(
+        SharedSlots(settings.agent_slots_path, settings.agent_max_concurrency)
+        if settings.agent_slots_path else None
+    )
+)
+api_metrics.watch_admission(agent_limiter)
+
+
+async def get_orca_agent() -> "OrcaAgent":
+    """
+    The orchestration agent, created on first use.
+    
+    Importing the Gemini SDK takes most of a cold start, so it runs in a
+    thread instead of blocking the event loop. A failed attempt is retried
+    by the next caller.
+    """
+    global gemini_client, orca_agent
+    async with orca_agent_lock:
+        if orca_agent is None:
+            with startup_profiler.step("orca_agent"):
+                gemini_module, agent_module = await asyncio.to_thread(
+                    lambda: (
+                        importlib.import_module("services.gemini_client"),
+                        importlib.import_module("agents.orca_agent")
+                    )
+                )
+                logger.info("Initializing Gemini client...")
+                gemini_client = gemini_module.GeminiClient(api_key=settings.google_api_key)
+                orca_agent = agent_module.OrcaAgent(gemini_client=gemini_client)
+    return orca_agent
+
+
+async def get_publisher() -> "Publisher":
+    """
+    The publisher, with its browsers launched, created on first use.
+    
+    Playwright is imported in a thread. A failed launch is retried by the
+    next caller.
+    """
+    global publisher
+    async with publisher_lock:
+        if publisher is None:
+            with startup_profiler.step("publisher"):
+                publisher_module = await asyncio.to_thread(
+                    importlib.import_module, "services.publisher"
+                )
+                candidate = publisher_module.Publisher(
+                    headless=settings.publish_headless,
+                    block_resources=settings.publish_block_resources,
+                    trace_dir=settings.publish_trace_dir or None,
+                    slow_trace_ms=settings.publish_slow_trace_ms,
+                    auth_dir=settings.publish_auth_dir
+                )
+                try:
+                    await candidate.start()
+                except BaseException:
+                    # Also on cancellation, or Playwright's driver outlives the app
+                    await candidate.close()
+                    raise
+                publisher = candidate
+                # Poster histograms are served on /metrics with the rest
+                for metric in publisher.tracer.metrics():
+                    api_metrics.registry.register(metric)
+    return publisher
+
+
+def start_publisher() -> None:
+    """Start the publisher in the background if it isn't running or starting."""
+    global publisher_task
+    if publisher is not None or (publisher_task is not None and not publisher_task.done()):
+        return
+    
+    async def start():
+        try:
+            await get_publisher()
+        except Exception as e:
+            logger.error(f"Publisher failed to start: {e}", exc_info=True)
+    
+    publisher_task = asyncio.create_task(start())
+
+
+async def warm_up():
+    """
+    Slow startup work, run once the app is serving: liveness checks pass
+    meanwhile, and /api/v1/ready reports ready when this finishes.
+    
+    A failed attempt is retried with exponential backoff; the steps that
+    already succeeded are not redone.
+    """
+    global publish_workers, warmup_error
+    delay = settings.startup_retry_delay
+    while True:
+        try:
+            if near_duplicates:
+                with startup_profiler.step("near_duplicate_index"):
+                    await near_duplicates.refresh()
+            if settings.publish_workers > 0 and publish_workers is None:
+                # Without workers here, posts queue up for another process to drain
+                await get_publisher()
+                publish_workers = PublishWorkers(
+                    publish_queue, publisher.publish, settings.publish_workers,
+                    timeout=settings.publish_timeout
+                )
+                publish_workers.start()
+            if settings.startup_warmup:
+                await get_orca_agent()
+        except Exception as e:
+            warmup_error = f"{type(e).__name__}: {e}"
+            logger.error(f"Startup warm-up failed, retrying in {delay:g}s: {e}", exc_info=True)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.startup_retry_max_delay)
+            continue
+        warmup_error = None
+        break
+    startup_profiler.mark_ready()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown events."""
     # Startup
-    global gemini_client, orca_agent
+    global http_client, image_store, result_cache, near_duplicates, image_normalizer
+    global publish_queue, warmup_task
     
+    eviction_tasks = []
     try:
-        logger.info("Initializing Gemini client...")
-        gemini_client = GeminiClient(api_key=settings.google_api_key)
-        orca_agent = OrcaAgent(gemini_client=gemini_client)
+        if settings.metrics_dir:
+            # Workers share their metrics through this directory
+            api_metrics.registry.use_directory(settings.metrics_dir)
+            eviction_tasks.append(asyncio.create_task(
+                api_metrics.registry.run_flush(settings.metrics_flush_interval)
+            ))
+        with startup_profiler.step("job_store"):
+            job_manager.use_store(
+                create_job_store(settings.job_store_backend, settings.job_store_path)
+            )
+        with startup_profiler.step("http_client"):
+            http_client = PooledHTTPClient(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive,
+                max_per_host=settings.http_max_per_host,
+                connect_timeout=settings.http_connect_timeout,
+                read_timeout=settings.http_read_timeout
+            )
+        with startup_profiler.step("result_cache"):
+            result_cache = ResultCache(
+                directory=settings.result_cache_dir or None,
+                ttl=settings.result_cache_ttl,
+                max_entries=settings.result_cache_max_entries,
+                max_disk_bytes=settings.result_cache_max_bytes
+            )
+        eviction_tasks.append(asyncio.create_task(
+            result_cache.run_eviction(settings.cache_sweep_interval)
+        ))
+        if settings.near_duplicates:
+            # Loaded by warm_up; lookups load whatever is still missing
+            near_duplicates = NearDuplicateIndex(
+                path=settings.near_duplicate_index or None,
+                threshold=settings.near_duplicate_threshold,
+                ttl=settings.result_cache_ttl
+            )
+            eviction_tasks.append(asyncio.create_task(
+                near_duplicates.run_eviction(settings.cache_sweep_interval)
+            ))
+        if settings.public_base_url:
+            # Serve uploads from this host instead of tmpfiles.org
+            with startup_profiler.step("image_store"):
+                image_store = ImageStore(
+                    root=settings.image_store_dir,
+                    secret=settings.image_url_secret or None,
+                    url_ttl=settings.image_url_ttl,
+                    max_age=settings.image_store_max_age,
+                    max_bytes=settings.image_store_max_bytes
+                )
+            eviction_tasks.append(asyncio.create_task(
+                image_store.run_eviction(settings.cache_sweep_interval)
+            ))
+        if settings.image_normalize:
+            with startup_profiler.step("image_normalizer"):
+                image_normalizer = ImageNormalizer(
+                    max_workers=settings.image_normalize_workers,
+                    max_edge=settings.image_max_edge,
+                    output_format=settings.image_output_format,
+                    quality=settings.image_quality
+                )
+        with startup_profiler.step("publish_queue"):
+            publish_queue = PublishQueue(
+                path=settings.publish_queue_path,
+                media_dir=settings.publish_media_dir,
+                platform_limits=parse_rate_limits(settings.publish_platform_limits),
+                account_limits=parse_rate_limits(settings.publish_account_limits),
+                max_attempts=settings.publish_max_attempts,
+                base_delay=settings.publish_retry_base_delay,
+                max_delay=settings.publish_retry_max_delay
+            )
+        warmup_task = asyncio.create_task(warm_up())
+        startup_profiler.mark_serving()
         logger.info("Application startup complete")
     except Exception as e:
         logger.error(f"Failed to initialize application: {e}")
@@ -61,6 +356,27 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Application shutting down")
+    warmup_task.cancel()
+    if publisher_task:
+        # Cancelling Playwright while it launches can leave its driver hanging
+        await asyncio.wait([publisher_task], timeout=30)
+        publisher_task.cancel()
+    for task in eviction_tasks:
+        task.cancel()
+    api_metrics.registry.flush()
+    if publish_workers:
+        await publish_workers.close()
+    if publisher:
+        await publisher.close()
+    if publish_queue:
+        publish_queue.close()
+    if image_normalizer:
+        image_normalizer.shutdown()
+    job_manager.close()
+    if agent_limiter.shared:
+        agent_limiter.shared.close()
+    if http_client:
+        await http_client.aclose()
 
 
 # Create FastAPI app
@@ -81,6 +397,26 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Reject oversized uploads from Content-Length before the body is parsed."""
+    if request.url.path == "/api/upload-temp-image" and exceeds_upload_limit(
+        request.headers.get("content-length"), settings.max_upload_bytes
+    ):
+        return JSONResponse(
+            status_code=413,
+            content={
+                "status": "error",
+                "error": f"Image exceeds maximum size of {settings.max_upload_bytes} bytes"
+            }
+        )
+    return await call_next(request)
+
+
+# Added last so it also times requests rejected by the middleware above
+app.add_middleware(MetricsMiddleware, metrics=api_metrics, routes=app.router.routes)
+
+
 # Exception handlers
 @app.exception_handler(ValidationError)
 async def validation_exception_handler(request, exc):
@@ -102,17 +438,73 @@ async def general_exception_handler(request, exc):
 
 
 # Background task for async orchestration
-async def process_job_async(job_id: str, request: JobRequest):
+async def process_job_async(job_id: str, request: JobRequest, ticket: Ticket):
     """Process job asynchronously in background."""
     try:
-        await orca_agent.execute(job_id, request)
+        agent = await get_orca_agent()
+    except Exception as e:
+        ticket.cancel()
+        logger.error(f"Agent initialization failed for job {job_id}: {e}", exc_info=True)
+        await job_manager.update_status(job_id, JobStatus.FAILED, error=f"Agent unavailable: {str(e)}")
+        return
+    
+    try:
+        async with ticket:
+            with api_metrics.stage("orca_execute"):
+                await agent.execute(job_id, request)
     except Exception as e:
         logger.error(f"Background job processing failed for {job_id}: {e}", exc_info=True)
 
 
+async def process_upload_job(
+    job_id: str,
+    session_id: str,
+    image_url: str,
+    cache_key: str,
+    ticket: Ticket,
+    fingerprint: Optional[Fingerprint] = None
+):
+    """Run the external agent for an uploaded image and store the result on the job."""
+    try:
+        async with ticket:
+            await job_manager.update_status(job_id, JobStatus.PROCESSING)
+            data = await call_external_agent(
+                http_client,
+                settings.external_agent_url,
+                session_id,
+                image_url,
+                read_timeout=settings.external_agent_timeout
+            )
+        await job_manager.record_stage(job_id, "external_agent")
+        await result_cache.set(cache_key, data)
+        if fingerprint is not None:
+            await near_duplicates.add(fingerprint, cache_key, settings.external_agent_url)
+        await job_manager.update_status(job_id, JobStatus.COMPLETED, results=data)
+    except PipelineError as e:
+        await job_manager.update_status(job_id, JobStatus.FAILED, error=f"{e.message}: {e.details}")
+    except Exception as e:
+        logger.error(f"Upload job {job_id} failed: {e}", exc_info=True)
+        await job_manager.update_status(job_id, JobStatus.FAILED, error=f"Request failed: {str(e)}")
+
+
+def job_accepted_response(job_state: JobState, message: str) -> JSONResponse:
+    """202 response pointing the client at the job status endpoint."""
+    return JSONResponse(
+        status_code=202,
+        headers={"Location": f"/api/v1/jobs/{job_state.job_id}"},
+        content=JobResponse(
+            job_id=job_state.job_id,
+            status=job_state.status,
+            created_at=job_state.created_at,
+            updated_at=job_state.updated_at,
+            message=message
+        ).model_dump(mode="json")
+    )
+
+
 @app.get("/api/v1/health")
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check: answers as soon as the app serves, before warm-up ends."""
     return {
         "status": "healthy",
         "service": "orca-orchestrator",
@@ -120,6 +512,86 @@ async def health_check():
     }
 
 
+@app.get("/api/v1/ready")
+async def readiness_check():
+    """
+    Readiness check: 503 until startup warm-up (near-duplicate index,
+    publisher browsers, agent client) has finished and the job store answers.
+    While warm-up is being retried, the last failure is reported.
+    """
+    checks = {}
+    if warmup_task is not None and warmup_task.done() and not warmup_task.cancelled():
+        checks["warmup"] = "ok"
+    elif warmup_task is not None and warmup_task.cancelled():
+        checks["warmup"] = "cancelled"
+    elif warmup_error:
+        checks["warmup"] = f"failed: {warmup_error} (retrying)"
+    else:
+        checks["warmup"] = "running"
+    
+    try:
+        await job_manager.count_unfinished()
+        checks["job_store"] = "ok"
+    except Exception as e:
+        checks["job_store"] = f"failed: {e}"
+    
+    ready = all(check == "ok" for check in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "agent_initialized": orca_agent is not None
+        }
+    )
+
+
+@app.get("/api/v1/startup")
+async def startup_profile(top: int = 25):
+    """
+    Where the cold start went: init time per component and, with
+    STARTUP_PROFILE_IMPORTS=1, import time per module (slowest first).
+    """
+    return startup_profiler.report(top=top)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Request, pipeline stage, queue and poster step metrics (Prometheus text
+    format).
+    
+    With METRICS_DIR set, request, stage and poster metrics are added up
+    across all workers; job and publish queue depths are read from the
+    shared stores.
+    """
+    jobs = Gauge("jobs_unfinished", "Pending and processing jobs", ("status",))
+    for status, count in (await job_manager.count_unfinished()).items():
+        jobs.set(count, status=status)
+    
+    posts = Gauge("publish_queue_posts", "Queued posts by status", ("status",))
+    for status, count in (await publish_queue.stats()).items():
+        if status != "next_due_in":
+            posts.set(count, status=status)
+    
+    return PlainTextResponse(api_metrics.registry.render([jobs, posts]), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    """Result cache and near-duplicate index hit/miss counters."""
+    return {
+        **result_cache.stats(),
+        "near_duplicates": near_duplicates.stats() if near_duplicates else None
+    }
+
+
+@app.get("/api/v1/admission/stats")
+async def admission_stats():
+    """Agent queue depth, in-flight calls and wait times."""
+    return agent_limiter.stats()
+
+
 @app.post("/api/v1/jobs", response_model=JobResponse, status_code=202)
 async def create_job(
     background_tasks: BackgroundTasks,
@@ -176,11 +648,18 @@ async def create_job(
             meta=meta
         )
         
+        # Reserve a place in the agent queue before accepting the job
+        ticket = agent_limiter.reserve(request.user_id or "anonymous")
+        
         # Create job
-        job_id = await job_manager.create_job(request)
+        try:
+            job_id = await job_manager.create_job(request)
+        except BaseException:
+            ticket.cancel()
+            raise
         
         # Start background processing
-        background_tasks.add_task(process_job_async, job_id, request)
+        background_tasks.add_task(process_job_async, job_id, request, ticket)
         
         # Get initial job state
         job_state = await job_manager.get_job(job_id)
@@ -193,6 +672,12 @@ async def create_job(
             message="Job created and processing started"
         )
         
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many jobs in progress, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -211,11 +696,18 @@ async def create_job_json(
     Alternative endpoint that accepts JSON instead of form-data.
     """
     try:
+        # Reserve a place in the agent queue before accepting the job
+        ticket = agent_limiter.reserve(request.user_id or "anonymous")
+        
         # Create job
-        job_id = await job_manager.create_job(request)
+        try:
+            job_id = await job_manager.create_job(request)
+        except BaseException:
+            ticket.cancel()
+            raise
         
         # Start background processing
-        background_tasks.add_task(process_job_async, job_id, request)
+        background_tasks.add_task(process_job_async, job_id, request, ticket)
         
         # Get initial job state
         job_state = await job_manager.get_job(job_id)
@@ -228,6 +720,12 @@ async def create_job_json(
             message="Job created and processing started"
         )
         
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many jobs in progress, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -267,11 +765,69 @@ async def get_job(job_id: str):
     )
 
 
+def format_sse(event: dict) -> str:
+    """Serialize a job event as a Server-Sent Events message."""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@app.get("/api/v1/jobs/{job_id}/events")
+async def stream_job_events(request: Request, job_id: str, last_event_id: Optional[int] = None):
+    """
+    Stream job progress as Server-Sent Events.
+    
+    Each status transition and completed pipeline stage is sent once. The
+    stream ends after the job completes or fails. Reconnecting clients resume
+    after the Last-Event-ID header (or the last_event_id query parameter).
+    """
+    if not await job_manager.get_job(job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    if last_event_id is None:
+        header = request.headers.get("last-event-id", "")
+        last_event_id = int(header) if header.isdigit() else 0
+    
+    async def event_stream():
+        async for event in job_manager.events(job_id, after=last_event_id):
+            if await request.is_disconnected():
+                break
+            yield ": keep-alive\n\n" if event is None else format_sse(event)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/api/v1/jobs/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str, last_event_id: int = 0):
+    """
+    WebSocket fallback for the job event stream.
+    
+    Sends the same events as JSON messages and closes after the job completes
+    or fails.
+    """
+    await websocket.accept()
+    if not await job_manager.get_job(job_id):
+        await websocket.close(code=4404, reason=f"Job {job_id} not found")
+        return
+    
+    try:
+        async for event in job_manager.events(job_id, after=last_event_id):
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
 @app.get("/api/v1/jobs")
 async def list_jobs(
     user_id: Optional[str] = None,
     status: Optional[JobStatus] = None,
-    limit: int = 100
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     """
     List jobs with optional filtering.
@@ -279,114 +835,185 @@ async def list_jobs(
     Args:
         user_id: Filter by user ID
         status: Filter by status
-        limit: Maximum number of jobs to return
+        limit: Maximum number of jobs to return (1-1000)
+        cursor: next_cursor from the previous page
+        fields: Comma-separated subset of job fields to return
     
     Returns:
-        List of job summaries
+        List of job summaries and the cursor for the next page
     """
-    jobs = await job_manager.list_jobs(user_id=user_id, status=status, limit=limit)
+    projection = None
+    if fields:
+        projection = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(projection) - set(SUMMARY_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    try:
+        jobs, next_cursor = await job_manager.list_jobs(
+            user_id=user_id, status=status, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if projection:
+        jobs = [{field: job[field] for field in projection} for job in jobs]
     
     return {
-        "jobs": [
-            {
-                "job_id": job.job_id,
-                "status": job.status.value,
-                "created_at": job.created_at.isoformat(),
-                "updated_at": job.updated_at.isoformat(),
-                "has_results": job.results is not None
-            }
-            for job in jobs
-        ],
-        "count": len(jobs)
+        "jobs": jobs,
+        "count": len(jobs),
+        "next_cursor": next_cursor
     }
 
 
-ALLOWED_CONTENT_TYPES = [
-    "image/png",
-    "image/jpeg",
-    "image/jpg",
-    "image/webp"
-]
-
-
 @app.post("/api/upload-temp-image")
-async def upload_temp_image(file: UploadFile = File(...)):
+async def upload_temp_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Form(None),
+    bypass_cache: bool = False,
+    async_job: bool = False
+):
     """
-    Upload image to tmpfiles.org and process through external agent.
+    Upload image to temporary storage and process through external agent.
     Returns strategies and analytics for Instagram, LinkedIn, and Blog.
+    
+    Results are cached by image content, so repeat uploads return without
+    running the agent pipeline. Pass bypass_cache=true to force a fresh run.
+    
+    With async_job=true the image is staged, a job is created and 202 is
+    returned immediately; the agent runs in the background and its result is
+    stored on the job (GET /api/v1/jobs/{job_id}).
+    
+    Agent calls are admission-controlled per user (user_id, or the client
+    address); returns 429 with Retry-After when the queue is full.
     """
-    # Validate content type
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
+    # Validate size and sniff the real image type from its magic bytes
+    try:
+        upload = await ImageUpload.open(file, settings.max_upload_bytes)
+    except IngestError as e:
         return JSONResponse(
-            status_code=400,
-            content={"status": "error", "error": "Invalid image format"}
+            status_code=e.status_code,
+            content={"status": "error", "error": e.message}
         )
     
     # Generate session ID
     session_id = str(uuid.uuid4())
     
+    if not settings.external_agent_url:
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "error": "EXTERNAL_AGENT_URL not configured"}
+        )
+    
     try:
-        # Read file bytes
-        file_bytes = await file.read()
-        
-        # Step 1: Upload to tmpfiles.org
-        files = {
-            'file': (file.filename, file_bytes, file.content_type)
-        }
-        
-        tmpfiles_response = requests.post(
-            "https://tmpfiles.org/api/v1/upload",
-            files=files
+        # Repeat uploads of the same image skip the agent pipeline
+        cache_key = result_cache.make_key(
+            await upload.digest(),
+            agent_url=settings.external_agent_url,
+            normalization=image_normalizer.signature if image_normalizer else None
         )
+        cached = None if bypass_cache else await result_cache.get(cache_key)
         
-        if tmpfiles_response.status_code != 200:
-            return JSONResponse(
-                status_code=500,
-                content={"status": "error", "error": "Temporary file upload failed"}
-            )
+        # Recompressed, resized or slightly cropped copies of an earlier image
+        # reuse its result too
+        fingerprint = None
+        near_duplicate = None
+        if cached is None and near_duplicates:
+            fingerprint = await perceptual_hash(upload)
+            if not bypass_cache:
+                match = await near_duplicates.find(fingerprint, settings.external_agent_url)
+                cached = await result_cache.get(match[0]) if match else None
+                if cached is not None:
+                    near_duplicate = {"distance": match[1]}
+                    await result_cache.set(cache_key, cached)
         
-        # Parse tmpfiles.org response
-        tmpfiles_data = tmpfiles_response.json()
-        
-        # Extract the URL and convert to direct link
-        if tmpfiles_data.get("status") == "success":
-            temp_url = tmpfiles_data["data"]["url"]
-            # Convert tmpfiles.org URL to direct download URL
-            temp_url = temp_url.replace("tmpfiles.org/", "tmpfiles.org/dl/")
-        else:
+        if cached is not None:
+            if async_job:
+                job_id = await job_manager.create_job(JobRequest(
+                    user_id=user_id,
+                    text_prompt=f"Image upload: {upload.filename}"
+                ))
+                await job_manager.record_stage(
+                    job_id, "result_cache", {"near_duplicate": near_duplicate}
+                )
+                job_state = await job_manager.update_status(
+                    job_id, JobStatus.COMPLETED, results=cached
+                )
+                return job_accepted_response(job_state, "Job completed from cache")
             return JSONResponse(
-                status_code=500,
-                content={"status": "error", "error": "Failed to get temporary file URL"}
+                status_code=200,
+                content={
+                    "status": "success",
+                    "data": cached,
+                    "cached": True,
+                    "near_duplicate": near_duplicate
+                }
             )
         
-        # Step 2: POST the session ID and temporary link to the webhook
-        if not settings.external_agent_url:
+        # Queue for the agent, fairly across users; reject early when full
+        try:
+            ticket = agent_limiter.reserve(
+                user_id or getattr(request.client, "host", "anonymous")
+            )
+        except QueueFullError as e:
             return JSONResponse(
-                status_code=500,
-                content={"status": "error", "error": "EXTERNAL_AGENT_URL not configured"}
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)},
+                content={"status": "error", "error": "Too many uploads in progress, please retry later"}
             )
         
-        webhook_response = requests.post(
-            settings.external_agent_url,
-            json={
-                "session_id": session_id,
-                "image_url": temp_url
-            }
-        )
+        # Step 1: Normalize the image in the process pool, then store it
+        # locally or stream it to tmpfiles.org
+        try:
+            temp_url, normalization = await stage_image(
+                http_client,
+                upload,
+                image_store,
+                settings.public_base_url,
+                image_normalizer
+            )
+            
+            # Step 2: POST the session ID and temporary link to the webhook,
+            # in the background when running as a job
+            if async_job:
+                job_id = await job_manager.create_job(JobRequest(
+                    user_id=user_id,
+                    text_prompt=f"Image upload: {upload.filename}",
+                    image_url=temp_url
+                ))
+                await job_manager.record_stage(
+                    job_id, "image_staged", {"normalization": normalization}
+                )
+        except BaseException:
+            ticket.cancel()
+            raise
         
-        if webhook_response.status_code != 200:
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "status": "error",
-                    "error": "Webhook request failed",
-                    "status_code": webhook_response.status_code,
-                    "response": webhook_response.text
-                }
+        if async_job:
+            background_tasks.add_task(
+                process_upload_job,
+                job_id,
+                session_id,
+                temp_url,
+                cache_key,
+                ticket,
+                fingerprint
             )
+            job_state = await job_manager.get_job(job_id)
+            return job_accepted_response(job_state, "Job created and processing started")
         
-        # Parse response from webhook
-        result = webhook_response.json()
+        async with ticket:
+            data = await call_external_agent(
+                http_client,
+                settings.external_agent_url,
+                session_id,
+                temp_url,
+                read_timeout=settings.external_agent_timeout
+            )
+        await result_cache.set(cache_key, data)
+        if fingerprint is not None:
+            await near_duplicates.add(fingerprint, cache_key, settings.external_agent_url)
         
         # Return the expected format with status and data
         # The webhook response should contain the strategies and analytics
@@ -394,11 +1021,23 @@ async def upload_temp_image(file: UploadFile = File(...)):
             status_code=200,
             content={
                 "status": "success",
-                "data": result.get("data", result)  # Use data field if present, otherwise use entire result
+                "data": data,
+                "cached": False,
+                "normalization": normalization
             }
         )
             
-    except requests.exceptions.RequestException as e:
+    except IngestError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"status": "error", "error": e.message}
+        )
+    except PipelineError as e:
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "error": e.message, **e.details}
+        )
+    except httpx.HTTPError as e:
         return JSONResponse(
             status_code=500,
             content={"status": "error", "error": f"Request failed: {str(e)}"}
@@ -411,13 +1050,204 @@ async def upload_temp_image(file: UploadFile = File(...)):
         )
 
 
+@app.post("/api/v1/publish", status_code=202)
+async def enqueue_publish(
+    text: str = Form(...),
+    platforms: str = Form(...),  # Comma-separated string
+    image: UploadFile = File(...),
+    account: Optional[str] = Form(None),
+    job_id: Optional[str] = Form(None)
+):
+    """
+    Queue a post for publishing to one or more platforms.
+    
+    Each platform gets its own queue entry, published by the publish
+    workers within that platform's and account's rate limits and retried
+    with backoff. Poll GET /api/v1/publish/{publish_id} for the post URL.
+    """
+    targets = [p.strip().lower() for p in platforms.split(",") if p.strip()]
+    unsupported = [p for p in targets if p not in PLATFORMS]
+    if not targets or unsupported:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unsupported platforms: {', '.join(unsupported) or platforms!r}"
+        )
+    if account is not None and not ACCOUNT_NAME.fullmatch(account):
+        raise HTTPException(status_code=422, detail=f"Invalid account name: {account!r}")
+    
+    try:
+        upload = await ImageUpload.open(image, settings.max_upload_bytes)
+        image_path = await publish_queue.save_media(upload)
+    except IngestError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"status": "error", "error": e.message}
+        )
+    
+    items = []
+    for platform in targets:
+        publish_id = await publish_queue.enqueue(platform, text, image_path, account, job_id)
+        items.append({"publish_id": publish_id, "platform": platform})
+    if publish_workers:
+        publish_workers.wake()
+    
+    return {"status": "queued", "items": items}
+
+
+@app.post("/api/v1/publish/now")
+async def publish_now(
+    image: UploadFile = File(...),
+    result: Optional[str] = Form(None),  # Agent result as JSON
+    job_id: Optional[str] = Form(None),
+    platforms: Optional[str] = Form(None),  # Comma-separated string
+    account: Optional[str] = Form(None),
+    timeout: float = Form(300.0)
+):
+    """
+    Publish an agent result's strategies to several platforms concurrently.
+    
+    Takes the strategies from ``result`` or from the results of a completed
+    job, and waits for every platform. Each platform's post URL, latency and
+    error are returned; one platform failing does not affect the others.
+    
+    Posts are made as ``account`` (default: each platform's default login)
+    and count against the same platform and account rate limits as queued
+    ones; returns 429 with Retry-After when any platform's are used up. Without publish workers, the first call starts the publisher's
+    browsers in the background and returns 503 with Retry-After.
+    """
+    if result:
+        try:
+            agent_result = json.loads(result)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="result is not valid JSON")
+    elif job_id:
+        job_state = await job_manager.get_job(job_id)
+        if job_state is None or job_state.results is None:
+            raise HTTPException(status_code=404, detail=f"No results for job {job_id}")
+        agent_result = job_state.results
+    else:
+        raise HTTPException(status_code=422, detail="Either result or job_id is required")
+    if not isinstance(agent_result, dict):
+        raise HTTPException(status_code=422, detail="result must be a JSON object")
+    if account is not None and not ACCOUNT_NAME.fullmatch(account):
+        raise HTTPException(status_code=422, detail=f"Invalid account name: {account!r}")
+    account = account or DEFAULT_ACCOUNT
+    
+    if publisher is None:
+        # Launching the browsers takes seconds; don't make this request wait
+        start_publisher()
+        raise HTTPException(
+            status_code=503,
+            detail="Publisher is starting, please retry later",
+            headers={"Retry-After": "5"}
+        )
+    
+    targets = [p.strip().lower() for p in platforms.split(",") if p.strip()] if platforms else None
+    selected, skipped = publisher.select(agent_result, targets)
+    if not selected:
+        return {"status": "error", "platforms": skipped}
+    
+    try:
+        upload = await ImageUpload.open(image, settings.max_upload_bytes)
+        image_path = await publish_queue.save_media(upload)
+    except IngestError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"status": "error", "error": e.message}
+        )
+    
+    try:
+        wait = await publish_queue.take_tokens(selected, account)
+        if wait is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Publish rate limit reached, please retry later",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+        outcomes = await publisher.publish_all(agent_result, image_path, selected, timeout, account)
+    finally:
+        os.unlink(image_path)
+    outcomes = {**skipped, **outcomes}
+    
+    return {
+        "status": "success" if outcomes and all(o["error"] is None for o in outcomes.values()) else "error",
+        "platforms": outcomes
+    }
+
+
+@app.get("/api/v1/publish/stats")
+async def publish_stats():
+    """Publish queue depth by status and worker counters."""
+    return {
+        "queue": await publish_queue.stats(),
+        "workers": publish_workers.stats() if publish_workers else None,
+        "resources": publisher.stats() if publisher else None
+    }
+
+
+@app.get("/api/v1/publish/metrics", response_class=PlainTextResponse)
+async def publish_metrics():
+    """Poster step and post latency histograms (Prometheus text format)."""
+    return publisher.tracer.render() if publisher else ""
+
+
+@app.get("/api/v1/publish/traces")
+async def publish_traces():
+    """Spans of the most recent posts: per step duration, selector, attempts and outcome."""
+    return {"traces": publisher.tracer.recent() if publisher else []}
+
+
+@app.get("/api/v1/publish/{publish_id}")
+async def get_publish(publish_id: str):
+    """Status, attempts, last error and post URL of a queued post."""
+    job = await publish_queue.get(publish_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Publish {publish_id} not found")
+    job.pop("image_path")
+    return job
+
+
+@app.post("/api/v1/publish/{publish_id}/retry")
+async def retry_publish(publish_id: str):
+    """Put a dead-lettered post back on the queue."""
+    if not await publish_queue.retry(publish_id):
+        raise HTTPException(status_code=409, detail=f"Publish {publish_id} is not dead-lettered")
+    if publish_workers:
+        publish_workers.wake()
+    return await get_publish(publish_id)
+
+
+@app.api_route("/api/images/{name}", methods=["GET", "HEAD"])
+async def get_image(request: Request, name: str, expires: int, sig: str):
+    """
+    Serve an image from the local store through a signed, expiring URL.
+    
+    Supports Range requests; uses sendfile when the server offers it.
+    """
+    if image_store is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    # Check the signature first, so unsigned requests can't probe which images exist
+    if not image_store.verify(name, expires, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired image URL")
+    
+    found = image_store.open(name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    path, content_type = found
+    return ImageFileResponse(path, content_type, request.headers.get("range"))
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
         "main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=True,
+        workers=settings.api_workers,
+        # Development only; uvicorn ignores workers when reloading
+        reload=settings.api_reload,
         log_level=settings.log_level.lower()
     )
 
@@ -0,0 +1 @@
+"""Data models for the Orca orchestrator."""
@@ -0,0 +1,54 @@
+"""Job request, state and response models."""
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a job."""
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobMeta(BaseModel):
+    """Optional job metadata."""
+    product_name: Optional[str] = None
+    locale: Optional[str] = "en-US"
+    target_platforms: Optional[List[str]] = None
+    auto_publish: bool = False
+
+
+class JobRequest(BaseModel):
+    """Job submission payload."""
+    job_id: Optional[str] = None
+    user_id: Optional[str] = None
+    text_prompt: str
+    image_url: Optional[str] = None
+    meta: Optional[JobMeta] = None
+
+
+class JobState(BaseModel):
+    """Persisted state of a job."""
+    job_id: str
+    user_id: Optional[str] = None
+    status: JobStatus = JobStatus.PENDING
+    request: JobRequest
+    created_at: datetime
+    updated_at: datetime
+    results: Optional[Dict[str, Any]] = None
+    error_log: List[str] = Field(default_factory=list)
+
+
+class JobResponse(BaseModel):
+    """API response describing a job."""
+    job_id: str
+    status: JobStatus
+    created_at: datetime
+    updated_at: datetime
+    message: Optional[str] = None
+    results: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
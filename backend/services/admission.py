@@ -0,0 +1,231 @@
+"""Admission control for calls into the external agent."""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from services.shared_slots import SharedSlots
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the wait queue is full; the caller should answer 429."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Admission queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    A reserved place in the admission queue.
+
+    Reserve with :meth:`AdmissionController.reserve` (which rejects
+    immediately when the queue is full), then ``async with ticket:`` to wait
+    for a slot and hold it for the duration of the call. A ticket that will
+    never be entered must be cancelled.
+    """
+
+    def __init__(self, controller: "AdmissionController", user_id: str):
+        self._controller = controller
+        self.user_id = user_id
+        self.reserved_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.slot: Optional[str] = None
+        self._granted = asyncio.get_running_loop().create_future()
+
+    async def __aenter__(self) -> "Ticket":
+        try:
+            await self._granted
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._controller._release(self)
+
+    def cancel(self) -> None:
+        """Give up the reservation, or the slot if it was already granted."""
+        if self._granted.done() and not self._granted.cancelled():
+            self._controller._release(self)
+        else:
+            self._granted.cancel()
+            self._controller._withdraw(self)
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded wait queue and per-user fairness.
+
+    At most ``max_concurrent`` tickets hold a slot at once. Waiting tickets
+    are granted round-robin across users, so one user's burst cannot starve
+    everyone else, and each user may hold at most ``max_queued_per_user``
+    waiting tickets. ``on_admit`` is called with each admitted ticket's
+    wait in seconds.
+
+    With ``shared`` slots, a ticket also needs one of those, so
+    ``max_concurrent`` of this process is further capped by a limit across
+    all worker processes. Shared slots are taken and released in one
+    background thread, in order; while all are held, taking one is retried
+    every ``shared_poll`` seconds.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_queue: int = 64,
+        max_queued_per_user: Optional[int] = None,
+        on_admit: Optional[Callable[[float], None]] = None,
+        shared: Optional[SharedSlots] = None,
+        shared_poll: float = 0.1
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user or max_queue
+        self.on_admit = on_admit
+        self.shared = shared
+        self.shared_poll = shared_poll
+        self._acquirer: Optional[asyncio.Task] = None
+        self._shared_thread = ThreadPoolExecutor(max_workers=1) if shared is not None else None
+        self._active = 0
+        self._queued = 0
+        self._waiting: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()
+
+        self.admitted = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        # Exponentially weighted average of how long a slot is held
+        self._avg_service_time = 0.0
+
+    def retry_after(self) -> int:
+        """Estimated seconds until a new request could be admitted."""
+        per_slot = self._avg_service_time or 1.0
+        return max(1, math.ceil(per_slot * (self._queued + 1) / self.max_concurrent))
+
+    def reserve(self, user_id: str = "anonymous") -> Ticket:
+        """
+        Reserve a place in the queue.
+
+        Raises:
+            QueueFullError: If the queue (or the user's share of it) is full
+        """
+        user_queue = self._waiting.get(user_id)
+        # Free local slots don't mean a ticket is granted: it may still be
+        # waiting for a shared slot
+        queue_full = self._queued >= self.max_queue
+        user_full = user_queue is not None and len(user_queue) >= self.max_queued_per_user
+        if queue_full or user_full:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+
+        ticket = Ticket(self, user_id)
+        self._waiting.setdefault(user_id, deque()).append(ticket)
+        self._queued += 1
+        self._dispatch()
+        return ticket
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting tickets, round-robin across users."""
+        if self.shared is not None:
+            if self._acquirer is None and self._waiting and self._active < self.max_concurrent:
+                self._acquirer = asyncio.get_running_loop().create_task(self._acquire_shared())
+            return
+        while self._active < self.max_concurrent and self._waiting:
+            self._grant(None)
+
+    async def _acquire_shared(self) -> None:
+        """Take shared slots for waiting tickets until none wait or local slots run out."""
+        try:
+            while self._waiting and self._active < self.max_concurrent:
+                try:
+                    slot = await asyncio.get_running_loop().run_in_executor(
+                        self._shared_thread, self.shared.try_acquire
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not take a shared admission slot: {e}")
+                    slot = None
+                if slot is None:
+                    # Held by other processes (or the database is busy)
+                    await asyncio.sleep(self.shared_poll)
+                elif self._waiting and self._active < self.max_concurrent:
+                    self._grant(slot)
+                else:
+                    # The waiting tickets were cancelled meanwhile
+                    self._release_shared(slot)
+        finally:
+            self._acquirer = None
+
+    def _grant(self, slot: Optional[str]) -> None:
+        user_id, user_queue = self._waiting.popitem(last=False)
+        ticket = user_queue.popleft()
+        if user_queue:
+            # Back of the line for this user's next ticket
+            self._waiting[user_id] = user_queue
+
+        self._queued -= 1
+        self._active += 1
+        self.admitted += 1
+        ticket.granted_at = time.monotonic()
+        ticket.slot = slot
+        wait = ticket.granted_at - ticket.reserved_at
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        ticket._granted.set_result(None)
+        if self.on_admit:
+            self.on_admit(wait)
+
+    def _release_shared(self, slot: str) -> None:
+        def release() -> None:
+            try:
+                self.shared.release(slot)
+            except Exception as e:
+                # Reclaimed when this process exits
+                logger.warning(f"Could not release shared admission slot {slot}: {e}")
+
+        # Before any later acquire, which runs in the same thread
+        asyncio.get_running_loop().run_in_executor(self._shared_thread, release)
+
+    def _withdraw(self, ticket: Ticket) -> None:
+        user_queue = self._waiting.get(ticket.user_id)
+        if user_queue and ticket in user_queue:
+            user_queue.remove(ticket)
+            self._queued -= 1
+            if not user_queue:
+                del self._waiting[ticket.user_id]
+
+    def _release(self, ticket: Ticket) -> None:
+        if ticket.granted_at is None:
+            return
+        held = time.monotonic() - ticket.granted_at
+        ticket.granted_at = None
+        if ticket.slot is not None:
+            self._release_shared(ticket.slot)
+            ticket.slot = None
+        self._avg_service_time = (
+            held if not self._avg_service_time else 0.8 * self._avg_service_time + 0.2 * held
+        )
+        self._active -= 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight count and wait times."""
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "queued_users": len(self._waiting),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self._total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self._max_wait,
+            "avg_service_seconds": self._avg_service_time,
+            # As of the last acquire or release; querying would block the loop
+            "shared_slots_held": self.shared.last_held if self.shared else None,
+        }
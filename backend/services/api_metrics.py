@@ -0,0 +1,165 @@
+"""Request and pipeline-stage metrics for the API apps, served on /metrics."""
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.admission import AdmissionController
+from services.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+# Seconds; cache hits take milliseconds, agent runs minutes
+REQUEST_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class ApiMetrics:
+    """
+    Request counts, latencies and in-flight gauges per route, and
+    latencies and error classes per upstream stage (tmpfiles.org upload,
+    agent webhook, ...), in one :class:`MetricsRegistry`.
+
+    Requests are labelled by route template (``/api/v1/jobs/{job_id}``),
+    never by raw path, so label sets stay bounded.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        register = self.registry.register
+        self.requests = register(Counter(
+            "http_requests_total",
+            "HTTP requests by route, method and status",
+            ("route", "method", "status")
+        ))
+        self.request_seconds = register(Histogram(
+            "http_request_duration_seconds",
+            "Time until the last byte of the response",
+            ("route", "method"),
+            REQUEST_BUCKETS
+        ))
+        self.in_flight = register(Gauge(
+            "http_requests_in_flight",
+            "Requests being handled",
+            ("route",)
+        ))
+        self.exceptions = register(Counter(
+            "http_request_exceptions_total",
+            "Requests that raised instead of returning a response",
+            ("route", "error")
+        ))
+        self.stage_seconds = register(Histogram(
+            "pipeline_stage_duration_seconds",
+            "Duration of upload pipeline and orchestration stages",
+            ("stage", "outcome"),
+            REQUEST_BUCKETS
+        ))
+        self.stage_errors = register(Counter(
+            "pipeline_stage_errors_total",
+            "Failed stages by error class",
+            ("stage", "error")
+        ))
+        self.admission_active = register(Gauge(
+            "agent_admission_active",
+            "Agent calls holding an admission slot"
+        ))
+        self.admission_queued = register(Gauge(
+            "agent_admission_queued",
+            "Requests waiting for an agent admission slot"
+        ))
+
+    def observe_stage(self, stage: str, seconds: float, outcome: str = "ok") -> None:
+        self.stage_seconds.observe(seconds, stage=stage, outcome=outcome)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the block as one stage; exceptions count as errors and propagate."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.observe_stage(name, time.perf_counter() - started, "error")
+            self.stage_errors.inc(stage=name, error=type(e).__name__)
+            raise
+        self.observe_stage(name, time.perf_counter() - started)
+
+    def watch_admission(self, limiter: AdmissionController) -> None:
+        """Export the limiter's slot and queue counts as gauges."""
+        def collect() -> None:
+            stats = limiter.stats()
+            self.admission_active.set(stats["active"])
+            self.admission_queued.set(stats["queued"])
+
+        self.registry.on_collect(collect)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request in :class:`ApiMetrics`.
+
+    The request is timed until the last body chunk is sent, so background
+    tasks that run after the response don't count. Add it last so it wraps
+    the other middleware, including early rejections.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: "ApiMetrics", routes: List[BaseRoute]):
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+
+    def route_of(self, scope: Scope) -> str:
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                # Path matched, method didn't (a 405)
+                partial = route.path
+        return partial or "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        route = self.route_of(scope)
+        method = scope["method"]
+        started = time.perf_counter()
+        status = 500
+        finished = False
+        metrics.in_flight.inc(route=route)
+
+        def finish() -> None:
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            metrics.in_flight.dec(route=route)
+            metrics.requests.inc(route=route, method=method, status=str(status))
+            metrics.request_seconds.observe(time.perf_counter() - started, route=route, method=method)
+
+        async def send_and_record(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        except BaseException as e:
+            metrics.exceptions.inc(route=route, error=type(e).__name__)
+            raise
+        finally:
+            finish()
+
+
+# Global metrics instance shared by the apps and the upload pipeline
+api_metrics = ApiMetrics()
@@ -0,0 +1,207 @@
+"""Long-lived Playwright browsers with per-account contexts and standby pages."""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+from services.resource_policy import ResourcePolicy
+
+logger = logging.getLogger(__name__)
+
+# Prepares a fresh page for posting, e.g. opens the home feed
+PageWarmer = Callable[[Page], Awaitable[None]]
+# Called with (account, context) for every new context, e.g. to add routes
+ContextHook = Callable[[str, BrowserContext], Awaitable[None]]
+
+LAUNCH_OPTIONS: Dict[str, Dict[str, Any]] = {
+    "firefox": {
+        "firefox_user_prefs": {
+            "dom.webdriver.enabled": False,
+            "useAutomationExtension": False
+        }
+    },
+    "chromium": {},
+}
+
+
+class BrowserPool:
+    """
+    One warm browser per engine, shared by every post.
+
+    Each account gets its own ``BrowserContext`` (created from its storage
+    state on first use and kept, cookies and all, for later posts), and
+    posts for the same account are serialized. With ``standby`` enabled,
+    a replacement page is warmed in the background after every post so the
+    next one starts on an already loaded feed.
+
+    Contexts opened with a ``policy`` route their requests through it, so
+    pages skip media, fonts and trackers; ``block_resources=False`` turns
+    that off for every context. ``on_context`` is called for every new
+    context after its policy is installed.
+    """
+
+    def __init__(
+        self,
+        headless: bool = False,
+        standby: bool = False,
+        standby_max_age: float = 600.0,
+        block_resources: bool = True,
+        on_context: Optional[ContextHook] = None
+    ):
+        self.headless = headless
+        self.standby = standby
+        self.block_resources = block_resources
+        self.on_context = on_context
+        self.standby_max_age = standby_max_age
+        self._playwright: Optional[Playwright] = None
+        self._browsers: Dict[str, Browser] = {}
+        self._contexts: Dict[str, BrowserContext] = {}
+        # Parked pages: account -> (page, warmed at)
+        self._standby_pages: Dict[str, Tuple[Page, float]] = {}
+        self._standby_tasks: Dict[str, asyncio.Task] = {}
+        self._engine_locks: Dict[str, asyncio.Lock] = {}
+        self._account_locks: Dict[str, asyncio.Lock] = {}
+
+    async def __aenter__(self) -> "BrowserPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+    async def browser(self, engine: str) -> Browser:
+        """Get the browser for an engine, launching it (again) if needed."""
+        async with self._engine_locks.setdefault(engine, asyncio.Lock()):
+            browser = self._browsers.get(engine)
+            if browser is None or not browser.is_connected():
+                await self.start()
+                started = time.perf_counter()
+                browser = await getattr(self._playwright, engine).launch(
+                    headless=self.headless, **LAUNCH_OPTIONS.get(engine, {})
+                )
+                logger.info(f"Launched {engine} in {time.perf_counter() - started:.2f}s")
+                self._browsers[engine] = browser
+            return browser
+
+    async def context(
+        self,
+        account: str,
+        engine: str,
+        storage_state: Optional[str] = None,
+        policy: Optional[ResourcePolicy] = None,
+        **options
+    ) -> BrowserContext:
+        """
+        Get an account's context, creating it from its storage state file on
+        first use or after its browser went away.
+        """
+        browser = await self.browser(engine)
+        context = self._contexts.get(account)
+        if context is None or context.browser is not browser:
+            context = await browser.new_context(storage_state=storage_state, **options)
+            if policy is not None and self.block_resources:
+                await policy.install(context)
+            if self.on_context is not None:
+                await self.on_context(account, context)
+            self._contexts[account] = context
+            self._standby_pages.pop(account, None)
+        return context
+
+    async def _warm_page(self, context: BrowserContext, warm: Optional[PageWarmer]) -> Page:
+        page = await context.new_page()
+        try:
+            if warm is not None:
+                await warm(page)
+        except BaseException:
+            await page.close()
+            raise
+        return page
+
+    def _take_standby(self, account: str) -> Optional[Page]:
+        page, warmed_at = self._standby_pages.pop(account, (None, 0.0))
+        if page is None:
+            return None
+        if page.is_closed() or time.monotonic() - warmed_at > self.standby_max_age:
+            asyncio.create_task(page.close())
+            return None
+        return page
+
+    async def _park(self, account: str, context: BrowserContext, warm: Optional[PageWarmer]) -> None:
+        try:
+            page = await self._warm_page(context, warm)
+        except Exception as e:
+            logger.warning(f"Could not warm a standby page for {account}: {e}")
+            return
+        self._standby_pages[account] = (page, time.monotonic())
+
+    @asynccontextmanager
+    async def page(
+        self,
+        account: str,
+        engine: str,
+        storage_state: Optional[str] = None,
+        warm: Optional[PageWarmer] = None,
+        policy: Optional[ResourcePolicy] = None,
+        **options
+    ) -> AsyncIterator[Page]:
+        """
+        Hold an account and get a warmed page for it.
+
+        Args:
+            account: Account key; one context and one post at a time per key
+            engine: "firefox" or "chromium"
+            storage_state: Storage state file to create the context from
+            warm: Called on fresh pages before they are handed out
+            policy: Request-routing policy for a new context
+            **options: Passed to ``browser.new_context``
+        """
+        async with self._account_locks.setdefault(account, asyncio.Lock()):
+            standby_task = self._standby_tasks.pop(account, None)
+            if standby_task is not None:
+                await asyncio.shield(standby_task)
+
+            context = await self.context(account, engine, storage_state, policy, **options)
+            page = self._take_standby(account) or await self._warm_page(context, warm)
+            try:
+                yield page
+            finally:
+                await page.close()
+                if self.standby:
+                    self._standby_tasks[account] = asyncio.create_task(
+                        self._park(account, context, warm)
+                    )
+
+    async def save_state(self, account: str, path: str) -> None:
+        """Write an account's current cookies and storage to a file."""
+        context = self._contexts.get(account)
+        if context is not None:
+            await context.storage_state(path=path)
+
+    async def close(self) -> None:
+        """Close every page, context and browser."""
+        for task in self._standby_tasks.values():
+            task.cancel()
+        self._standby_tasks.clear()
+        self._standby_pages.clear()
+        for context in self._contexts.values():
+            try:
+                await context.close()
+            except Exception:
+                pass
+        self._contexts.clear()
+        for browser in self._browsers.values():
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
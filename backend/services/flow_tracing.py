@@ -0,0 +1,219 @@
+"""Spans, latency histograms and on-demand Playwright traces for posting flows."""
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from playwright.async_api import BrowserContext, Error as PlaywrightError
+
+from services.metrics import Counter, Histogram, Metric, render
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    One timed part of a post: a flow step, or the page opening and URL
+    discovery around the flow.
+
+    Outcomes: ``ok``, ``fallback`` (the step's fallback action ran),
+    ``skipped`` (an optional step failed) or ``failed``.
+    """
+
+    def __init__(self, platform: str, name: str):
+        self.platform = platform
+        self.name = name
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.selector: Optional[str] = None
+        self.attempts = 0
+        self.outcome: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ended(self) -> bool:
+        return self.outcome is not None
+
+    def end(self, outcome: str = "ok", error: Optional[str] = None) -> None:
+        if self.ended:
+            return
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.outcome = outcome
+        self.error = error
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is None:
+            self.end()
+        else:
+            self.end("failed", f"{type(exc).__name__}: {exc}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1) if self.duration_ms is not None else None,
+            "selector": self.selector,
+            "attempts": self.attempts,
+            "outcome": self.outcome,
+            "error": self.error,
+        }
+
+
+class FlowTrace:
+    """The spans of one post, in order."""
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans: List[Span] = []
+        self.duration_ms: Optional[float] = None
+        self.outcome: Optional[str] = None
+        self.error: Optional[str] = None
+        self.playwright_trace: Optional[str] = None
+
+    def span(self, name: str) -> Span:
+        """Start a span; end it with ``end()`` or use it as a context manager."""
+        span = Span(self.platform, name)
+        self.spans.append(span)
+        return span
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def durations(self) -> Dict[str, float]:
+        """Milliseconds per span name, for one-line summaries."""
+        durations: Dict[str, float] = {}
+        for span in self.spans:
+            if span.duration_ms is not None:
+                durations[span.name] = durations.get(span.name, 0.0) + span.duration_ms
+        return durations
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "platform": self.platform,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1) if self.duration_ms is not None else None,
+            "outcome": self.outcome,
+            "error": self.error,
+            "playwright_trace": self.playwright_trace,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class FlowTracer:
+    """
+    Collects post traces into per-platform, per-step latency histograms.
+
+    ``render()`` exports them in the Prometheus text format and
+    ``recent()`` returns the last ``keep`` traces. With ``trace_dir`` set,
+    :meth:`recording` captures a Playwright trace (screenshots and DOM
+    snapshots) of each post but only keeps it when the post failed or took
+    longer than ``slow_ms``.
+    """
+
+    def __init__(
+        self,
+        trace_dir: Optional[str] = None,
+        slow_ms: float = 60000.0,
+        keep: int = 50
+    ):
+        self.trace_dir = trace_dir
+        self.slow_ms = slow_ms
+        self._recent: Deque[FlowTrace] = deque(maxlen=keep)
+        self.step_seconds = Histogram(
+            "poster_step_duration_seconds",
+            "Duration of posting flow steps",
+            ("platform", "step", "outcome")
+        )
+        self.post_seconds = Histogram(
+            "poster_post_duration_seconds",
+            "End-to-end duration of posts",
+            ("platform", "outcome")
+        )
+        self.step_retries = Counter(
+            "poster_step_retries_total",
+            "Extra attempts made by repeating flow steps",
+            ("platform", "step")
+        )
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+
+    @contextmanager
+    def trace(self, platform: str) -> Iterator[FlowTrace]:
+        """Trace one post; recorded when the block exits, failed or not."""
+        trace = FlowTrace(platform)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.outcome, trace.error = "failed", f"{type(e).__name__}: {e}"
+            raise
+        else:
+            trace.outcome = "ok"
+        finally:
+            self.record(trace)
+
+    def record(self, trace: FlowTrace) -> None:
+        trace.duration_ms = trace.elapsed_ms()
+        for span in trace.spans:
+            # Spans still open when the post failed, e.g. a page that never loaded
+            span.end("failed", trace.error)
+            self.step_seconds.observe(
+                span.duration_ms / 1000, platform=trace.platform, step=span.name, outcome=span.outcome
+            )
+            if span.attempts > 1:
+                self.step_retries.inc(span.attempts - 1, platform=trace.platform, step=span.name)
+        self.post_seconds.observe(trace.duration_ms / 1000, platform=trace.platform, outcome=trace.outcome)
+        self._recent.append(trace)
+
+    @asynccontextmanager
+    async def recording(self, context: BrowserContext, trace: FlowTrace) -> AsyncIterator[None]:
+        """Capture a Playwright trace of the block, kept only if slow or failed."""
+        if not self.trace_dir:
+            yield
+            return
+
+        try:
+            await context.tracing.start(screenshots=True, snapshots=True)
+        except PlaywrightError as e:
+            logger.warning(f"Could not start Playwright tracing: {e}")
+            yield
+            return
+
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            path = None
+            if failed or trace.elapsed_ms() > self.slow_ms:
+                path = os.path.join(
+                    self.trace_dir,
+                    f"{trace.platform}-{time.strftime('%Y%m%d-%H%M%S')}-{'failed' if failed else 'slow'}.zip"
+                )
+            try:
+                await context.tracing.stop(path=path)
+                if path:
+                    trace.playwright_trace = path
+                    logger.info(f"Saved Playwright trace of {trace.platform} post to {path}")
+            except PlaywrightError as e:
+                logger.warning(f"Could not stop Playwright tracing: {e}")
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """The most recent traces, newest first."""
+        return [trace.to_dict() for trace in reversed(self._recent)]
+
+    def metrics(self) -> List[Metric]:
+        """The step and post histograms and the retry counter, e.g. to register them."""
+        return [self.step_seconds, self.post_seconds, self.step_retries]
+
+    def render(self) -> str:
+        return render(self.metrics())
@@ -0,0 +1,89 @@
+"""Shared async HTTP client for outbound calls (tmpfiles.org, external agent)."""
+import asyncio
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class PooledHTTPClient:
+    """
+    Keep-alive pooled HTTP client with per-host connection limits.
+
+    One instance is created in the application lifespan and shared by every
+    request, so connections to the same upstream are reused instead of being
+    opened (and TLS-negotiated) per call.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_per_host: int = 20,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        write_timeout: float = 30.0,
+        pool_timeout: float = 10.0,
+    ):
+        self._timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=write_timeout,
+            pool=pool_timeout,
+        )
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=self._timeout,
+        )
+        self._max_per_host = max_per_host
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent requests to the URL's host."""
+        host = urlsplit(url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = asyncio.Semaphore(self._max_per_host)
+            self._host_slots[host] = slot
+        return slot
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        read_timeout: Optional[float] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request through the shared pool.
+
+        Args:
+            method: HTTP method
+            url: Target URL
+            read_timeout: Optional read timeout override for slow upstreams
+            **kwargs: Passed through to httpx
+
+        Returns:
+            The upstream response
+        """
+        if read_timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(
+                connect=self._timeout.connect,
+                read=read_timeout,
+                write=self._timeout.write,
+                pool=self._timeout.pool,
+            )
+
+        async with self._host_slot(url):
+            return await self._client.request(method, url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """Send a POST request through the shared pool."""
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close all pooled connections."""
+        await self._client.aclose()
@@ -0,0 +1,234 @@
+"""Streaming, size-bounded ingestion of uploaded images."""
+import asyncio
+import hashlib
+import os
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import AsyncIterator, BinaryIO, ContextManager, Iterator, Optional, Tuple
+
+from fastapi import UploadFile
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Slack allowed on top of the image size for multipart boundaries and headers
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class IngestError(Exception):
+    """Raised when an upload is rejected during ingestion."""
+
+    status_code = 400
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class UnsupportedImageError(IngestError):
+    """The upload is not a PNG, JPEG or WebP image."""
+
+    status_code = 400
+
+
+class ImageTooLargeError(IngestError):
+    """The upload exceeds the configured maximum size."""
+
+    status_code = 413
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """
+    Detect the image type from its leading magic bytes.
+
+    Args:
+        head: First bytes of the file (at least 12)
+
+    Returns:
+        Canonical content type, or None if the format is not supported
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def exceeds_upload_limit(content_length: Optional[str], max_bytes: int) -> bool:
+    """Check a request's Content-Length header against the upload limit."""
+    if not content_length or not content_length.isdigit():
+        return False
+    return int(content_length) > max_bytes + MULTIPART_OVERHEAD
+
+
+class ImageSource(ABC):
+    """An image that can be read in chunks and forwarded upstream."""
+
+    filename: str
+    content_type: str
+    size: Optional[int]
+
+    @abstractmethod
+    def chunks(self) -> AsyncIterator[bytes]:
+        """Yield the image in chunks."""
+
+    @abstractmethod
+    def open_file(self) -> ContextManager[BinaryIO]:
+        """
+        The whole image as a seekable binary file, for decoders that need
+        random access. Blocking; use it from a worker thread.
+        """
+
+    def multipart(self, field_name: str = "file") -> Tuple[dict, AsyncIterator[bytes]]:
+        """
+        Build a streamed multipart/form-data body containing the image.
+
+        Returns:
+            Tuple of (request headers, async body iterator)
+        """
+        boundary = uuid.uuid4().hex
+        filename = self.filename.replace('"', "%22")
+        preamble = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f"Content-Type: {self.content_type}\r\n\r\n"
+        ).encode()
+        epilogue = f"\r\n--{boundary}--\r\n".encode()
+
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if self.size is not None:
+            headers["Content-Length"] = str(len(preamble) + self.size + len(epilogue))
+
+        async def body() -> AsyncIterator[bytes]:
+            yield preamble
+            async for chunk in self.chunks():
+                yield chunk
+            yield epilogue
+
+        return headers, body()
+
+
+class ImageFile(ImageSource):
+    """An image stored in a local file, e.g. the output of normalization."""
+
+    def __init__(
+        self,
+        path: str,
+        filename: str,
+        content_type: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = os.path.getsize(path)
+        self._chunk_size = chunk_size
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, self._chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def open_file(self) -> ContextManager[BinaryIO]:
+        return open(self.path, "rb")
+
+    def remove(self) -> None:
+        """Delete the backing file."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class ImageUpload(ImageSource):
+    """
+    An uploaded image validated by magic bytes and read in bounded chunks.
+
+    The multipart parser has already spooled the body to a temporary file, so
+    the image is only ever held in memory one chunk at a time.
+    """
+
+    def __init__(
+        self,
+        file: UploadFile,
+        content_type: str,
+        head: bytes,
+        max_bytes: int,
+        chunk_size: int
+    ):
+        self.file = file
+        self.filename = file.filename or "upload"
+        self.content_type = content_type
+        self.size = file.size
+        self.max_bytes = max_bytes
+        self._head = head
+        self._chunk_size = chunk_size
+        self._digest: Optional[str] = None
+
+    @classmethod
+    async def open(
+        cls,
+        file: UploadFile,
+        max_bytes: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> "ImageUpload":
+        """
+        Validate an upload from its size and first chunk.
+
+        Raises:
+            ImageTooLargeError: If the upload is over max_bytes
+            UnsupportedImageError: If the magic bytes are not a supported image
+        """
+        if file.size is not None and file.size > max_bytes:
+            raise ImageTooLargeError(f"Image exceeds maximum size of {max_bytes} bytes")
+
+        await file.seek(0)
+        head = await file.read(chunk_size)
+
+        content_type = sniff_image_type(head)
+        if content_type is None:
+            raise UnsupportedImageError("Invalid image format")
+
+        return cls(file, content_type, head, max_bytes, chunk_size)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """Yield the image in chunks, enforcing the size limit as it goes."""
+        total = len(self._head)
+        yield self._head
+
+        await self.file.seek(total)
+        while True:
+            chunk = await self.file.read(self._chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > self.max_bytes:
+                raise ImageTooLargeError(f"Image exceeds maximum size of {self.max_bytes} bytes")
+            yield chunk
+
+    @contextmanager
+    def open_file(self) -> Iterator[BinaryIO]:
+        """
+        The upload's spooled temporary file, rewound. It stays open for
+        later reads.
+
+        Raises:
+            ImageTooLargeError: If the upload is over max_bytes
+        """
+        f = self.file.file
+        if f.seek(0, os.SEEK_END) > self.max_bytes:
+            raise ImageTooLargeError(f"Image exceeds maximum size of {self.max_bytes} bytes")
+        f.seek(0)
+        yield f
+
+    async def digest(self) -> str:
+        """Hex sha256 of the image, computed in one chunked pass and memoized."""
+        if self._digest is None:
+            sha = hashlib.sha256()
+            async for chunk in self.chunks():
+                sha.update(chunk)
+            self._digest = sha.hexdigest()
+        return self._digest
@@ -0,0 +1,140 @@
+"""Image normalization (orientation, metadata, size, encoding) in a process pool."""
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePath
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from services.image_ingest import ImageFile, ImageSource, UnsupportedImageError
+
+OUTPUT_FORMATS = {
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+}
+
+
+def normalize_image(
+    src_path: str,
+    dst_path: str,
+    max_edge: int,
+    output_format: str,
+    quality: int
+) -> Dict[str, Any]:
+    """
+    Normalize an image file. Runs in a worker process.
+
+    Applies the EXIF orientation, drops all metadata, downscales so the
+    longest edge is at most max_edge and re-encodes at the target quality.
+
+    Returns:
+        Output width, height and size in bytes
+    """
+    pil_format = OUTPUT_FORMATS[output_format][0]
+
+    with Image.open(src_path) as image:
+        # Let the JPEG decoder downscale by a power of two while decoding
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        # No exif/icc arguments, so no metadata is written
+        if pil_format == "JPEG":
+            image.save(dst_path, "JPEG", quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(dst_path, "WEBP", quality=quality, method=4)
+
+        width, height = image.size
+
+    return {"width": width, "height": height, "bytes": os.path.getsize(dst_path)}
+
+
+class ImageNormalizer:
+    """
+    Runs :func:`normalize_image` in a process pool so decoding and encoding
+    never block the event loop.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_edge: int = 2048,
+        output_format: str = "webp",
+        quality: int = 85
+    ):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.max_edge = max_edge
+        self.output_format = output_format
+        self.quality = quality
+        self._pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    @property
+    def signature(self) -> str:
+        """Identifies the settings, for use in cache keys."""
+        return f"{self.max_edge}:{self.output_format}:{self.quality}"
+
+    async def normalize(self, source: ImageSource) -> Tuple[ImageFile, Dict[str, Any]]:
+        """
+        Normalize an image.
+
+        Returns:
+            Tuple of (normalized image in a temporary file, stats including
+            bytes saved). The caller removes the file when done with it.
+
+        Raises:
+            UnsupportedImageError: If the image cannot be decoded
+        """
+        _, content_type, extension = OUTPUT_FORMATS[self.output_format]
+
+        src_fd, src_path = tempfile.mkstemp(prefix="kaffe-src-")
+        dst_fd, dst_path = tempfile.mkstemp(prefix="kaffe-norm-", suffix=extension)
+        os.close(dst_fd)
+        try:
+            original_bytes = 0
+            with os.fdopen(src_fd, "wb") as src:
+                async for chunk in source.chunks():
+                    original_bytes += len(chunk)
+                    await asyncio.to_thread(src.write, chunk)
+
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(
+                    self._pool,
+                    normalize_image,
+                    src_path,
+                    dst_path,
+                    self.max_edge,
+                    self.output_format,
+                    self.quality
+                )
+            except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+                raise UnsupportedImageError("Invalid image format")
+        except BaseException:
+            os.unlink(dst_path)
+            raise
+        finally:
+            os.unlink(src_path)
+
+        filename = str(PurePath(source.filename).with_suffix(extension))
+        normalized = ImageFile(dst_path, filename, content_type)
+        stats = {
+            "original_bytes": original_bytes,
+            "normalized_bytes": result["bytes"],
+            "bytes_saved": original_bytes - result["bytes"],
+            "width": result["width"],
+            "height": result["height"],
+            "format": self.output_format,
+        }
+        return normalized, stats
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,282 @@
+"""Content-addressed local image store with signed, expiring read URLs."""
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import re
+import secrets
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+}
+CONTENT_TYPES = {ext: content_type for content_type, ext in EXTENSIONS.items()}
+
+BLOB_NAME = re.compile(r"^([0-9a-f]{64})\.(png|jpg|webp)$")
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ImageStore:
+    """
+    Images stored on local disk under their sha256 digest.
+
+    Blobs live at ``<root>/<first two hex chars>/<digest>.<ext>``, so an image
+    uploaded twice is stored once. Read URLs are HMAC-signed with an expiry,
+    and old or excess blobs are evicted by :meth:`evict`. Without a
+    ``secret``, one is generated once and kept in ``<root>/.url_secret``, so
+    every worker sharing the root signs and verifies with the same key.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        secret: Optional[str] = None,
+        url_ttl: int = 3600,
+        max_age: int = 24 * 3600,
+        max_bytes: int = 2 * 1024 * 1024 * 1024
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._secret = (secret or self._shared_secret()).encode()
+        self.url_ttl = url_ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+    def _shared_secret(self) -> str:
+        path = self.root / ".url_secret"
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            # Linking fails if another worker created the file first
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+        return path.read_text().strip()
+
+    def _blob_path(self, name: str) -> Path:
+        return self.root / name[:2] / name
+
+    async def put(self, chunks: AsyncIterator[bytes], content_type: str) -> str:
+        """
+        Write an image to the store while hashing it.
+
+        Args:
+            chunks: Image bytes in chunks
+            content_type: Sniffed image content type
+
+        Returns:
+            Blob name (``<sha256>.<ext>``)
+        """
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    await asyncio.to_thread(tmp.write, chunk)
+
+            name = f"{digest.hexdigest()}.{EXTENSIONS[content_type]}"
+            path = self._blob_path(name)
+            path.parent.mkdir(exist_ok=True)
+            if path.exists():
+                # Already stored; refresh it so eviction treats it as recent
+                os.utime(path)
+                os.unlink(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+            return name
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _signature(self, name: str, expires: int) -> str:
+        return hmac.new(self._secret, f"{name}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def signed_url(self, base_url: str, name: str, ttl: Optional[int] = None) -> str:
+        """Build an expiring, signed URL for a stored image."""
+        expires = int(time.time()) + (ttl if ttl is not None else self.url_ttl)
+        query = urlencode({"expires": expires, "sig": self._signature(name, expires)})
+        return f"{base_url.rstrip('/')}/api/images/{name}?{query}"
+
+    def verify(self, name: str, expires: int, sig: str) -> bool:
+        """Check a read URL's signature and expiry."""
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(name, expires), sig)
+
+    def open(self, name: str) -> Optional[Tuple[Path, str]]:
+        """
+        Look up a stored image.
+
+        Returns:
+            Tuple of (path, content type), or None if it is not stored
+        """
+        match = BLOB_NAME.match(name)
+        if not match:
+            return None
+        path = self._blob_path(name)
+        if not path.is_file():
+            return None
+        return path, CONTENT_TYPES[match.group(2)]
+
+    def evict(self) -> int:
+        """
+        Delete blobs older than max_age, then the oldest blobs until the store
+        is under max_bytes.
+
+        Returns:
+            Number of blobs deleted
+        """
+        now = time.time()
+        blobs: List[Tuple[float, int, Path]] = []
+        removed = 0
+
+        for path in self.root.glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                blobs.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in blobs)
+        for _, size, path in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} images from {self.root}")
+        return removed
+
+    async def run_eviction(self, interval: float) -> None:
+        """Evict periodically until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.evict)
+            except Exception as e:
+                logger.error(f"Image store eviction failed: {e}", exc_info=True)
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header.
+
+    Returns:
+        Inclusive (start, end) byte offsets, or None to serve the whole file
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    if not range_header:
+        return None
+    match = RANGE_HEADER.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        # Multi-range and malformed headers are ignored, as RFC 9110 allows
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class ImageFileResponse(Response):
+    """
+    Serve a stored image, honouring ``Range`` requests.
+
+    Uses the ASGI ``http.response.zerocopysend`` extension (sendfile) when the
+    server offers it, and falls back to chunked reads otherwise.
+    """
+
+    def __init__(self, path: Path, content_type: str, range_header: Optional[str] = None):
+        super().__init__(media_type=content_type)
+        self.path = path
+        size = path.stat().st_size
+
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            self.status_code = 416
+            self.offset, self.count = 0, 0
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            return
+
+        if byte_range is None:
+            self.offset, self.count = 0, size
+        else:
+            start, end = byte_range
+            self.status_code = 206
+            self.offset, self.count = start, end - start + 1
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        self.headers["content-length"] = str(self.count)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["cache-control"] = "private, max-age=3600, immutable"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope.get("method") == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": self.offset,
+                    "count": self.count,
+                })
+                return
+
+            f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,210 @@
+"""Job state management."""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from models.job import JobRequest, JobState, JobStatus
+from services.job_store import InMemoryJobStore, JobStore
+
+
+TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+class JobManager:
+    """
+    Job state management on top of a pluggable :class:`JobStore`.
+
+    Every status transition and completed pipeline stage is also appended to
+    a per-job event log with increasing IDs, kept in the store, which
+    :meth:`events` streams to push subscribers. Subscribers are woken at
+    once by events from this process and pick up events written by other
+    workers every ``poll_interval`` seconds.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, poll_interval: float = 0.5):
+        self._store = store or InMemoryJobStore()
+        self.poll_interval = poll_interval
+        self._lock = asyncio.Lock()
+        self._changed = asyncio.Condition()
+
+    def use_store(self, store: JobStore) -> None:
+        """Switch to a configured store (called once at startup)."""
+        self._store.close()
+        self._store = store
+
+    def close(self) -> None:
+        """Close the underlying store."""
+        self._store.close()
+
+    async def _emit(
+        self,
+        job_id: str,
+        event: str,
+        data: Dict[str, Any],
+        stage: Optional[str] = None
+    ) -> None:
+        """Append an event to a job's log and wake subscribers."""
+        if await self._store.add_event(job_id, event, data, stage) is None:
+            return
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _status_event(self, job: JobState) -> Dict[str, Any]:
+        data = {"status": job.status.value, "updated_at": job.updated_at.isoformat()}
+        if job.status == JobStatus.COMPLETED:
+            data["results"] = job.results
+        elif job.status == JobStatus.FAILED and job.error_log:
+            data["error"] = job.error_log[-1]
+        return data
+
+    async def create_job(self, request: JobRequest) -> str:
+        """
+        Register a new pending job.
+
+        Args:
+            request: Job request; its job_id is used if provided
+
+        Returns:
+            The job ID
+        """
+        job_id = request.job_id or str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+
+        job = JobState(
+            job_id=job_id,
+            user_id=request.user_id,
+            request=request,
+            created_at=now,
+            updated_at=now
+        )
+        async with self._lock:
+            await self._store.create(job)
+            await self._emit(job_id, "status", self._status_event(job))
+
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[JobState]:
+        """Get a job's state, or None if it does not exist."""
+        return await self._store.get(job_id)
+
+    async def update_status(
+        self,
+        job_id: str,
+        status: JobStatus,
+        results: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> Optional[JobState]:
+        """
+        Move a job to a new status, optionally storing results or an error.
+
+        Returns:
+            The updated job state, or None if the job does not exist
+        """
+        async with self._lock:
+            job = await self._store.get(job_id)
+            if job is None:
+                return None
+            changed = job.status != status
+            job.status = status
+            if results is not None:
+                job.results = results
+            if error is not None:
+                job.error_log.append(error)
+            job.updated_at = datetime.now(timezone.utc)
+            await self._store.save(job)
+            if changed:
+                await self._emit(job_id, "status", self._status_event(job))
+            return job
+
+    async def record_stage(
+        self,
+        job_id: str,
+        stage: str,
+        data: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Record a completed pipeline stage.
+
+        Each stage is emitted once per job; repeated calls are ignored.
+        """
+        await self._emit(job_id, "stage", {"stage": stage, **(data or {})}, stage=stage)
+
+    async def events(
+        self,
+        job_id: str,
+        after: int = 0,
+        heartbeat: float = 15.0
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Stream a job's events with IDs greater than ``after``.
+
+        Yields None as a heartbeat when nothing happened for ``heartbeat``
+        seconds. Ends after the job's terminal status event has been sent.
+        """
+        sent = after
+        quiet_since = time.monotonic()
+        check_job = True
+        while True:
+            events = await self._store.get_events(job_id, after=sent)
+            for event in events:
+                sent = event["id"]
+                yield event
+                if self._is_terminal(event):
+                    return
+
+            now = time.monotonic()
+            if events:
+                quiet_since = now
+            elif check_job:
+                # Nothing new: stop if the job is gone or already over
+                job = await self._store.get(job_id)
+                if job is None:
+                    return
+                if job.status in TERMINAL_STATUSES:
+                    # Another worker may save the status just before logging it
+                    await asyncio.sleep(self.poll_interval)
+                    for event in await self._store.get_events(job_id, after=sent):
+                        yield event
+                    return
+            check_job = False
+            if now - quiet_since >= heartbeat:
+                quiet_since = now
+                check_job = True
+                yield None
+
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    @staticmethod
+    def _is_terminal(event: Dict[str, Any]) -> bool:
+        return event["event"] == "status" and event["data"]["status"] in (
+            status.value for status in TERMINAL_STATUSES
+        )
+
+    async def list_jobs(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[JobStatus] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List job summaries, newest first, with optional filters.
+
+        Returns:
+            Tuple of (summaries, cursor for the next page or None)
+        """
+        return await self._store.list(user_id=user_id, status=status, limit=limit, cursor=cursor)
+
+    async def count_unfinished(self) -> Dict[str, int]:
+        """Number of pending and processing jobs, across all workers sharing the store."""
+        return await self._store.count([JobStatus.PENDING, JobStatus.PROCESSING])
+
+
+# Global job manager instance
+job_manager = JobManager()
@@ -0,0 +1,371 @@
+"""Pluggable job state storage backends."""
+import asyncio
+import base64
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from models.job import JobState, JobStatus
+
+# Fields available in job listings; served from indexed columns only, so a
+# listing never loads job results
+SUMMARY_FIELDS = ("job_id", "user_id", "status", "created_at", "updated_at", "has_results")
+
+
+class JobExistsError(ValueError):
+    """Raised when creating a job whose ID is already taken."""
+
+
+def order_column(user_id: Optional[str], status: Optional[JobStatus]) -> str:
+    """
+    Pick the listing order so each filter is served by an index:
+    status-only listings follow (status, updated_at), everything else
+    (user_id, created_at) or created_at.
+    """
+    return "updated_at" if status is not None and user_id is None else "created_at"
+
+
+def encode_cursor(order: str, value: float, job_id: str) -> str:
+    """Encode a keyset pagination position."""
+    raw = json.dumps([order, value, job_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> Tuple[float, str]:
+    """
+    Decode a keyset pagination position.
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another ordering
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_order, value, job_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_order != order:
+        raise ValueError("Cursor does not match the requested filters")
+    return float(value), str(job_id)
+
+
+def _timestamp(value: datetime) -> float:
+    return value.timestamp()
+
+
+def _summary(job: JobState) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "user_id": job.user_id,
+        "status": job.status.value,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+        "has_results": job.results is not None,
+    }
+
+
+class JobStore(ABC):
+    """Storage backend for job state."""
+
+    @abstractmethod
+    async def create(self, job: JobState) -> None:
+        """Insert a new job; raises JobExistsError if the ID is taken."""
+
+    @abstractmethod
+    async def save(self, job: JobState) -> None:
+        """Persist the current state of an existing job."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[JobState]:
+        """Get a job, or None if it does not exist."""
+
+    @abstractmethod
+    async def list(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[JobStatus] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List job summaries, newest first.
+
+        Returns:
+            Tuple of (summaries, cursor for the next page or None)
+        """
+
+    @abstractmethod
+    async def count(self, statuses: Sequence[JobStatus]) -> Dict[str, int]:
+        """Number of jobs in each of the given statuses."""
+
+    @abstractmethod
+    async def add_event(
+        self,
+        job_id: str,
+        event: str,
+        data: Dict[str, Any],
+        stage: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Append an event to a job's log, numbered from 1 per job.
+
+        Returns:
+            The event ID, or None if the job does not exist or (with
+            ``stage``) that stage was already recorded
+        """
+
+    @abstractmethod
+    async def get_events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """A job's events with IDs greater than ``after``, in order."""
+
+    def close(self) -> None:
+        """Release backend resources."""
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local store; state is lost on restart."""
+
+    def __init__(self):
+        self._jobs: Dict[str, JobState] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._stages: Dict[str, set] = {}
+
+    async def create(self, job: JobState) -> None:
+        if job.job_id in self._jobs:
+            raise JobExistsError(f"Job {job.job_id} already exists")
+        self._jobs[job.job_id] = job
+
+    async def save(self, job: JobState) -> None:
+        self._jobs[job.job_id] = job
+
+    async def get(self, job_id: str) -> Optional[JobState]:
+        return self._jobs.get(job_id)
+
+    async def list(self, user_id=None, status=None, limit=100, cursor=None):
+        order = order_column(user_id, status)
+        after = decode_cursor(cursor, order) if cursor else None
+
+        keyed = []
+        for job in self._jobs.values():
+            if user_id is not None and job.user_id != user_id:
+                continue
+            if status is not None and job.status != status:
+                continue
+            key = (_timestamp(getattr(job, order)), job.job_id)
+            if after is not None and key >= after:
+                continue
+            keyed.append((key, job))
+
+        keyed.sort(key=lambda item: item[0], reverse=True)
+        page = keyed[:limit]
+        next_cursor = None
+        if len(keyed) > limit and page:
+            next_cursor = encode_cursor(order, *page[-1][0])
+        return [_summary(job) for _, job in page], next_cursor
+
+    async def count(self, statuses):
+        counts = {status.value: 0 for status in statuses}
+        for job in self._jobs.values():
+            if job.status.value in counts:
+                counts[job.status.value] += 1
+        return counts
+
+    async def add_event(self, job_id, event, data, stage=None):
+        if job_id not in self._jobs:
+            return None
+        if stage is not None:
+            stages = self._stages.setdefault(job_id, set())
+            if stage in stages:
+                return None
+            stages.add(stage)
+        log = self._events.setdefault(job_id, [])
+        log.append({"id": len(log) + 1, "event": event, "data": data})
+        return len(log)
+
+    async def get_events(self, job_id, after=0):
+        return self._events.get(job_id, [])[after:]
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite-backed store in WAL mode.
+
+    Listings are keyset-paginated over the (user_id, created_at) and
+    (status, updated_at) indexes, so a page costs O(log n + page) however
+    many jobs are stored. The database file can be shared by several worker
+    processes, including the job event logs.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            user_id TEXT,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            has_results INTEGER NOT NULL DEFAULT 0,
+            state TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at, job_id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at, job_id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at, job_id);
+        CREATE TABLE IF NOT EXISTS job_events (
+            job_id TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            stage TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (job_id, id)
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_job_events_stage ON job_events (job_id, stage)
+            WHERE stage IS NOT NULL;
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _run(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    @staticmethod
+    def _row(job: JobState) -> tuple:
+        return (
+            job.job_id,
+            job.user_id,
+            job.status.value,
+            _timestamp(job.created_at),
+            _timestamp(job.updated_at),
+            int(job.results is not None),
+            job.model_dump_json(),
+        )
+
+    async def create(self, job: JobState) -> None:
+        try:
+            await self._run(
+                "INSERT INTO jobs (job_id, user_id, status, created_at, updated_at, has_results, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._row(job)
+            )
+        except sqlite3.IntegrityError:
+            raise JobExistsError(f"Job {job.job_id} already exists")
+
+    async def save(self, job: JobState) -> None:
+        await self._run(
+            "INSERT INTO jobs (job_id, user_id, status, created_at, updated_at, has_results, state) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET user_id = excluded.user_id, "
+            "status = excluded.status, updated_at = excluded.updated_at, "
+            "has_results = excluded.has_results, state = excluded.state",
+            self._row(job)
+        )
+
+    async def get(self, job_id: str) -> Optional[JobState]:
+        rows = await self._run("SELECT state FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        return JobState.model_validate_json(rows[0][0])
+
+    async def list(self, user_id=None, status=None, limit=100, cursor=None):
+        order = order_column(user_id, status)
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status.value)
+        if cursor:
+            value, job_id = decode_cursor(cursor, order)
+            clauses.append(f"({order}, job_id) < (?, ?)")
+            params.extend([value, job_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = await self._run(
+            "SELECT job_id, user_id, status, created_at, updated_at, has_results "
+            f"FROM jobs {where} ORDER BY {order} DESC, job_id DESC LIMIT ?",
+            (*params, limit + 1)
+        )
+
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit and page:
+            last = page[-1]
+            next_cursor = encode_cursor(order, last[3] if order == "created_at" else last[4], last[0])
+
+        return [
+            {
+                "job_id": row[0],
+                "user_id": row[1],
+                "status": row[2],
+                "created_at": datetime.fromtimestamp(row[3], timezone.utc).isoformat(),
+                "updated_at": datetime.fromtimestamp(row[4], timezone.utc).isoformat(),
+                "has_results": bool(row[5]),
+            }
+            for row in page
+        ], next_cursor
+
+    async def count(self, statuses):
+        counts = {status.value: 0 for status in statuses}
+        rows = await self._run(
+            "SELECT status, COUNT(*) FROM jobs "
+            f"WHERE status IN ({', '.join('?' * len(counts))}) GROUP BY status",
+            tuple(counts)
+        )
+        counts.update(dict(rows))
+        return counts
+
+    def _add_event(self, job_id, event, data, stage) -> Optional[int]:
+        with self._lock:
+            # One statement, so concurrent writers can't take the same ID
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO job_events (job_id, id, event, stage, data) "
+                "SELECT ?, (SELECT COALESCE(MAX(id), 0) + 1 FROM job_events WHERE job_id = ?), ?, ?, ? "
+                "WHERE EXISTS (SELECT 1 FROM jobs WHERE job_id = ?)",
+                (job_id, job_id, event, stage, json.dumps(data), job_id)
+            )
+            if not cursor.rowcount:
+                return None
+            return self._conn.execute(
+                "SELECT id FROM job_events WHERE rowid = ?", (cursor.lastrowid,)
+            ).fetchone()[0]
+
+    async def add_event(self, job_id, event, data, stage=None):
+        return await asyncio.to_thread(self._add_event, job_id, event, data, stage)
+
+    async def get_events(self, job_id, after=0):
+        rows = await self._run(
+            "SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+            (job_id, after)
+        )
+        return [{"id": row[0], "event": row[1], "data": json.loads(row[2])} for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store(backend: str = "sqlite", path: str = "jobs.db") -> JobStore:
+    """
+    Build a job store from configuration.
+
+    Args:
+        backend: "sqlite" or "memory"
+        path: SQLite database file (sqlite backend only)
+    """
+    if backend == "sqlite":
+        return SQLiteJobStore(path)
+    if backend == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown job store backend: {backend}")
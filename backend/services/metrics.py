@@ -0,0 +1,289 @@
+"""Minimal metric types rendered in the Prometheus text exposition format."""
+import asyncio
+import bisect
+import copy
+import glob
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from services.shared_slots import pid_alive
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans sub-second selector waits to multi-minute posts
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    """A named metric with a fixed set of label names."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(name suffix, label names, label values, value) per sample."""
+
+    @abstractmethod
+    def dump(self) -> List[list]:
+        """JSON-serializable values, one ``[label values, ...]`` entry per label set."""
+
+    @abstractmethod
+    def merge(self, items: List[list]) -> None:
+        """Add values from another process's :meth:`dump` to this metric."""
+
+    def blank(self) -> "Metric":
+        """A metric with the same name, labels and buckets but no values."""
+        blank = copy.copy(self)
+        blank._lock = threading.Lock()
+        blank._values = {}
+        return blank
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, value in items:
+            yield "", self.labelnames, values, value
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, items):
+        with self._lock:
+            for key, value in items:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0.0) + value
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets per label set."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, the last one for +Inf; sum)
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        bucket_names = self.labelnames + ("le",)
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", bucket_names, values + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, values, total
+            yield "_count", self.labelnames, values, cumulative
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), list(counts), total] for key, (counts, total) in self._values.items()]
+
+    def merge(self, items):
+        with self._lock:
+            for key, counts, total in items:
+                key = tuple(key)
+                if len(counts) != len(self.buckets) + 1:
+                    # Written by a process with other buckets configured
+                    continue
+                mine, my_total = self._values.get(key) or ([0] * len(counts), 0.0)
+                self._values[key] = ([a + b for a, b in zip(mine, counts)], my_total + total)
+
+
+def render(metrics: Iterable[Metric]) -> str:
+    """Prometheus text exposition of several metrics."""
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class MetricsRegistry:
+    """
+    The metrics of one process, optionally added up across worker processes.
+
+    Recording only touches this process's memory. With a directory set
+    (:meth:`use_directory`), :meth:`flush` writes this process's values to
+    ``metrics-<pid>.json`` there, ``run_flush`` does so periodically, and
+    :meth:`render` adds up the files of every process sharing the
+    directory, so any worker can answer a scrape. Counters and histograms
+    of exited workers keep counting toward the totals, while their gauges
+    are dropped.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory: Optional[str] = None
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+        if directory:
+            self.use_directory(directory)
+
+    def use_directory(self, directory: str) -> None:
+        """Share values with the other processes using ``directory``."""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def on_collect(self, collector: Callable[[], None]) -> None:
+        """Call ``collector`` before every flush and render, e.g. to set gauges."""
+        self._collectors.append(collector)
+
+    def _collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def flush(self) -> None:
+        """Write this process's values to the shared directory, atomically."""
+        if not self.directory:
+            return
+        self._collect()
+        data = {metric.name: metric.dump() for metric in self._metrics}
+        path = self._path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    async def run_flush(self, interval: float = 5.0) -> None:
+        """Flush every ``interval`` seconds; run as a background task."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except OSError as e:
+                logger.warning(f"Metrics flush failed: {e}")
+
+    def merged(self) -> List[Metric]:
+        """This process's live values plus every other process's last flush."""
+        self._collect()
+        merged = {}
+        for metric in self._metrics:
+            blank = metric.blank()
+            blank.merge(metric.dump())
+            merged[metric.name] = blank
+        if not self.directory:
+            return list(merged.values())
+
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path) as f:
+                    data: Dict[str, Any] = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = pid_alive(pid)
+            for name, items in data.items():
+                metric = merged.get(name)
+                if metric is None or (metric.type == "gauge" and not alive):
+                    continue
+                metric.merge(items)
+        return list(merged.values())
+
+    def render(self, extra: Iterable[Metric] = ()) -> str:
+        """
+        Prometheus text exposition of the merged metrics, followed by
+        ``extra`` metrics that are already global (e.g. read from a shared
+        database) and must not be added up.
+        """
+        return render(self.merged() + list(extra))
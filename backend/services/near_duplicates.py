@@ -0,0 +1,434 @@
+"""Perceptual-hash index for finding results of near-duplicate images."""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from services.image_ingest import ImageSource, UnsupportedImageError
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+# Colours are compared as the mean RGB of each cell of a grid of this size
+COLOR_GRID = 2
+
+
+class Fingerprint:
+    """
+    What two images must share to count as near-duplicates.
+
+    ``hash`` is a difference hash of the brightness gradients. It is blind to
+    colour and shape, since every flat image hashes to 0, so ``colors`` and
+    ``aspect`` (width / height) are compared as well.
+    """
+
+    def __init__(self, hash: int, colors: Sequence[int], aspect: float):
+        self.hash = hash
+        self.colors = tuple(colors)
+        self.aspect = aspect
+
+    def __repr__(self) -> str:
+        return f"Fingerprint({self.hash:016x}, colors={self.colors}, aspect={self.aspect:.3f})"
+
+
+def fingerprint(f: BinaryIO, hash_size: int = HASH_SIZE) -> Fingerprint:
+    """
+    Fingerprint an image file.
+
+    The difference hash reduces the image to a (hash_size + 1) x hash_size
+    greyscale thumbnail, and each bit records whether a pixel is brighter
+    than its right-hand neighbour. Recompression, rescaling and small crops
+    flip few bits.
+    """
+    with Image.open(f) as image:
+        # Let the JPEG decoder downscale while decoding
+        image.draft("RGB", (hash_size * 4, hash_size * 4))
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        rgb = image.convert("RGB")
+
+    small = rgb.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+
+    colors = rgb.resize((COLOR_GRID, COLOR_GRID), Image.BOX).tobytes()
+    return Fingerprint(bits, list(colors), width / height)
+
+
+def _fingerprint_source(source: ImageSource) -> Fingerprint:
+    with source.open_file() as f:
+        return fingerprint(f)
+
+
+async def perceptual_hash(source: ImageSource) -> Fingerprint:
+    """
+    Fingerprint an uploaded image off the event loop, decoding it straight
+    from its file.
+
+    Raises:
+        UnsupportedImageError: If the image cannot be decoded
+    """
+    try:
+        return await asyncio.to_thread(_fingerprint_source, source)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise UnsupportedImageError("Invalid image format")
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance.
+
+    A range query only descends into children whose edge distance is within
+    the threshold of the query's distance to the node (triangle inequality),
+    so it visits a small fraction of the tree.
+    """
+
+    def __init__(self):
+        # Node: [hash, items, {distance: child}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int, item: Any) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def items(self) -> List[Tuple[int, Any]]:
+        """All (hash, item) pairs in the tree."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            value, items, children = stack.pop()
+            found.extend((value, item) for item in items)
+            stack.extend(children.values())
+        return found
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """All items within max_distance of value, as (distance, item) pairs."""
+        if self._root is None:
+            return []
+
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class NearDuplicateIndex:
+    """
+    Maps image fingerprints to result cache keys.
+
+    Lookups are served from an in-memory BK-tree of hashes per scope (agent
+    URL, so results from a different agent are never reused). A match must
+    also have the same aspect ratio, within ``aspect_tolerance`` (relative),
+    and colours, with every grid cell's channels within ``color_tolerance``.
+
+    When ``path`` is set, entries are appended to a JSON-lines file that is
+    reloaded on startup, and workers sharing the file pick up each other's
+    entries on lookup. Appends and compaction lock ``<path>.lock`` with
+    flock, so a compaction in one process never loses another's entries.
+    Entries expire after ``ttl`` seconds, matching the result cache. The
+    trees are only replaced on the event loop; threads just read and write
+    the file.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: int = 6,
+        ttl: int = 7 * 24 * 3600,
+        color_tolerance: int = 24,
+        aspect_tolerance: float = 0.1
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.color_tolerance = color_tolerance
+        self.aspect_tolerance = aspect_tolerance
+        self._trees: Dict[str, BKTree] = {}
+        self._keys: set = set()
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._offset = 0
+        # (inode, size, mtime) of the file when last read; unchanged files aren't reread
+        self._seen: Optional[Tuple[int, int, int]] = None
+        self._io_lock = threading.Lock()
+        # Serializes reloading and compaction, which replace the trees
+        self._reload_lock = asyncio.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self._lookup_seconds = 0.0
+
+    @staticmethod
+    def _tree_item(entry: Dict[str, Any]) -> Tuple[str, float, Tuple[int, ...], float]:
+        return entry["key"], entry["added_at"], tuple(entry["colors"]), entry["aspect"]
+
+    @staticmethod
+    def _valid(entry: Dict[str, Any], cutoff: float) -> bool:
+        # Entries written before colours were recorded can't be checked
+        return entry["added_at"] > cutoff and "colors" in entry and "aspect" in entry
+
+    def _insert(self, entry: Dict[str, Any]) -> None:
+        if entry["key"] in self._keys:
+            return
+        self._keys.add(entry["key"])
+        tree = self._trees.setdefault(entry["scope"], BKTree())
+        tree.add(int(entry["hash"], 16), self._tree_item(entry))
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Cross-process lock on the index file; appends share it, compaction takes it alone."""
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_new_entries(self) -> Tuple[bool, List[Dict[str, Any]]]:
+        """
+        Read entries appended to the file since the last read.
+
+        Returns:
+            Tuple of (whether the file was replaced, so the trees must be
+            rebuilt from the returned entries, new entries)
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False, []
+
+        reset = False
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            # The file was compacted by another worker; start over
+            self._file_id, self._offset = file_id, 0
+            reset = True
+        if stat.st_size == self._offset:
+            return reset, []
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Leave a partially written last line for the next read
+        complete = data[:data.rfind(b"\n") + 1]
+        self._offset += len(complete)
+
+        entries = []
+        for line in complete.splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return reset, entries
+
+    async def refresh(self) -> None:
+        """Load entries added by other workers (or on startup), if the file changed."""
+        if not self.path:
+            return
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        seen = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if seen == self._seen:
+            return
+        async with self._reload_lock:
+            # Appended to by this process or another one since it was checked
+            self._seen = seen
+            reset, entries = await asyncio.to_thread(self._locked, self._read_new_entries)
+            if reset:
+                self._trees, self._keys = {}, set()
+            cutoff = time.time() - self.ttl
+            for entry in entries:
+                if self._valid(entry, cutoff):
+                    self._insert(entry)
+
+    def _locked(self, fn, *args):
+        with self._io_lock:
+            return fn(*args)
+
+    def similar(self, a: Fingerprint, colors: Sequence[int], aspect: float) -> bool:
+        """Whether an indexed image's colours and aspect ratio match the fingerprint's."""
+        if abs(a.aspect - aspect) > self.aspect_tolerance * max(a.aspect, aspect):
+            return False
+        return len(a.colors) == len(colors) and all(
+            abs(x - y) <= self.color_tolerance for x, y in zip(a.colors, colors)
+        )
+
+    async def find(self, value: Fingerprint, scope: str) -> Optional[Tuple[str, int]]:
+        """
+        Find the closest indexed image within the threshold.
+
+        Returns:
+            Tuple of (result cache key, Hamming distance), or None
+        """
+        started = time.perf_counter()
+        await self.refresh()
+
+        tree = self._trees.get(scope)
+        cutoff = time.time() - self.ttl
+        matches = [
+            (distance, key)
+            for distance, (key, added_at, colors, aspect) in (
+                tree.search(value.hash, self.threshold) if tree else []
+            )
+            if added_at > cutoff and self.similar(value, colors, aspect)
+        ]
+        self._lookup_seconds += time.perf_counter() - started
+        self.lookups += 1
+
+        if not matches:
+            return None
+        self.hits += 1
+        distance, key = min(matches)
+        return key, distance
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with self._file_lock(exclusive=False):
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    async def add(self, value: Fingerprint, key: str, scope: str) -> None:
+        """Index an image's fingerprint against its result cache key."""
+        entry = {
+            "scope": scope,
+            "hash": f"{value.hash:016x}",
+            "colors": list(value.colors),
+            "aspect": value.aspect,
+            "key": key,
+            "added_at": time.time(),
+        }
+        self._insert(entry)
+        if self.path:
+            await asyncio.to_thread(self._locked, self._append, entry)
+
+    def _compact(self, cutoff: float) -> Tuple[int, Dict[str, BKTree], set]:
+        """
+        Rewrite the file without expired entries, and build new trees from
+        it (installed by the caller, on the event loop).
+
+        Returns:
+            Tuple of (entries dropped, trees, keys)
+        """
+        with self._file_lock(exclusive=True):
+            try:
+                with open(self.path, "rb") as f:
+                    lines = f.read().splitlines()
+            except FileNotFoundError:
+                return 0, self._trees, self._keys
+
+            entries = []
+            for line in lines:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+            live = [entry for entry in entries if self._valid(entry, cutoff)]
+
+            directory, name = os.path.split(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.writelines(json.dumps(entry) + "\n" for entry in live)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            stat = os.stat(self.path)
+
+        trees: Dict[str, BKTree] = {}
+        for entry in live:
+            trees.setdefault(entry["scope"], BKTree()).add(int(entry["hash"], 16), self._tree_item(entry))
+        self._file_id, self._offset = (stat.st_dev, stat.st_ino), stat.st_size
+        return len(entries) - len(live), trees, {entry["key"] for entry in live}
+
+    def _rebuild(self, cutoff: float) -> int:
+        """Rebuild the in-memory trees without expired entries."""
+        removed = 0
+        trees: Dict[str, BKTree] = {}
+        for scope, tree in self._trees.items():
+            for value, item in tree.items():
+                if item[1] > cutoff:
+                    trees.setdefault(scope, BKTree()).add(value, item)
+                else:
+                    removed += 1
+        self._trees = trees
+        self._keys = {item[0] for tree in trees.values() for _, item in tree.items()}
+        return removed
+
+    async def evict(self) -> int:
+        """
+        Drop expired entries, rebuilding the trees and rewriting the file.
+
+        Returns:
+            Number of entries dropped
+        """
+        cutoff = time.time() - self.ttl
+        async with self._reload_lock:
+            if self.path:
+                removed, self._trees, self._keys = await asyncio.to_thread(
+                    self._locked, self._compact, cutoff
+                )
+            else:
+                removed = self._rebuild(cutoff)
+
+        if removed:
+            logger.info(f"Evicted {removed} near-duplicate index entries")
+        return removed
+
+    async def run_eviction(self, interval: float) -> None:
+        """Evict periodically until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict()
+            except Exception as e:
+                logger.error(f"Near-duplicate index eviction failed: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookup counters and index size."""
+        return {
+            "entries": sum(tree.size for tree in self._trees.values()),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "threshold": self.threshold,
+            "avg_lookup_ms": self._lookup_seconds / self.lookups * 1000 if self.lookups else 0.0,
+        }
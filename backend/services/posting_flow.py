@@ -0,0 +1,436 @@
+"""Declarative, event-driven posting flows for Playwright pages."""
+import asyncio
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+from playwright.async_api import Error as PlaywrightError, Page, Response
+
+from services.flow_tracing import FlowTrace
+from services.selector_resolver import SelectorResolver
+
+logger = logging.getLogger(__name__)
+
+
+class ConditionTimeout(Exception):
+    """A condition was not met within its timeout."""
+
+
+class FlowRun:
+    """State of one flow execution, passed to step actions."""
+
+    def __init__(
+        self,
+        page: Page,
+        platform: str,
+        resolver: SelectorResolver,
+        trace: Optional[FlowTrace] = None
+    ):
+        self.page = page
+        self.platform = platform
+        self.resolver = resolver
+        self.trace = trace or FlowTrace(platform)
+        # Element found by the current step's readiness condition, the
+        # selector that found it, and whether the fallback ran instead
+        self.element: Any = None
+        self.selector: Optional[str] = None
+        self.fell_back = False
+        # Result of each step's success condition, by step name
+        self.values: Dict[str, Any] = {}
+        # Milliseconds spent per step (readiness + action + success)
+        self.durations: Dict[str, float] = {}
+
+
+class Condition(ABC):
+    """Something to wait for on the page."""
+
+    # Event conditions must be listening before the action runs, or the
+    # event can fire before the wait starts
+    arm_early = False
+
+    @abstractmethod
+    async def wait(self, run: FlowRun, timeout: float) -> Any:
+        """Wait until met; raises ConditionTimeout after timeout ms."""
+
+    async def start(self, run: FlowRun, timeout: float) -> "asyncio.Task":
+        """Start waiting in the background; returns once it is listening."""
+        task = asyncio.create_task(self.wait(run, timeout))
+        # Let the wait subscribe before the caller acts
+        await asyncio.sleep(0)
+        return task
+
+    async def check(self, run: FlowRun) -> bool:
+        """Whether the condition holds right now, without waiting."""
+        return False
+
+
+class Visible(Condition):
+    """
+    Any of several selectors matches. Resolved through the flow's
+    selector resolver, so candidates are raced and the winner is cached
+    under ``key``.
+    """
+
+    def __init__(self, key: str, selectors: Sequence[str], state: str = "visible"):
+        self.key = key
+        self.selectors = list(selectors)
+        self.state = state
+
+    async def wait(self, run, timeout):
+        element, selector = await run.resolver.resolve(
+            run.page, run.platform, self.key, self.selectors, timeout, self.state
+        )
+        if element is None:
+            raise ConditionTimeout(f"None of {self.selectors} appeared")
+        run.selector = selector
+        return element
+
+    async def check(self, run):
+        for selector in self.selectors:
+            try:
+                element = await run.page.query_selector(selector)
+                if element is not None and (self.state != "visible" or await element.is_visible()):
+                    return True
+            except PlaywrightError:
+                continue
+        return False
+
+
+class Hidden(Condition):
+    """A selector is hidden or gone."""
+
+    def __init__(self, selector: str):
+        self.selector = selector
+
+    async def wait(self, run, timeout):
+        try:
+            await run.page.wait_for_selector(self.selector, state="hidden", timeout=timeout)
+        except PlaywrightError:
+            raise ConditionTimeout(f"{self.selector} is still visible")
+
+
+class UrlMatches(Condition):
+    """The page URL matches a regular expression."""
+
+    def __init__(self, pattern: str):
+        self.pattern = re.compile(pattern)
+
+    async def wait(self, run, timeout):
+        try:
+            await run.page.wait_for_url(self.pattern, timeout=timeout)
+        except PlaywrightError:
+            raise ConditionTimeout(f"URL did not match {self.pattern.pattern}")
+        return run.page.url
+
+
+class ResponseMatches(Condition):
+    """A successful network response whose URL matches a regular expression."""
+
+    arm_early = True
+
+    def __init__(self, pattern: str, method: Optional[str] = None):
+        self.pattern = re.compile(pattern)
+        self.method = method
+
+    def _matches(self, response) -> bool:
+        if self.method and response.request.method != self.method:
+            return False
+        return response.ok and bool(self.pattern.search(response.url))
+
+    async def wait(self, run, timeout):
+        try:
+            return await run.page.wait_for_event("response", predicate=self._matches, timeout=timeout)
+        except PlaywrightError:
+            raise ConditionTimeout(f"No response matching {self.pattern.pattern}")
+
+
+class ResponseCapture:
+    """
+    Keeps the first successful response matching a pattern, with its body
+    read as soon as it arrives (before a navigation can discard it).
+    Use through :func:`capture_response`.
+    """
+
+    def __init__(self, pattern: str, method: Optional[str] = None):
+        self._match = ResponseMatches(pattern, method)
+        self.response: Optional[Response] = None
+        self.body: Optional[str] = None
+        self._done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def _on_response(self, response: Response) -> None:
+        if self._task is None and self._match._matches(response):
+            self.response = response
+            self._task = asyncio.create_task(self._read(response))
+
+    async def _read(self, response: Response) -> None:
+        try:
+            self.body = await response.text()
+        except PlaywrightError as e:
+            logger.info(f"Could not read {response.url}: {e}")
+        finally:
+            self._done.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to timeout ms for the response; True once it has been read."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout / 1000)
+        except asyncio.TimeoutError:
+            return False
+        return self.body is not None
+
+
+class ResponseCaptured(Condition):
+    """A :class:`ResponseCapture` has seen and read its response."""
+
+    def __init__(self, capture: ResponseCapture):
+        self.capture = capture
+
+    async def wait(self, run, timeout):
+        if not await self.capture.wait(timeout):
+            raise ConditionTimeout("Response was not captured")
+        return self.capture.response
+
+    async def check(self, run):
+        return self.capture.body is not None
+
+
+@contextmanager
+def capture_response(page: Page, pattern: str, method: Optional[str] = None) -> Iterator[ResponseCapture]:
+    """Capture the first matching response on a page while the block runs."""
+    capture = ResponseCapture(pattern, method)
+    page.on("response", capture._on_response)
+    try:
+        yield capture
+    finally:
+        page.remove_listener("response", capture._on_response)
+
+
+class TextChanges(Condition):
+    """The text of an element differs from what it was when the wait began."""
+
+    arm_early = True
+
+    def __init__(self, selector: str):
+        self.selector = selector
+
+    async def _text(self, run: FlowRun) -> Optional[str]:
+        try:
+            element = await run.page.query_selector(self.selector)
+            return await element.text_content() if element else None
+        except PlaywrightError:
+            return None
+
+    async def _wait_for_change(self, run: FlowRun, before: Optional[str], timeout: float) -> None:
+        try:
+            await run.page.wait_for_function(
+                "([selector, before]) => {"
+                " const el = document.querySelector(selector);"
+                " return (el ? el.textContent : null) !== before; }",
+                arg=[self.selector, before],
+                timeout=timeout
+            )
+        except PlaywrightError:
+            raise ConditionTimeout(f"{self.selector} did not change")
+
+    async def wait(self, run, timeout):
+        await self._wait_for_change(run, await self._text(run), timeout)
+
+    async def start(self, run, timeout):
+        # Read the text now, before the action can change it
+        before = await self._text(run)
+        return asyncio.create_task(self._wait_for_change(run, before, timeout))
+
+
+class AnyOf(Condition):
+    """The first of several conditions to be met."""
+
+    def __init__(self, *conditions: Condition):
+        self.conditions = conditions
+        self.arm_early = any(condition.arm_early for condition in conditions)
+
+    async def wait(self, run, timeout):
+        tasks = [asyncio.create_task(condition.wait(run, timeout)) for condition in self.conditions]
+        return await self._first(tasks)
+
+    async def start(self, run, timeout):
+        tasks = [await condition.start(run, timeout) for condition in self.conditions]
+        return asyncio.create_task(self._first(tasks))
+
+    @staticmethod
+    async def _first(tasks: List["asyncio.Task"]) -> Any:
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise ConditionTimeout("No condition was met")
+
+    async def check(self, run):
+        for condition in self.conditions:
+            if await condition.check(run):
+                return True
+        return False
+
+
+Action = Callable[[FlowRun], Awaitable[Any]]
+
+
+class Step:
+    """
+    One step of a posting flow.
+
+    Args:
+        name: Step name, used for durations and errors
+        action: Interaction to perform; gets the run, with ``run.element``
+            set to what ``ready`` found
+        ready: Waited for before the action
+        done: Waited for after the action (armed before it for event
+            conditions); its result is stored in ``run.values[name]``
+        timeout: Milliseconds to wait for ``ready``
+        done_timeout: Milliseconds to wait for ``done`` (default: timeout)
+        error: Message of the ValueError raised when the step fails
+        optional: Failures are logged and the flow continues
+        fallback: Run instead of the action when ``ready`` is not met
+        done_optional: A ``done`` timeout is logged but does not fail the step
+        repeat: Run up to this many times
+        until: Stop repeating as soon as this holds
+    """
+
+    def __init__(
+        self,
+        name: str,
+        action: Optional[Action] = None,
+        ready: Optional[Condition] = None,
+        done: Optional[Condition] = None,
+        timeout: float = 10000,
+        done_timeout: Optional[float] = None,
+        error: Optional[str] = None,
+        optional: bool = False,
+        fallback: Optional[Action] = None,
+        done_optional: bool = False,
+        repeat: int = 1,
+        until: Optional[Condition] = None
+    ):
+        self.name = name
+        self.action = action
+        self.ready = ready
+        self.done = done
+        self.timeout = timeout
+        self.done_timeout = done_timeout if done_timeout is not None else timeout
+        self.error = error or f"Step '{name}' failed"
+        self.optional = optional
+        self.fallback = fallback
+        self.done_optional = done_optional
+        self.repeat = repeat
+        self.until = until
+
+
+def format_durations(durations: Dict[str, float]) -> str:
+    """One-line summary of step durations."""
+    return ", ".join(f"{name}={ms:.0f}" for name, ms in durations.items())
+
+
+async def click(run: FlowRun) -> None:
+    """Action: click the element the readiness condition found."""
+    await run.element.click()
+
+
+async def _run_once(run: FlowRun, step: Step) -> None:
+    action = step.action
+    run.element = None
+    run.selector = None
+    if step.ready is not None:
+        try:
+            run.element = await step.ready.wait(run, step.timeout)
+        except ConditionTimeout:
+            if step.fallback is None:
+                raise
+            action = step.fallback
+            run.fell_back = True
+
+    done_task = None
+    if step.done is not None and step.done.arm_early:
+        done_task = await step.done.start(run, step.done_timeout)
+
+    try:
+        if action is not None:
+            await action(run)
+        if step.done is not None:
+            if done_task is None:
+                done_task = await step.done.start(run, step.done_timeout)
+            try:
+                run.values[step.name] = await done_task
+            except ConditionTimeout as e:
+                if not step.done_optional:
+                    raise
+                logger.info(f"{run.platform}/{step.name}: {e}, continuing")
+    finally:
+        if done_task is not None:
+            if not done_task.done():
+                done_task.cancel()
+            elif not done_task.cancelled():
+                # Mark a failure as retrieved when the action failed first
+                done_task.exception()
+
+
+async def run_flow(
+    page: Page,
+    platform: str,
+    steps: List[Step],
+    resolver: Optional[SelectorResolver] = None,
+    trace: Optional[FlowTrace] = None
+) -> FlowRun:
+    """
+    Run a flow's steps in order.
+
+    Each step is recorded as a span on ``trace`` with its duration, the
+    selector that found its element, its attempts and its outcome.
+
+    Returns:
+        The finished run, with per-step durations and success values
+
+    Raises:
+        ValueError: With the step's error message if a required step times
+            out; an action's own errors propagate unchanged
+    """
+    run = FlowRun(page, platform, resolver or SelectorResolver(None), trace)
+
+    for step in steps:
+        started = time.perf_counter()
+        span = run.trace.span(step.name)
+        run.fell_back = False
+        try:
+            for _ in range(step.repeat):
+                if step.until is not None and await step.until.check(run):
+                    break
+                span.attempts += 1
+                await _run_once(run, step)
+                span.selector = run.selector or span.selector
+            span.end("fallback" if run.fell_back else "ok")
+        except (ConditionTimeout, PlaywrightError) as e:
+            if not step.optional:
+                span.end("failed", str(e))
+                logger.warning(f"{platform}/{step.name} failed: {e}")
+                raise ValueError(step.error)
+            span.end("skipped", str(e))
+            logger.info(f"{platform}/{step.name} skipped: {e}")
+        except Exception as e:
+            # An action's own error (e.g. text insertion) ends the step too
+            span.end("failed", f"{type(e).__name__}: {e}")
+            logger.warning(f"{platform}/{step.name} failed: {e}")
+            raise
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            run.durations[step.name] = run.durations.get(step.name, 0.0) + elapsed
+            logger.info(f"{platform}/{step.name}: {elapsed:.0f} ms")
+
+    return run
@@ -0,0 +1,519 @@
+"""Durable, rate-limited publish queue drained by async workers."""
+import asyncio
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.image_ingest import ImageSource
+from services.image_store import EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+PUBLISHED = "published"
+DEAD = "dead"
+
+# Platforms the publisher can post to (their posters are in services.publisher,
+# which is slow to import)
+PLATFORMS = ("instagram", "linkedin")
+# Posts without an account use the platform's default login
+DEFAULT_ACCOUNT = "default"
+# Account names become part of auth file names
+ACCOUNT_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.@-]{0,63}")
+
+FIELDS = (
+    "id", "platform", "account", "text", "image_path", "job_id", "status", "attempts",
+    "next_attempt_at", "created_at", "updated_at", "last_error", "post_url"
+)
+
+
+class RateLimit:
+    """A token bucket: ``count`` posts per ``period`` seconds, bursts of ``burst``."""
+
+    def __init__(self, count: float, period: float, burst: Optional[int] = None):
+        self.rate = count / period
+        self.burst = burst or 1
+
+    def refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def wait(self, tokens: float) -> float:
+        """Seconds until a bucket holding ``tokens`` has a whole token."""
+        return max(0.0, (1 - tokens) / self.rate)
+
+
+def parse_rate_limits(spec: str) -> Dict[str, RateLimit]:
+    """
+    Parse ``"instagram=25/86400:3,linkedin=50/86400"`` into rate limits:
+    posts per period in seconds, with an optional burst after the colon.
+
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            platform, rule = entry.split("=", 1)
+            rule, _, burst = rule.partition(":")
+            count, period = rule.split("/", 1)
+            limits[platform.strip()] = RateLimit(
+                float(count), float(period), int(burst) if burst else None
+            )
+        except ValueError:
+            raise ValueError(f"Invalid rate limit: {entry!r}")
+    return limits
+
+
+class PublishQueue:
+    """
+    Publish requests persisted in SQLite (WAL mode).
+
+    Jobs are claimed under a lease, so a worker that dies mid-post only
+    delays its job until the lease runs out (which counts as a failed
+    attempt), and the database file can be shared by several processes. Token buckets are stored in the same
+    database and debited in the claiming transaction: a job is only handed
+    out when both its platform's bucket and its account's bucket have a
+    token, and jobs whose buckets are empty are skipped rather than
+    blocking the ones behind them. Failed jobs are retried with exponential
+    backoff and jitter, then dead-lettered after ``max_attempts``.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS publish_jobs (
+            id TEXT PRIMARY KEY,
+            platform TEXT NOT NULL,
+            account TEXT NOT NULL,
+            text TEXT NOT NULL,
+            image_path TEXT NOT NULL,
+            job_id TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            lease_until REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            last_error TEXT,
+            post_url TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_publish_status_next ON publish_jobs (status, next_attempt_at);
+        CREATE INDEX IF NOT EXISTS idx_publish_image ON publish_jobs (image_path);
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(
+        self,
+        path: str = "publish_queue.db",
+        media_dir: str = "publish_media",
+        platform_limits: Optional[Dict[str, RateLimit]] = None,
+        account_limits: Optional[Dict[str, RateLimit]] = None,
+        max_attempts: int = 5,
+        base_delay: float = 30.0,
+        max_delay: float = 3600.0,
+        lease: float = 900.0,
+        scan_limit: int = 50
+    ):
+        self.path = path
+        self.media_dir = media_dir
+        os.makedirs(media_dir, exist_ok=True)
+        self.platform_limits = platform_limits or {}
+        self.account_limits = account_limits or {}
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.scan_limit = scan_limit
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _run(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def save_media(self, image: ImageSource) -> str:
+        """Copy an image into the queue's media directory; returns its path."""
+        extension = EXTENSIONS.get(image.content_type, "img")
+        path = os.path.join(self.media_dir, f"{uuid.uuid4().hex}.{extension}")
+        with open(path, "wb") as f:
+            async for chunk in image.chunks():
+                await asyncio.to_thread(f.write, chunk)
+        return path
+
+    async def enqueue(
+        self,
+        platform: str,
+        text: str,
+        image_path: str,
+        account: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> str:
+        """
+        Queue a post; returns its publish ID.
+
+        Raises:
+            ValueError: If the account name is not valid
+        """
+        if account is not None and not ACCOUNT_NAME.fullmatch(account):
+            raise ValueError(f"Invalid account name: {account!r}")
+        publish_id = str(uuid.uuid4())
+        now = time.time()
+        await self._run(
+            "INSERT INTO publish_jobs (id, platform, account, text, image_path, job_id, status, "
+            "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (publish_id, platform, account or DEFAULT_ACCOUNT, text, image_path, job_id, QUEUED, now, now, now)
+        )
+        return publish_id
+
+    async def get(self, publish_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run(
+            f"SELECT {', '.join(FIELDS)} FROM publish_jobs WHERE id = ?", (publish_id,)
+        )
+        return dict(zip(FIELDS, rows[0])) if rows else None
+
+    def _take_tokens(self, job: Dict[str, Any], now: float) -> Optional[float]:
+        """
+        Debit the job's buckets if all have a token (inside the claim
+        transaction). Returns None on success, else seconds until they would.
+        """
+        buckets = []
+        for key, limit in (
+            (f"platform:{job['platform']}", self.platform_limits.get(job["platform"])),
+            (f"account:{job['platform']}:{job['account']}", self.account_limits.get(job["platform"])),
+        ):
+            if limit is None:
+                continue
+            row = self._conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = limit.refill(*row, now) if row else float(limit.burst)
+            buckets.append((key, limit, tokens))
+
+        wait = max((limit.wait(tokens) for _, limit, tokens in buckets), default=0.0)
+        if wait > 0:
+            return wait
+        for key, _, tokens in buckets:
+            self._conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens - 1, now)
+            )
+        return None
+
+    def _take_all(self, platforms: List[str], account: str) -> Optional[float]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                waits = [
+                    self._take_tokens({"platform": platform, "account": account}, now)
+                    for platform in platforms
+                ]
+                wait = max((w for w in waits if w is not None), default=None)
+                # Debit all the buckets or none of them
+                self._conn.execute("COMMIT" if wait is None else "ROLLBACK")
+                return wait
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def take_tokens(self, platforms: List[str], account: str = DEFAULT_ACCOUNT) -> Optional[float]:
+        """
+        Debit the rate limits for a post published outside the queue, to
+        each platform at once, from the buckets the workers use.
+
+        Returns:
+            None if every bucket had a token, else seconds until they all
+            may (nothing is debited then)
+        """
+        return await asyncio.to_thread(self._take_all, platforms, account)
+
+    def _expire_leases(self, now: float) -> None:
+        """
+        Count a failed attempt for every job whose worker died or hung past
+        its lease (inside the claim transaction), so a post that keeps
+        crashing its worker is backed off and dead-lettered like any other.
+        """
+        expired = self._conn.execute(
+            "SELECT id, attempts FROM publish_jobs WHERE status = ? AND lease_until <= ?",
+            (RUNNING, now)
+        ).fetchall()
+        for publish_id, attempts in expired:
+            attempts += 1
+            status = DEAD if attempts >= self.max_attempts else QUEUED
+            next_attempt_at = now + self.backoff(attempts) if status == QUEUED else now
+            self._conn.execute(
+                "UPDATE publish_jobs SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "lease_until = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, attempts, next_attempt_at, "Lease expired (worker crashed or hung)", now, publish_id)
+            )
+
+    def _claim(self) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases(now)
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(FIELDS)} FROM publish_jobs "
+                    "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                    (QUEUED, now, self.scan_limit)
+                ).fetchall()
+                wait = None
+                for row in rows:
+                    job = dict(zip(FIELDS, row))
+                    blocked = self._take_tokens(job, now)
+                    if blocked is not None:
+                        wait = blocked if wait is None else min(wait, blocked)
+                        continue
+                    self._conn.execute(
+                        "UPDATE publish_jobs SET status = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                        (RUNNING, now + self.lease, now, job["id"])
+                    )
+                    self._conn.execute("COMMIT")
+                    job["status"] = RUNNING
+                    return job, None
+
+                upcoming = self._conn.execute(
+                    "SELECT MIN(next_attempt_at) FROM publish_jobs WHERE status = ?", (QUEUED,)
+                ).fetchone()[0]
+                if upcoming is not None and upcoming > now:
+                    wait = min(wait, upcoming - now) if wait is not None else upcoming - now
+                self._conn.execute("COMMIT")
+                return None, wait
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def claim(self) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """
+        Lease the next due job whose rate limits allow it.
+
+        Returns:
+            Tuple of (job or None, seconds until something may become
+            claimable, or None if the queue is idle)
+        """
+        return await asyncio.to_thread(self._claim)
+
+    async def complete(self, publish_id: str, post_url: str) -> None:
+        """Mark a job published and drop its media once no other job needs it."""
+        job = await self.get(publish_id)
+        await self._run(
+            "UPDATE publish_jobs SET status = ?, post_url = ?, lease_until = NULL, "
+            "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (PUBLISHED, post_url, time.time(), publish_id)
+        )
+        if job is not None:
+            await self._release_media(job["image_path"])
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before retry number ``attempts``, with jitter."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def fail(self, publish_id: str, error: str, permanent: bool = False) -> str:
+        """
+        Record a failed attempt: schedule a retry, or dead-letter the job
+        when it is out of attempts (or the error is permanent).
+
+        Returns:
+            The job's new status
+        """
+        job = await self.get(publish_id)
+        if job is None:
+            return DEAD
+        attempts = job["attempts"] + 1
+        now = time.time()
+        status = DEAD if permanent or attempts >= self.max_attempts else QUEUED
+        next_attempt_at = now + self.backoff(attempts) if status == QUEUED else now
+        await self._run(
+            "UPDATE publish_jobs SET status = ?, attempts = ?, next_attempt_at = ?, "
+            "lease_until = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+            (status, attempts, next_attempt_at, error, now, publish_id)
+        )
+        return status
+
+    async def release(self, publish_id: str) -> None:
+        """Return a claimed job to the queue without counting an attempt."""
+        await self._run(
+            "UPDATE publish_jobs SET status = ?, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ?",
+            (QUEUED, time.time(), publish_id, RUNNING)
+        )
+
+    async def retry(self, publish_id: str) -> bool:
+        """Put a dead-lettered job back on the queue with fresh attempts."""
+        now = time.time()
+        await self._run(
+            "UPDATE publish_jobs SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = ?",
+            (QUEUED, now, now, publish_id, DEAD)
+        )
+        job = await self.get(publish_id)
+        return job is not None and job["status"] == QUEUED
+
+    async def _release_media(self, image_path: str) -> None:
+        rows = await self._run(
+            "SELECT COUNT(*) FROM publish_jobs WHERE image_path = ? AND status != ?",
+            (image_path, PUBLISHED)
+        )
+        in_media_dir = os.path.dirname(os.path.abspath(image_path)) == os.path.abspath(self.media_dir)
+        if rows[0][0] == 0 and in_media_dir:
+            try:
+                os.unlink(image_path)
+            except FileNotFoundError:
+                pass
+
+    async def stats(self) -> Dict[str, Any]:
+        """Job counts by status, and when the next queued job is due."""
+        rows = await self._run("SELECT status, COUNT(*) FROM publish_jobs GROUP BY status")
+        counts = {status: 0 for status in (QUEUED, RUNNING, PUBLISHED, DEAD)}
+        counts.update(dict(rows))
+        upcoming = await self._run(
+            "SELECT MIN(next_attempt_at) FROM publish_jobs WHERE status = ?", (QUEUED,)
+        )
+        due = upcoming[0][0]
+        return {
+            **counts,
+            "next_due_in": max(0.0, due - time.time()) if due is not None else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+PublishFunc = Callable[[str, str, str, str], Awaitable[str]]
+
+
+class PublishWorkers:
+    """
+    ``workers`` async tasks draining a PublishQueue through ``publish``
+    (platform, text, image path, account) -> post URL.
+
+    A post taking longer than ``timeout`` seconds fails and is retried.
+    The timeout must be shorter than the queue's lease, so no other worker
+    reclaims a post that is still being published.
+
+    Idle workers sleep until the next job could be due, at most
+    ``poll_interval`` seconds (other processes may enqueue too); call
+    :meth:`wake` after enqueueing to start right away.
+    """
+
+    # Errors no retry will fix: missing image or auth file
+    PERMANENT_ERRORS = (FileNotFoundError,)
+
+    def __init__(
+        self,
+        queue: PublishQueue,
+        publish: PublishFunc,
+        workers: int = 2,
+        poll_interval: float = 5.0,
+        timeout: float = 600.0
+    ):
+        if timeout >= queue.lease:
+            raise ValueError(f"Publish timeout ({timeout:g}s) must be shorter than the lease ({queue.lease:g}s)")
+        self.queue = queue
+        self.publish = publish
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._claimed: Dict[int, str] = {}
+
+        self.published = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work(index)))
+        logger.info(f"Started {self.workers} publish workers")
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def _sleep(self, wait: Optional[float]) -> None:
+        timeout = self.poll_interval if wait is None else min(wait, self.poll_interval)
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _work(self, index: int) -> None:
+        while True:
+            try:
+                job, wait = await self.queue.claim()
+            except Exception as e:
+                logger.error(f"Publish worker {index} could not claim a job: {e}", exc_info=True)
+                await self._sleep(None)
+                continue
+            if job is None:
+                await self._sleep(wait)
+                continue
+
+            self._claimed[index] = job["id"]
+            try:
+                post_url = await asyncio.wait_for(
+                    self.publish(job["platform"], job["text"], job["image_path"], job["account"]),
+                    self.timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    error = f"Timed out after {self.timeout:g}s"
+                else:
+                    error = f"{type(e).__name__}: {e}"
+                status = await self.queue.fail(
+                    job["id"], error, permanent=isinstance(e, self.PERMANENT_ERRORS)
+                )
+                self.failed += 1
+                if status == DEAD:
+                    self.dead_lettered += 1
+                    logger.error(f"Publish {job['id']} to {job['platform']} dead-lettered: {error}")
+                else:
+                    logger.warning(f"Publish {job['id']} to {job['platform']} failed, will retry: {error}")
+            else:
+                await self.queue.complete(job["id"], post_url)
+                self.published += 1
+                logger.info(f"Published {job['id']} to {job['platform']}: {post_url}")
+            finally:
+                self._claimed.pop(index, None)
+
+    async def close(self) -> None:
+        """Stop the workers; posts in progress go back on the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for publish_id in list(self._claimed.values()):
+            await self.queue.release(publish_id)
+        self._claimed.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "in_flight": len(self._claimed),
+            "published": self.published,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+        }
@@ -0,0 +1,225 @@
+"""Social publishing through a shared, long-lived browser pool."""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.instagram_poster import INSTAGRAM_RESOURCE_POLICY, post_to_instagram
+from api.playwright_post import LINKEDIN_RESOURCE_POLICY, post_to_linkedin
+from services.browser_pool import BrowserPool
+from services.flow_tracing import FlowTracer
+from services.publish_queue import ACCOUNT_NAME, DEFAULT_ACCOUNT, PLATFORMS
+from services.selector_resolver import SelectorResolver
+
+logger = logging.getLogger(__name__)
+
+# Poster, browser engine and request-routing policy per platform
+POSTERS = {
+    "instagram": (post_to_instagram, "firefox", INSTAGRAM_RESOURCE_POLICY),
+    "linkedin": (post_to_linkedin, "chromium", LINKEDIN_RESOURCE_POLICY),
+}
+
+
+def find_strategies(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The per-platform ``strategies`` of an agent result, which may be the
+    webhook response, its ``data`` or a workflow ``output`` wrapper.
+    """
+    for candidate in (
+        result,
+        result.get("data"),
+        (result.get("output") or {}).get("data") if isinstance(result.get("output"), dict) else None,
+    ):
+        if isinstance(candidate, dict) and isinstance(candidate.get("strategies"), dict):
+            return candidate["strategies"]
+    return {}
+
+
+def post_text(strategy: Dict[str, Any]) -> str:
+    """A strategy's content followed by its hashtags (those not already in it)."""
+    content = (strategy.get("content") or "").strip()
+    hashtags = [tag for tag in strategy.get("hashtags") or [] if tag and tag not in content]
+    return f"{content}\n\n{' '.join(hashtags)}" if hashtags else content
+
+
+class Publisher:
+    """
+    Publishes posts without launching a browser per post.
+
+    Browsers are started once per engine and every platform account keeps
+    its context between posts. With standby enabled, the next post for an
+    account starts on a page already parked on its feed. Selector winners
+    are shared by all posts and persisted in ``selector_cache``. With
+    ``block_resources``, pages skip each platform's unneeded media, fonts
+    and trackers. Every post is traced step by step into ``tracer``; with
+    ``trace_dir`` set, Playwright traces of failed or slow posts are kept.
+
+    Each account posts with its own saved session from ``auth_dir``:
+    ``<platform>_auth.json`` for the default account, and
+    ``<platform>_auth_<account>.json`` for the others. Only the default
+    LinkedIn account may log in again with LINKEDIN_EMAIL.
+    """
+
+    def __init__(
+        self,
+        headless: bool = False,
+        standby: bool = True,
+        standby_max_age: float = 600.0,
+        selector_cache: Optional[str] = "selector_cache.json",
+        block_resources: bool = True,
+        trace_dir: Optional[str] = None,
+        slow_trace_ms: float = 60000.0,
+        auth_dir: str = "."
+    ):
+        self.auth_dir = auth_dir
+        self.pool = BrowserPool(
+            headless=headless,
+            standby=standby,
+            standby_max_age=standby_max_age,
+            block_resources=block_resources
+        )
+        self.resolver = SelectorResolver(selector_cache)
+        self.tracer = FlowTracer(trace_dir, slow_trace_ms)
+
+    async def start(self, platforms: Optional[Iterable[str]] = None) -> None:
+        """Launch the browsers the given platforms (default: all) need."""
+        await self.pool.start()
+        engines = {
+            POSTERS[platform][1] for platform in (platforms or PLATFORMS) if platform in PLATFORMS
+        }
+        for engine in engines:
+            await self.pool.browser(engine)
+        logger.info(f"Publisher ready with {', '.join(sorted(engines))}")
+
+    def auth_file(self, platform: str, account: str = DEFAULT_ACCOUNT) -> str:
+        """
+        Path of an account's saved session.
+
+        Raises:
+            ValueError: If the account name is not valid
+        """
+        if account == DEFAULT_ACCOUNT:
+            return os.path.join(self.auth_dir, f"{platform}_auth.json")
+        if not ACCOUNT_NAME.fullmatch(account):
+            raise ValueError(f"Invalid account name: {account!r}")
+        return os.path.join(self.auth_dir, f"{platform}_auth_{account}.json")
+
+    async def publish(
+        self,
+        platform: str,
+        text: str,
+        image_path: str,
+        account: Optional[str] = None
+    ) -> str:
+        """
+        Publish a post as ``account`` (default: the platform's default login).
+
+        Returns:
+            URL of the new post
+
+        Raises:
+            FileNotFoundError: If the account has no saved session
+            ValueError: If the platform is not supported, or posting fails
+        """
+        if platform not in PLATFORMS:
+            raise ValueError(f"Unsupported platform: {platform}")
+        account = account or DEFAULT_ACCOUNT
+        options = {"auth_file": self.auth_file(platform, account)}
+        if platform == "linkedin":
+            options["credentials"] = account == DEFAULT_ACCOUNT
+        poster = POSTERS[platform][0]
+        return await poster(
+            text, image_path, pool=self.pool, resolver=self.resolver, tracer=self.tracer, **options
+        )
+
+    async def _publish_timed(
+        self,
+        platform: str,
+        text: str,
+        image_path: str,
+        timeout: float,
+        account: Optional[str] = None
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        url, error = None, None
+        try:
+            url = await asyncio.wait_for(self.publish(platform, text, image_path, account), timeout)
+        except asyncio.TimeoutError:
+            error = f"Timed out after {timeout:g}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        latency_ms = (time.perf_counter() - started) * 1000
+        if error:
+            logger.warning(f"Publishing to {platform} failed after {latency_ms:.0f} ms: {error}")
+        return {"url": url, "latency_ms": round(latency_ms, 1), "error": error}
+
+    def select(
+        self,
+        result: Dict[str, Any],
+        platforms: Optional[Iterable[str]] = None
+    ) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """
+        The platforms :meth:`publish_all` would publish an agent result to.
+
+        Returns:
+            Tuple of (platforms to publish to, outcomes of the requested
+            platforms that can't be)
+        """
+        strategies = find_strategies(result)
+        skipped: Dict[str, Dict[str, Any]] = {}
+        selected = []
+        # An explicit empty list selects nothing
+        for platform in dict.fromkeys(strategies if platforms is None else platforms):
+            if platform not in PLATFORMS:
+                if platforms is not None:
+                    skipped[platform] = {"url": None, "latency_ms": 0.0, "error": "Unsupported platform"}
+            elif not isinstance(strategies.get(platform), dict):
+                skipped[platform] = {"url": None, "latency_ms": 0.0, "error": "No strategy for platform"}
+            else:
+                selected.append(platform)
+        return selected, skipped
+
+    async def publish_all(
+        self,
+        result: Dict[str, Any],
+        image_path: str,
+        platforms: Optional[Iterable[str]] = None,
+        timeout: float = 300.0,
+        account: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Publish an agent result's strategies to several platforms at once.
+
+        Every platform runs concurrently in its own browser context, so the
+        total time is the slowest platform's, and one platform failing or
+        timing out does not affect the others. By default every supported
+        platform the result has a strategy for is published (a blog strategy
+        is not); explicitly requested platforms that can't be get an error.
+
+        Args:
+            result: Agent result carrying ``strategies``
+            image_path: Image to attach to every post
+            platforms: Platforms to publish to (default: every supported one
+                the result has a strategy for)
+            timeout: Seconds each platform may take
+            account: Account to post as (default: each platform's default login)
+
+        Returns:
+            Per platform: ``url``, ``latency_ms`` and ``error`` (None on success)
+        """
+        strategies = find_strategies(result)
+        selected, results = self.select(result, platforms)
+        outcomes = await asyncio.gather(*(
+            self._publish_timed(platform, post_text(strategies[platform]), image_path, timeout, account)
+            for platform in selected
+        ))
+        results.update(zip(selected, outcomes))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Per platform: requests allowed and blocked by its resource policy."""
+        return {platform: policy.stats() for platform, (_, _, policy) in POSTERS.items()}
+
+    async def close(self) -> None:
+        await self.pool.close()
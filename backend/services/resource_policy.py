@@ -0,0 +1,96 @@
+"""Request-routing policies that keep poster pages from loading what they don't use."""
+import logging
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+
+from playwright.async_api import BrowserContext, Error as PlaywrightError, Route
+
+logger = logging.getLogger(__name__)
+
+# Blocked requests never transfer, so their size is estimated from typical
+# sizes per resource type
+TYPICAL_BYTES = {
+    "image": 40 * 1024,
+    "media": 512 * 1024,
+    "font": 48 * 1024,
+    "stylesheet": 24 * 1024,
+    "script": 64 * 1024,
+}
+DEFAULT_TYPICAL_BYTES = 2 * 1024
+
+# Analytics and ad hosts shared by both platforms
+COMMON_TRACKERS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"adservice\.google\.",
+    r"scorecardresearch\.com",
+]
+
+
+class ResourcePolicy:
+    """
+    Aborts requests a posting flow doesn't need.
+
+    Requests are blocked by resource type (``image``, ``media``, ``font``,
+    ...) or by URL pattern (trackers, ad hosts, logging beacons); URL
+    patterns in ``allow_urls`` always go through, and page documents are
+    never blocked. Installed on a context with :meth:`install`, it counts
+    blocked and allowed requests and the bytes the blocked ones would
+    (typically) have cost.
+    """
+
+    def __init__(
+        self,
+        block_types: Iterable[str] = (),
+        block_urls: Iterable[str] = (),
+        allow_urls: Iterable[str] = ()
+    ):
+        self.block_types = frozenset(block_types)
+        block_urls, allow_urls = list(block_urls), list(allow_urls)
+        self._block = re.compile("|".join(block_urls)) if block_urls else None
+        self._allow = re.compile("|".join(allow_urls)) if allow_urls else None
+
+        self.allowed_requests = 0
+        self.blocked_requests = 0
+        self.blocked_bytes = 0
+        self.blocked_by_reason: Counter = Counter()
+
+    def verdict(self, url: str, resource_type: str) -> Optional[str]:
+        """Why a request would be blocked (its type, or "url"), or None."""
+        if resource_type == "document" or (self._allow and self._allow.search(url)):
+            return None
+        if resource_type in self.block_types:
+            return resource_type
+        if self._block and self._block.search(url):
+            return "url"
+        return None
+
+    async def handle(self, route: Route) -> None:
+        request = route.request
+        reason = self.verdict(request.url, request.resource_type)
+        try:
+            if reason is None:
+                self.allowed_requests += 1
+                await route.continue_()
+                return
+            self.blocked_requests += 1
+            self.blocked_bytes += TYPICAL_BYTES.get(request.resource_type, DEFAULT_TYPICAL_BYTES)
+            self.blocked_by_reason[reason] += 1
+            await route.abort("blockedbyclient")
+        except PlaywrightError:
+            # The page navigated or closed while the request was pending
+            pass
+
+    async def install(self, context: BrowserContext) -> None:
+        """Route every request of a context through this policy."""
+        await context.route("**/*", self.handle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "allowed_requests": self.allowed_requests,
+            "blocked_requests": self.blocked_requests,
+            "blocked_bytes_estimated": self.blocked_bytes,
+            "blocked_by_reason": dict(self.blocked_by_reason),
+        }
@@ -0,0 +1,166 @@
+"""Two-tier (memory LRU + disk) cache for agent pipeline results."""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Cache of agent results keyed by image digest and request parameters.
+
+    Lookups go to an in-memory LRU first, then to JSON files on disk, which
+    survive restarts and are shared by every worker using the same
+    directory. Entries expire after ``ttl`` seconds; the memory tier is
+    bounded by entry count and the disk tier by total size.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        ttl: int = 7 * 24 * 3600,
+        max_entries: int = 512,
+        max_disk_bytes: int = 256 * 1024 * 1024
+    ):
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(digest: str, **params) -> str:
+        """Build a cache key from an image digest and request parameters."""
+        payload = json.dumps({"digest": digest, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry["expires_at"], entry["value"]
+
+    def _write_disk(self, key: str, expires_at: float, value: Any) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Don't leave partial entries behind (e.g. unserializable values, disk full)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a cached result, or None on a miss."""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            del self._memory[key]
+
+        if self.directory:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None and entry[0] > now:
+                self._remember(key, *entry)
+                self.disk_hits += 1
+                return entry[1]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a result in both tiers."""
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self.directory:
+            await asyncio.to_thread(self._write_disk, key, expires_at, value)
+
+    def evict(self) -> int:
+        """
+        Delete expired disk entries, then the oldest entries until the disk
+        tier is under max_disk_bytes.
+
+        Returns:
+            Number of disk entries deleted
+        """
+        if not self.directory:
+            return 0
+
+        now = time.time()
+        entries: List[Tuple[float, int, Path]] = []
+        removed = 0
+
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} cached results from {self.directory}")
+        return removed
+
+    async def run_eviction(self, interval: float) -> None:
+        """Evict periodically until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.evict)
+            except Exception as e:
+                logger.error(f"Result cache eviction failed: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory tier size."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,189 @@
+"""Concurrent selector resolution with a persisted cache of winning selectors."""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from playwright.async_api import ElementHandle, Error as PlaywrightError, Page
+
+logger = logging.getLogger(__name__)
+
+
+async def _wait_for(page: Page, selector: str, state: str, timeout: float) -> Optional[ElementHandle]:
+    try:
+        return await page.wait_for_selector(selector, state=state, timeout=timeout)
+    except PlaywrightError:
+        return None
+
+
+async def _query(page: Page, selector: str, state: str) -> Optional[ElementHandle]:
+    """Check for a selector without waiting."""
+    try:
+        element = await page.query_selector(selector)
+        if element is not None and (state != "visible" or await element.is_visible()):
+            return element
+    except PlaywrightError:
+        pass
+    return None
+
+
+class SelectorResolver:
+    """
+    Finds the element for a poster step by racing its candidate selectors.
+
+    Every candidate is waited on at once and the first match wins, so a
+    stale selector costs nothing instead of a full timeout. The selector
+    that won is remembered per platform and step (on disk when ``path`` is
+    set) and checked first next time, which usually resolves the step
+    without waiting at all. Resolution times are kept per step.
+    """
+
+    def __init__(self, path: Optional[str] = "selector_cache.json"):
+        self.path = path
+        self._winners: Dict[str, Dict[str, str]] = {}
+        self._timings: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if path:
+            try:
+                with open(path) as f:
+                    self._winners = json.load(f)
+            except (FileNotFoundError, ValueError):
+                pass
+
+    def winner(self, platform: str, step: str) -> Optional[str]:
+        """The selector that last resolved a step, if any."""
+        return self._winners.get(platform, {}).get(step)
+
+    def _write(self, winners: Dict[str, Dict[str, str]]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".selectors-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(winners, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    async def _remember(self, platform: str, step: str, selector: str) -> None:
+        if self.winner(platform, step) == selector:
+            return
+        self._winners.setdefault(platform, {})[step] = selector
+        if self.path:
+            try:
+                await asyncio.to_thread(
+                    self._write, {name: dict(steps) for name, steps in self._winners.items()}
+                )
+            except OSError as e:
+                logger.warning(f"Could not save selector cache: {e}")
+
+    def _record_time(self, platform: str, step: str, seconds: float, resolved: bool) -> None:
+        timing = self._timings.setdefault(
+            (platform, step), {"count": 0, "misses": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+        )
+        timing["count"] += 1
+        timing["misses"] += 0 if resolved else 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+        timing["last"] = seconds
+
+    async def resolve(
+        self,
+        page: Page,
+        platform: str,
+        step: str,
+        selectors: Sequence[str],
+        timeout: float = 5000,
+        state: str = "visible"
+    ) -> Tuple[Optional[ElementHandle], Optional[str]]:
+        """
+        Find the element for a step.
+
+        Args:
+            page: Page to search
+            platform: Platform name, e.g. "instagram"
+            step: Step name, e.g. "create_button"
+            selectors: Candidate selectors, in order of preference
+            timeout: How long to wait for any candidate, in milliseconds
+            state: "visible" or "attached"
+
+        Returns:
+            Tuple of (element, winning selector), or (None, None) if no
+            candidate matched within the timeout
+        """
+        started = time.perf_counter()
+        cached = self.winner(platform, step)
+        ordered: List[str] = list(selectors)
+        if cached in ordered:
+            ordered.remove(cached)
+            ordered.insert(0, cached)
+
+        element, selector = None, None
+        if cached in ordered:
+            # Fast path: the last winner is usually already there
+            element = await _query(page, cached, state)
+            selector = cached if element is not None else None
+
+        if element is None:
+            tasks = {
+                asyncio.create_task(_wait_for(page, candidate, state, timeout)): candidate
+                for candidate in ordered
+            }
+            pending = set(tasks)
+            try:
+                while pending and element is None:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    found = [task for task in done if task.result() is not None]
+                    if found:
+                        # Several can match at once; prefer the earlier candidate
+                        task = min(found, key=lambda task: ordered.index(tasks[task]))
+                        element, selector = task.result(), tasks[task]
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        elapsed = time.perf_counter() - started
+        self._record_time(platform, step, elapsed, element is not None)
+        if element is None:
+            logger.warning(f"{platform}/{step}: no selector matched in {elapsed * 1000:.0f} ms")
+            return None, None
+
+        logger.info(f"{platform}/{step}: resolved {selector!r} in {elapsed * 1000:.0f} ms")
+        await self._remember(platform, step, selector)
+        return element, selector
+
+    async def click(
+        self,
+        page: Page,
+        platform: str,
+        step: str,
+        selectors: Sequence[str],
+        timeout: float = 5000
+    ) -> Optional[str]:
+        """
+        Resolve a step and click it.
+
+        Returns:
+            The selector that was clicked, or None if none matched
+        """
+        element, selector = await self.resolve(page, platform, step, selectors, timeout)
+        if element is None:
+            return None
+        try:
+            await element.click(timeout=timeout)
+        except PlaywrightError as e:
+            logger.warning(f"{platform}/{step}: could not click {selector!r}: {e}")
+            return None
+        return selector
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Per platform and step: resolution counts, misses, times (ms) and winner."""
+        stats: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (platform, step), timing in self._timings.items():
+            stats.setdefault(platform, {})[step] = {
+                "count": timing["count"],
+                "misses": timing["misses"],
+                "avg_ms": timing["total"] / timing["count"] * 1000,
+                "max_ms": timing["max"] * 1000,
+                "last_ms": timing["last"] * 1000,
+                "winner": self.winner(platform, step),
+            }
+        return stats
@@ -0,0 +1,102 @@
+"""Concurrency slots shared by worker processes through a SQLite file."""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this ID exists on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedSlots:
+    """
+    A counting semaphore shared by every process using the same file.
+
+    :meth:`try_acquire` never waits; callers retry later. Each slot records
+    its holder's process ID, so slots held by a worker that crashed are
+    reclaimed by the next acquire. Calls are short, blocking SQLite
+    transactions; run them off the event loop (the admission controller
+    uses one worker thread, which also keeps them in order).
+    ``last_held`` is the number of slots held across all processes as of
+    this process's last acquire or release, for stats that must not block.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS slots (
+            pool TEXT NOT NULL,
+            token TEXT PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            acquired_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_slots_pool ON slots (pool);
+    """
+
+    def __init__(self, path: str, limit: int, pool: str = "agent"):
+        self.path = path
+        self.limit = limit
+        self.pool = pool
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=1000")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+        self.last_held = 0
+
+    def try_acquire(self) -> Optional[str]:
+        """Take a slot; returns its token, or None if all are held."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                holders = self._conn.execute(
+                    "SELECT token, pid FROM slots WHERE pool = ?", (self.pool,)
+                ).fetchall()
+                dead = [token for token, pid in holders if pid != os.getpid() and not pid_alive(pid)]
+                self._conn.executemany("DELETE FROM slots WHERE token = ?", [(token,) for token in dead])
+                self.last_held = len(holders) - len(dead)
+                if self.last_held >= self.limit:
+                    self._conn.execute("COMMIT")
+                    return None
+                token = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO slots (pool, token, pid, acquired_at) VALUES (?, ?, ?, ?)",
+                    (self.pool, token, os.getpid(), time.time())
+                )
+                self._conn.execute("COMMIT")
+                self.last_held += 1
+                return token
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def release(self, token: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM slots WHERE token = ?", (token,))
+            self.last_held = self._conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE pool = ?", (self.pool,)
+            ).fetchone()[0]
+
+    def held(self) -> int:
+        """Slots held across all processes."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE pool = ?", (self.pool,)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        """Release this process's slots and close the database."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM slots WHERE pool = ? AND pid = ?", (self.pool, os.getpid())
+            )
+            self._conn.close()
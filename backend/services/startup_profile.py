@@ -0,0 +1,169 @@
+"""Import and initialization timings of an app's cold start."""
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _ImportTimer:
+    """
+    Meta path finder that times each module's execution.
+
+    It finds nothing itself: it asks the finders after it and wraps the
+    ``exec_module`` of the loader they return, so modules keep their real
+    loader. Builtin and frozen modules (class loaders) are not timed.
+    """
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self.profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, name, path=None, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+
+        loader = spec.loader
+        # Zip importers load several modules; wrap each loader once
+        wrapped = "exec_module" in getattr(loader, "__dict__", {})
+        if loader is not None and not isinstance(loader, type) and not wrapped:
+            try:
+                loader.exec_module = self._timed(loader.exec_module)
+            except AttributeError:
+                pass
+        return spec
+
+    def _timed(self, exec_module):
+        local = self._local
+
+        def timed_exec_module(module):
+            stack = getattr(local, "stack", None)
+            if stack is None:
+                stack = local.stack = []
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                total = time.perf_counter() - started
+                children = stack.pop()
+                if stack:
+                    stack[-1] += total
+                self.profiler._record_import(module.__name__, total - children, total)
+
+        return timed_exec_module
+
+
+class StartupProfiler:
+    """
+    Where an app's cold start goes.
+
+    Times named initialization steps (job store, caches, agent client,
+    ...) relative to when the profiler was created, and when the app
+    started serving and became ready. With :meth:`track_imports`, also the
+    self and cumulative import time of every module imported afterwards,
+    including those deferred until first use.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imported_at: Optional[float] = None
+        self.serving_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._steps: List[Dict[str, Any]] = []
+        self._imports: Dict[str, Dict[str, Any]] = {}
+        self._timer: Optional[_ImportTimer] = None
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self, at: Optional[float]) -> Optional[float]:
+        return None if at is None else round((at - self.started) * 1000, 1)
+
+    def track_imports(self) -> None:
+        """Time every module imported from now on. Adds a little overhead to each import."""
+        if self._timer is None:
+            self._timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._timer)
+
+    def _record_import(self, name: str, self_seconds: float, total_seconds: float) -> None:
+        with self._lock:
+            self._imports[name] = {
+                "module": name,
+                "self_ms": round(self_seconds * 1000, 2),
+                "total_ms": round(total_seconds * 1000, 2),
+                # Imported after startup, on first use
+                "deferred": self.serving_at is not None,
+            }
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """Time the block as one initialization step; exceptions propagate."""
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            with self._lock:
+                self._steps.append({
+                    "name": name,
+                    "at_ms": self._elapsed_ms(started),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "outcome": outcome,
+                })
+
+    def mark_imported(self) -> None:
+        self.imported_at = time.perf_counter()
+
+    def mark_serving(self) -> None:
+        self.serving_at = time.perf_counter()
+
+    def mark_ready(self) -> None:
+        self.ready_at = time.perf_counter()
+        logger.info(
+            f"Ready after {self._elapsed_ms(self.ready_at):.0f} ms (serving after "
+            f"{self._elapsed_ms(self.serving_at) or 0:.0f} ms); slowest steps: "
+            + ", ".join(f"{s['name']} {s['duration_ms']:.0f} ms" for s in self.slowest_steps(3))
+        )
+
+    def slowest_steps(self, count: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._steps, key=lambda s: s["duration_ms"], reverse=True)[:count]
+
+    def report(self, top: int = 25) -> Dict[str, Any]:
+        """Timings in ms since the profiler was created; modules by self time, slowest first."""
+        with self._lock:
+            steps = list(self._steps)
+            modules = sorted(self._imports.values(), key=lambda m: m["self_ms"], reverse=True)
+        return {
+            "imported_after_ms": self._elapsed_ms(self.imported_at),
+            "serving_after_ms": self._elapsed_ms(self.serving_at),
+            "ready_after_ms": self._elapsed_ms(self.ready_at),
+            "steps": steps,
+            "imports": {
+                "tracked": self._timer is not None,
+                "modules": len(modules),
+                "total_self_ms": round(sum(m["self_ms"] for m in modules), 1),
+                "slowest": modules[:top],
+            },
+        }
+
+
+# Global profiler; created when first imported, so import it first
+startup_profiler = StartupProfiler()
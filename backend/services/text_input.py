@@ -0,0 +1,179 @@
+"""Fast, verified text entry into inputs and contenteditable editors."""
+import asyncio
+import logging
+import time
+import unicodedata
+from typing import Optional
+
+from playwright.async_api import ElementHandle, Error as PlaywrightError, Page
+
+logger = logging.getLogger(__name__)
+
+# Dispatches a synthetic paste; rich editors (Quill, Lexical, Draft.js)
+# handle it like a real one, one paragraph per line
+PASTE_SCRIPT = """
+(el, text) => {
+    el.focus();
+    const escape = (line) => line
+        .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+    const data = new DataTransfer();
+    data.setData('text/plain', text);
+    data.setData('text/html', text.split('\\n')
+        .map((line) => `<p>${escape(line) || '<br>'}</p>`).join(''));
+    const event = new ClipboardEvent('paste', {
+        clipboardData: data, bubbles: true, cancelable: true
+    });
+    el.dispatchEvent(event);
+    return event.defaultPrevented;
+}
+"""
+
+READ_SCRIPT = """
+(el) => ('value' in el && typeof el.value === 'string') ? el.value : el.innerText
+"""
+
+CLEAR_SCRIPT = """
+(el) => {
+    el.focus();
+    if ('value' in el && typeof el.value === 'string') {
+        el.value = '';
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+    } else {
+        document.execCommand('selectAll', false);
+        document.execCommand('delete', false);
+    }
+}
+"""
+
+IS_FIELD_SCRIPT = "(el) => el.tagName === 'TEXTAREA' || el.tagName === 'INPUT'"
+
+ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+
+class TextInsertionError(ValueError):
+    """Raised when no strategy got the text into the editor intact."""
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form for comparing what was inserted with what the editor
+    shows: NFC, no zero-width characters or non-breaking spaces, and no
+    blank lines (editors render paragraph breaks differently).
+    """
+    text = unicodedata.normalize("NFC", text).translate(ZERO_WIDTH)
+    text = text.replace("\r\n", "\n").replace("\u00a0", " ")
+    return "\n".join(line.strip() for line in text.split("\n") if line.strip())
+
+
+async def read_text(element: ElementHandle) -> str:
+    """Current text of an input, textarea or contenteditable element."""
+    return await element.evaluate(READ_SCRIPT)
+
+
+async def _verified(element: ElementHandle, text: str, settle: float = 1.5) -> bool:
+    """
+    Read the editor back until it matches, or its content stops changing.
+    Some editors apply a paste asynchronously, so the first read can be stale.
+    """
+    expected = normalize_text(text)
+    deadline = time.monotonic() + settle
+    previous, stable_since = None, time.monotonic()
+    while True:
+        try:
+            current = normalize_text(await read_text(element))
+        except PlaywrightError:
+            return False
+        if current == expected:
+            return True
+        now = time.monotonic()
+        if current != previous:
+            previous, stable_since = current, now
+        elif now - stable_since >= 0.3 or now >= deadline:
+            return False
+        await asyncio.sleep(0.05)
+
+
+async def _clear(element: ElementHandle) -> None:
+    try:
+        await element.evaluate(CLEAR_SCRIPT)
+    except PlaywrightError:
+        pass
+
+
+async def _paste(page: Page, element: ElementHandle, text: str) -> None:
+    await element.evaluate(PASTE_SCRIPT, text)
+
+
+async def _fill(page: Page, element: ElementHandle, text: str) -> None:
+    await element.fill(text)
+
+
+async def _insert(page: Page, element: ElementHandle, text: str) -> None:
+    # One input event per line; Shift+Enter breaks lines without
+    # accepting an open hashtag or mention suggestion
+    await element.focus()
+    for index, line in enumerate(text.split("\n")):
+        if index:
+            await page.keyboard.press("Shift+Enter")
+        if line:
+            await page.keyboard.insert_text(line)
+
+
+async def _type(page: Page, element: ElementHandle, text: str) -> None:
+    await element.focus()
+    for index, line in enumerate(text.split("\n")):
+        if index:
+            await page.keyboard.press("Shift+Enter")
+        if line:
+            await page.keyboard.type(line, delay=10)
+
+
+async def insert_text(
+    page: Page,
+    element: ElementHandle,
+    text: str,
+    allow_typing: bool = True
+) -> str:
+    """
+    Put text into an editor and check that it arrived intact.
+
+    Strategies, fastest first: ``fill`` for plain inputs and textareas,
+    a synthetic clipboard ``paste`` for contenteditable editors, then
+    ``insert`` (one input event per line). After each attempt the editor
+    content is read back and compared; on a mismatch it is cleared and the
+    next strategy is tried. Per-character ``type`` is the last resort.
+
+    Hashtags and mentions are inserted as plain text, which the platforms
+    link on publish; it does not open their suggestion popups.
+
+    Returns:
+        Name of the strategy that worked
+
+    Raises:
+        TextInsertionError: If no strategy produced the expected text
+    """
+    try:
+        is_field = await element.evaluate(IS_FIELD_SCRIPT)
+    except PlaywrightError:
+        is_field = False
+
+    strategies = [("fill", _fill)] if is_field else [("paste", _paste), ("insert", _insert)]
+    if allow_typing:
+        strategies.append(("type", _type))
+
+    last_error: Optional[Exception] = None
+    for name, strategy in strategies:
+        try:
+            await strategy(page, element, text)
+        except PlaywrightError as e:
+            last_error = e
+            logger.info(f"Text insertion via {name} failed: {e}")
+        else:
+            if await _verified(element, text):
+                logger.info(f"Inserted {len(text)} characters via {name}")
+                return name
+            logger.info(f"Text insertion via {name} did not match, trying the next strategy")
+        await _clear(element)
+
+    detail = f": {last_error}" if last_error else ""
+    raise TextInsertionError(f"Could not insert text into the editor{detail}")
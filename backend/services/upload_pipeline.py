@@ -0,0 +1,113 @@
+"""Upload pipeline shared by the image upload endpoints."""
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from services.api_metrics import api_metrics
+from services.http_client import PooledHTTPClient
+from services.image_ingest import ImageSource
+from services.image_normalize import ImageNormalizer
+from services.image_store import ImageStore
+
+# Overridable so benchmarks can point uploads at a local stub
+TMPFILES_UPLOAD_URL = os.getenv("TMPFILES_UPLOAD_URL", "https://tmpfiles.org/api/v1/upload")
+
+
+class PipelineError(Exception):
+    """Raised when an upstream step of the upload pipeline fails."""
+
+    def __init__(self, message: str, **details):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+
+
+async def upload_to_tmpfiles(client: PooledHTTPClient, upload: ImageSource) -> str:
+    """
+    Stream an uploaded image to tmpfiles.org.
+
+    Returns:
+        Direct download URL of the uploaded file
+    """
+    headers, body = upload.multipart()
+    with api_metrics.stage("tmpfiles_upload"):
+        response = await client.post(TMPFILES_UPLOAD_URL, content=body, headers=headers)
+        if response.status_code != 200:
+            raise PipelineError("Temporary file upload failed")
+
+    with api_metrics.stage("tmpfiles_response_parse"):
+        data = response.json()
+        if data.get("status") != "success":
+            raise PipelineError("Failed to get temporary file URL")
+
+    # Convert tmpfiles.org URL to direct download URL
+    return data["data"]["url"].replace("tmpfiles.org/", "tmpfiles.org/dl/")
+
+
+async def stage_image(
+    client: PooledHTTPClient,
+    upload: ImageSource,
+    store: Optional[ImageStore] = None,
+    public_base_url: str = "",
+    normalizer: Optional[ImageNormalizer] = None
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Make an uploaded image reachable by the external agent.
+
+    The image is first normalized when a normalizer is configured. It is then
+    put in the local image store when one is configured, so the agent fetches
+    it from this host; otherwise it goes to tmpfiles.org.
+
+    Returns:
+        Tuple of (URL the agent should download the image from,
+        normalization stats or None)
+    """
+    normalization = None
+    if normalizer is not None:
+        with api_metrics.stage("normalize"):
+            upload, normalization = await normalizer.normalize(upload)
+
+    try:
+        if store is not None and public_base_url:
+            with api_metrics.stage("image_store_put"):
+                name = await store.put(upload.chunks(), upload.content_type)
+            return store.signed_url(public_base_url, name), normalization
+        return await upload_to_tmpfiles(client, upload), normalization
+    finally:
+        if normalization is not None:
+            upload.remove()
+
+
+async def call_external_agent(
+    client: PooledHTTPClient,
+    agent_url: str,
+    session_id: str,
+    image_url: str,
+    read_timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    POST the session ID and image link to the external agent webhook.
+
+    Returns:
+        The ``data`` field of the webhook response if present, otherwise the
+        entire response
+    """
+    with api_metrics.stage("agent_webhook"):
+        response = await client.post(
+            agent_url,
+            json={
+                "session_id": session_id,
+                "image_url": image_url
+            },
+            read_timeout=read_timeout
+        )
+
+        if response.status_code != 200:
+            raise PipelineError(
+                "Webhook request failed",
+                status_code=response.status_code,
+                response=response.text
+            )
+
+    with api_metrics.stage("agent_response_parse"):
+        result = response.json()
+    return result.get("data", result)
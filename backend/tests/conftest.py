@@ -0,0 +1,31 @@
+"""Run the tests from any directory against the backend packages."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def main_app(tmp_path, monkeypatch):
+    """The orchestrator module, set up to start in a scratch directory."""
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    # No agent client or normalizer processes; the tests don't use them
+    monkeypatch.setenv("STARTUP_WARMUP", "false")
+    monkeypatch.setenv("IMAGE_NORMALIZE", "false")
+    monkeypatch.chdir(tmp_path)
+    import main
+
+    # Settings are read once on import; tests change them on this instance
+    monkeypatch.setattr(main, "settings", main.settings.model_copy())
+    return main
+
+
+@pytest.fixture
+def main_client(main_app):
+    """A TestClient for the orchestrator app, started in a scratch directory."""
+    from fastapi.testclient import TestClient
+
+    with TestClient(main_app.app) as client:
+        yield client
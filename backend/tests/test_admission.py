@@ -0,0 +1,169 @@
+"""Admission control: fairness, the queue bound and shared slots."""
+import asyncio
+
+import pytest
+
+from services.admission import AdmissionController, QueueFullError
+from services.shared_slots import SharedSlots
+
+
+@pytest.fixture
+def shared_factory(tmp_path):
+    slots = []
+
+    def make(limit):
+        shared = SharedSlots(str(tmp_path / "slots.db"), limit)
+        slots.append(shared)
+        return shared
+
+    yield make
+    for shared in slots:
+        shared.close()
+
+
+def test_shared_slots_cap_all_controllers(shared_factory):
+    async def run():
+        first = AdmissionController(max_concurrent=2, shared=shared_factory(2), shared_poll=0.01)
+        second = AdmissionController(max_concurrent=2, shared=shared_factory(2), shared_poll=0.01)
+        tickets = [first.reserve("a"), first.reserve("a"), second.reserve("b")]
+        entered = [asyncio.ensure_future(ticket.__aenter__()) for ticket in tickets]
+        await asyncio.sleep(0.1)
+        granted = sum(task.done() for task in entered)
+        held = max(first.stats()["shared_slots_held"], second.stats()["shared_slots_held"])
+
+        # Releasing a slot lets the waiting ticket in, whichever controller it is on
+        waiting = next(i for i, task in enumerate(entered) if not task.done())
+        done = next(i for i, task in enumerate(entered) if task.done())
+        await tickets[done].__aexit__(None, None, None)
+        await asyncio.wait_for(entered[waiting], 1)
+        for i, ticket in enumerate(tickets):
+            if i != done:
+                await ticket.__aexit__(None, None, None)
+        await asyncio.sleep(0.05)
+        return granted, held, first.stats()["admitted"] + second.stats()["admitted"]
+
+    assert asyncio.run(run()) == (2, 2, 3)
+
+
+def test_shared_queue_bound_ignores_free_local_slots(shared_factory):
+    async def run():
+        shared = shared_factory(1)
+        # Another process holds the only shared slot
+        shared.try_acquire()
+        controller = AdmissionController(
+            max_concurrent=4, max_queue=3, shared=shared_factory(1), shared_poll=0.01
+        )
+        accepted, rejected = [], 0
+        for _ in range(10):
+            try:
+                accepted.append(controller.reserve("a"))
+            except QueueFullError:
+                rejected += 1
+        for ticket in accepted:
+            ticket.cancel()
+        return len(accepted), rejected
+
+    assert asyncio.run(run()) == (3, 7)
+
+
+def test_failing_shared_acquire_is_retried(shared_factory):
+    shared = shared_factory(1)
+    real_acquire = shared.try_acquire
+    calls = []
+
+    def flaky_acquire():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return real_acquire()
+
+    shared.try_acquire = flaky_acquire
+
+    async def run():
+        controller = AdmissionController(max_concurrent=1, shared=shared, shared_poll=0.01)
+        async with controller.reserve("a"):
+            pass
+        return controller.stats()
+
+    stats = asyncio.run(run())
+    assert len(calls) >= 2 and stats["admitted"] == 1
+
+
+def test_waiting_tickets_are_granted_round_robin_across_users():
+    async def run():
+        controller = AdmissionController(max_concurrent=1)
+        order = []
+
+        async def call(user_id, name, ticket):
+            async with ticket:
+                order.append(name)
+                await asyncio.sleep(0)
+
+        # Reserve everything up front, as a burst from user a would
+        reserved = [(user, name, controller.reserve(user)) for user, name in (
+            ("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1")
+        )]
+        await asyncio.gather(*(call(*item) for item in reserved))
+        return order, controller.stats()
+
+    order, stats = asyncio.run(run())
+    # a1 got the free slot; after that a waits its turn behind b and c
+    assert order == ["a1", "a2", "b1", "c1", "a3"]
+    assert stats["admitted"] == 5 and stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_per_user_share_of_the_queue_is_bounded():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, max_queued_per_user=2)
+        tickets = [controller.reserve("a")]  # Granted straight away
+        tickets += [controller.reserve("a"), controller.reserve("a")]
+        with pytest.raises(QueueFullError) as rejected:
+            controller.reserve("a")
+        tickets.append(controller.reserve("b"))
+        stats = controller.stats()
+        for ticket in tickets:
+            ticket.cancel()
+        return rejected.value, stats
+
+    error, stats = asyncio.run(run())
+    assert error.retry_after >= 1
+    assert stats["queued"] == 3 and stats["rejected"] == 1
+
+
+def test_cancelled_tickets_give_back_their_place_and_slot():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=2)
+        holder = controller.reserve("a")
+        await holder.__aenter__()
+        waiter = controller.reserve("b")
+        entering = asyncio.ensure_future(waiter.__aenter__())
+        await asyncio.sleep(0)
+
+        # A client disconnecting while queued withdraws its ticket
+        entering.cancel()
+        await asyncio.gather(entering, return_exceptions=True)
+        withdrawn = controller.stats()["queued"]
+
+        # A granted ticket that is cancelled instead of exited frees the slot
+        next_ticket = controller.reserve("c")
+        holder.cancel()
+        await asyncio.wait_for(next_ticket.__aenter__(), 1)
+        await next_ticket.__aexit__(None, None, None)
+        return withdrawn, controller.stats()
+
+    withdrawn, stats = asyncio.run(run())
+    assert withdrawn == 0
+    assert stats["active"] == 0 and stats["queued"] == 0 and stats["admitted"] == 2
+
+
+def test_full_queue_answers_429_with_retry_after(main_client, monkeypatch):
+    import main
+
+    limiter = AdmissionController(max_concurrent=1, max_queue=0)
+    limiter._avg_service_time = 12.0
+    monkeypatch.setattr(main, "agent_limiter", limiter)
+
+    response = main_client.post("/api/v1/jobs/json", json={"text_prompt": "Launch post", "user_id": "u1"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "12"
+    assert limiter.stats()["rejected"] == 1
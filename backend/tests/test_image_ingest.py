@@ -0,0 +1,124 @@
+"""Magic-byte sniffing and size-bounded streaming of uploads."""
+import asyncio
+import io
+
+import pytest
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from services.image_ingest import (
+    MULTIPART_OVERHEAD, ImageTooLargeError, ImageUpload, UnsupportedImageError,
+    exceeds_upload_limit, sniff_image_type
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 200
+WEBP = b"RIFF\x10\x00\x00\x00WEBPVP8 " + b"\x00" * 200
+
+
+def upload_file(data: bytes, content_type: str = "image/png", size=...) -> UploadFile:
+    return UploadFile(
+        io.BytesIO(data),
+        size=len(data) if size is ... else size,
+        filename="photo.png",
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+@pytest.mark.parametrize("head, expected", [
+    (PNG, "image/png"),
+    (JPEG, "image/jpeg"),
+    (WEBP, "image/webp"),
+    (b"GIF89a" + b"\x00" * 20, None),
+    (b"RIFF\x10\x00\x00\x00WAVEfmt ", None),
+    (b"RIFF", None),
+    (b"<svg xmlns='http://www.w3.org/2000/svg'/>", None),
+    (b"", None),
+])
+def test_sniff_image_type(head, expected):
+    assert sniff_image_type(head) == expected
+
+
+def test_sniffed_type_overrides_the_declared_one():
+    upload = asyncio.run(ImageUpload.open(upload_file(JPEG, "image/png"), 1024))
+    assert upload.content_type == "image/jpeg"
+
+
+def test_spoofed_content_type_is_rejected():
+    html = upload_file(b"<html><script>alert(1)</script></html>", "image/png")
+    with pytest.raises(UnsupportedImageError):
+        asyncio.run(ImageUpload.open(html, 1024))
+
+
+def test_declared_size_over_the_limit_is_rejected_before_reading():
+    with pytest.raises(ImageTooLargeError) as rejected:
+        asyncio.run(ImageUpload.open(upload_file(PNG, size=10 ** 9), 1024))
+    assert rejected.value.status_code == 413
+
+
+def test_streams_in_bounded_chunks():
+    data = PNG + bytes(range(256)) * 4
+    upload = asyncio.run(ImageUpload.open(upload_file(data), 4096, chunk_size=64))
+
+    async def run():
+        return [chunk async for chunk in upload.chunks()]
+
+    chunks = asyncio.run(run())
+    assert b"".join(chunks) == data
+    assert max(len(chunk) for chunk in chunks) == 64
+    # Digest reads the stream again from the start
+    assert len(asyncio.run(upload.digest())) == 64
+
+
+def test_limit_is_enforced_partway_through_the_stream():
+    # Without a known size, only the stream can tell the upload is too big
+    data = PNG + b"\x00" * 1000
+    upload = asyncio.run(ImageUpload.open(upload_file(data, size=None), 512, chunk_size=128))
+
+    received = []
+
+    async def run():
+        async for chunk in upload.chunks():
+            received.append(chunk)
+
+    with pytest.raises(ImageTooLargeError):
+        asyncio.run(run())
+    assert 0 < sum(map(len, received)) <= 512
+    with pytest.raises(ImageTooLargeError):
+        with upload.open_file():
+            pass
+
+
+def test_multipart_body_is_streamed_with_its_length():
+    upload = asyncio.run(ImageUpload.open(upload_file(PNG), 1024, chunk_size=32))
+    headers, body = upload.multipart()
+
+    async def run():
+        return b"".join([chunk async for chunk in body])
+
+    payload = asyncio.run(run())
+    assert int(headers["Content-Length"]) == len(payload)
+    assert PNG in payload and b'name="file"; filename="photo.png"' in payload
+
+
+def test_content_length_check():
+    assert not exceeds_upload_limit(None, 100)
+    assert not exceeds_upload_limit("abc", 100)
+    assert not exceeds_upload_limit(str(100 + MULTIPART_OVERHEAD), 100)
+    assert exceeds_upload_limit(str(101 + MULTIPART_OVERHEAD), 100)
+
+
+def test_upload_endpoint_sniffs_and_bounds_uploads(main_app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main_app.settings, "max_upload_bytes", 1024)
+    with TestClient(main_app.app) as client:
+        spoofed = client.post(
+            "/api/upload-temp-image", files={"file": ("photo.png", b"not an image at all", "image/png")}
+        )
+        oversized = client.post(
+            "/api/upload-temp-image", files={"file": ("photo.png", PNG * 10, "image/png")}
+        )
+
+    assert spoofed.status_code == 400 and spoofed.json()["error"] == "Invalid image format"
+    assert oversized.status_code == 413
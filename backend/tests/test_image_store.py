@@ -0,0 +1,167 @@
+"""Local image store: ranges, signed URLs, eviction and the agent fetching uploads."""
+import asyncio
+import io
+import json
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from PIL import Image
+
+from benchmarks.upload_stubs import AgentWebhookStub
+from services.image_store import ImageStore, parse_range
+
+
+def png_bytes(color=(200, 80, 40), size=(32, 24)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def put(store, data, content_type="image/png"):
+    async def chunks():
+        for i in range(0, len(data), 7):
+            yield data[i:i + 7]
+
+    return asyncio.run(store.put(chunks(), content_type))
+
+
+def url_parts(url):
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    return parts.path.rsplit("/", 1)[1], int(query["expires"][0]), query["sig"][0]
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=990-2000", (990, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    # Multi-range and malformed headers get the whole file
+    ("bytes=0-1,5-9", None),
+    ("bytes=-", None),
+    ("items=0-9", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=50-10", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    store = ImageStore(str(tmp_path), secret="s")
+    first = put(store, png_bytes())
+    assert put(store, png_bytes()) == first
+    assert put(store, png_bytes((0, 0, 255))) != first
+    assert len(list(tmp_path.glob("*/*"))) == 2
+    # No partial uploads left behind
+    assert not list(tmp_path.glob(".incoming-*"))
+
+
+def test_signed_urls_expire_and_reject_tampering(tmp_path):
+    store = ImageStore(str(tmp_path), secret="s")
+    name = put(store, png_bytes())
+    _, expires, sig = url_parts(store.signed_url("http://host", name))
+
+    assert store.verify(name, expires, sig)
+    assert not store.verify(name, expires + 1, sig)
+    assert not store.verify(name, expires, sig[:-1] + ("0" if sig[-1] != "0" else "1"))
+    assert not store.verify("0" * 64 + ".png", expires, sig)
+    assert not ImageStore(str(tmp_path), secret="other").verify(name, expires, sig)
+
+    _, expired, expired_sig = url_parts(store.signed_url("http://host", name, ttl=-1))
+    assert not store.verify(name, expired, expired_sig)
+
+
+def test_workers_share_the_generated_secret(tmp_path):
+    first, second = ImageStore(str(tmp_path)), ImageStore(str(tmp_path))
+    name = put(first, png_bytes())
+    assert second.verify(*url_parts(first.signed_url("http://host", name)))
+
+
+def test_eviction_by_age_and_size(tmp_path):
+    store = ImageStore(str(tmp_path), secret="s", max_age=3600, max_bytes=10 ** 9)
+    names = [put(store, png_bytes((i * 40, 0, 0))) for i in range(4)]
+    paths = [store.open(name)[0] for name in names]
+    now = time.time()
+    for age, path in zip((7200, 300, 200, 100), paths):
+        os.utime(path, (now - age, now - age))
+
+    assert store.evict() == 1
+    assert store.open(names[0]) is None
+
+    # Over the byte limit, the oldest remaining blobs go first
+    store.max_bytes = paths[3].stat().st_size
+    assert store.evict() == 2
+    assert [store.open(name) is not None for name in names] == [False, False, False, True]
+
+
+def test_get_image_checks_the_signature_first(main_app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main_app.settings, "public_base_url", "http://testserver")
+    with TestClient(main_app.app) as client:
+        store = main_app.image_store
+        data = png_bytes()
+        name = put(store, data)
+        _, expires, sig = url_parts(store.signed_url("http://testserver", name))
+        missing = "0" * 64 + ".png"
+
+        # Unsigned or badly signed requests get 403 whether or not the image exists
+        for image in (name, missing):
+            response = client.get(f"/api/images/{image}", params={"expires": expires, "sig": "bad"})
+            assert response.status_code == 403
+        _, missing_expires, missing_sig = url_parts(store.signed_url("http://testserver", missing))
+        assert client.get(
+            f"/api/images/{missing}", params={"expires": missing_expires, "sig": missing_sig}
+        ).status_code == 404
+
+        params = {"expires": expires, "sig": sig}
+        full = client.get(f"/api/images/{name}", params=params)
+        assert full.status_code == 200 and full.content == data
+        assert full.headers["content-type"] == "image/png"
+
+        partial = client.get(f"/api/images/{name}", params=params, headers={"Range": "bytes=-10"})
+        assert partial.status_code == 206 and partial.content == data[-10:]
+        assert partial.headers["content-range"] == f"bytes {len(data) - 10}-{len(data) - 1}/{len(data)}"
+
+        unsatisfiable = client.get(f"/api/images/{name}", params=params, headers={"Range": f"bytes={len(data)}-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == f"bytes */{len(data)}"
+
+
+class FetchingAgent(AgentWebhookStub):
+    """An agent that downloads the image it is sent, as the real one does."""
+
+    def __init__(self, client, **kwargs):
+        super().__init__(latency=0, **kwargs)
+        self.client = client
+        self.fetched = []
+
+    def respond(self, body, content_type):
+        image = self.client.get(json.loads(body)["image_url"])
+        self.fetched.append((image.status_code, image.content))
+        return super().respond(body, content_type)
+
+
+def test_agent_fetches_uploads_from_this_host(main_app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main_app.settings, "public_base_url", "http://testserver")
+    with TestClient(main_app.app) as client, FetchingAgent(client) as agent:
+        monkeypatch.setattr(main_app.settings, "external_agent_url", agent.url)
+        data = png_bytes()
+        response = client.post(
+            "/api/upload-temp-image", files={"file": ("photo.png", data, "image/png")}
+        )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["strategies"]["instagram"]["hashtags"]
+    assert agent.fetched == [(200, data)]
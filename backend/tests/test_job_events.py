@@ -0,0 +1,107 @@
+"""Job event streams: each event once, resumable, with heartbeats."""
+import asyncio
+import json
+from functools import partial
+
+from models.job import JobRequest, JobStatus
+from services.job_manager import JobManager
+
+
+def parse_sse(text):
+    """Split an event stream into (id, event, data) tuples and heartbeat comments."""
+    messages = []
+    for block in text.split("\n\n"):
+        if not block:
+            continue
+        if block.startswith(":"):
+            messages.append("heartbeat")
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        messages.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return messages
+
+
+async def run_job(manager, job_id, delay=0.0):
+    await asyncio.sleep(delay)
+    await manager.record_stage(job_id, "image_staged")
+    # Stages are recorded once however often they are reported
+    await manager.record_stage(job_id, "image_staged")
+    await manager.update_status(job_id, JobStatus.PROCESSING)
+    await manager.update_status(job_id, JobStatus.PROCESSING)
+    await asyncio.sleep(delay)
+    await manager.record_stage(job_id, "agent")
+    await manager.update_status(job_id, JobStatus.COMPLETED, results={"ok": True})
+
+
+def test_stream_resumes_after_last_event_id(main_client):
+    import main
+
+    job_id = main_client.portal.call(main.job_manager.create_job, JobRequest(text_prompt="Launch post"))
+    main_client.portal.call(run_job, main.job_manager, job_id)
+
+    url = f"/api/v1/jobs/{job_id}/events"
+    response = main_client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [(event_id, event) for event_id, event, _ in events] == [
+        (1, "status"), (2, "stage"), (3, "status"), (4, "stage"), (5, "status")
+    ]
+    assert events[-1][2]["status"] == "completed" and events[-1][2]["results"] == {"ok": True}
+
+    # A reconnecting client gets only what it missed
+    resumed = parse_sse(main_client.get(url, headers={"Last-Event-ID": "3"}).text)
+    assert [event_id for event_id, _, _ in resumed] == [4, 5]
+    by_query = parse_sse(main_client.get(url, params={"last_event_id": 4}).text)
+    assert [event_id for event_id, _, _ in by_query] == [5]
+
+    assert main_client.get("/api/v1/jobs/missing/events").status_code == 404
+
+
+def test_live_stream_sends_heartbeats_without_repeating_events(main_client, monkeypatch):
+    import main
+
+    manager = main.job_manager
+    monkeypatch.setattr(manager, "poll_interval", 0.01)
+    monkeypatch.setattr(manager, "events", partial(JobManager.events, manager, heartbeat=0.05))
+
+    job_id = main_client.portal.call(manager.create_job, JobRequest(text_prompt="Launch post"))
+    main_client.portal.start_task_soon(run_job, manager, job_id, 0.2)
+    url = f"/api/v1/jobs/{job_id}/events"
+    live = parse_sse(main_client.get(url).text)
+
+    assert "heartbeat" in live
+    ids = [message[0] for message in live if message != "heartbeat"]
+    assert ids == [1, 2, 3, 4, 5]
+
+    # Reconnecting after each event never replays one already seen
+    seen = []
+    last = 0
+    while True:
+        resumed = [m for m in parse_sse(main_client.get(url, headers={"Last-Event-ID": str(last)}).text)
+                   if m != "heartbeat"]
+        if not resumed:
+            break
+        last = resumed[0][0]
+        seen.append(last)
+    assert seen == ids
+
+
+def test_events_after_completion_end_the_stream():
+    async def run():
+        manager = JobManager(poll_interval=0.01)
+        job_id = await manager.create_job(JobRequest(text_prompt="Launch post"))
+        received = []
+
+        async def listen():
+            async for event in manager.events(job_id, heartbeat=0.02):
+                received.append(None if event is None else event["id"])
+
+        listener = asyncio.create_task(listen())
+        await run_job(manager, job_id, delay=0.05)
+        await asyncio.wait_for(listener, 1)
+        return received
+
+    received = asyncio.run(run())
+    assert None in received
+    assert [event_id for event_id in received if event_id is not None] == [1, 2, 3, 4, 5]
@@ -0,0 +1,142 @@
+"""Keyset pagination of job listings, in both stores and over the API."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.job import JobRequest, JobState, JobStatus
+from services.job_store import InMemoryJobStore, SQLiteJobStore, decode_cursor, encode_cursor
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_job(job_id, seconds, user_id="u1", status=JobStatus.PENDING):
+    at = START + timedelta(seconds=seconds)
+    return JobState(
+        job_id=job_id,
+        user_id=user_id,
+        status=status,
+        request=JobRequest(user_id=user_id, text_prompt="Launch post"),
+        created_at=at,
+        updated_at=at,
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = InMemoryJobStore() if request.param == "memory" else SQLiteJobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def page_through(store, limit, **filters):
+    async def run():
+        pages, cursor = [], None
+        while True:
+            jobs, cursor = await store.list(limit=limit, cursor=cursor, **filters)
+            pages.append([job["job_id"] for job in jobs])
+            if cursor is None:
+                return pages
+
+    return asyncio.run(run())
+
+
+def test_cursor_round_trips():
+    cursor = encode_cursor("created_at", 1767225600.5, "job-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "created_at") == (1767225600.5, "job-1")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor("created_at", 1.0, "a")[:-3], "W10"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, "created_at")
+
+
+def test_cursor_of_another_ordering_is_rejected():
+    with pytest.raises(ValueError, match="does not match"):
+        decode_cursor(encode_cursor("updated_at", 1.0, "a"), "created_at")
+
+
+def test_pages_cover_every_job_once_newest_first(store):
+    async def fill():
+        # Two jobs share a timestamp; the job ID breaks the tie
+        for i in range(7):
+            await store.create(make_job(f"job-{i}", i))
+        await store.create(make_job("job-3b", 3))
+
+    asyncio.run(fill())
+    pages = page_through(store, 3)
+    assert pages == [["job-6", "job-5", "job-4"], ["job-3b", "job-3", "job-2"], ["job-1", "job-0"]]
+
+
+def test_last_full_page_has_no_next_cursor(store):
+    async def run():
+        for i in range(4):
+            await store.create(make_job(f"job-{i}", i))
+        first, cursor = await store.list(limit=2)
+        second, last_cursor = await store.list(limit=2, cursor=cursor)
+        return cursor, [job["job_id"] for job in second], last_cursor
+
+    cursor, second, last_cursor = asyncio.run(run())
+    assert cursor is not None and second == ["job-1", "job-0"] and last_cursor is None
+
+
+def test_paging_is_stable_while_jobs_are_inserted(store):
+    async def run():
+        for i in range(6):
+            await store.create(make_job(f"job-{i}", i))
+        first, cursor = await store.list(limit=3)
+        # Newer jobs arrive between page requests
+        for i in range(6, 9):
+            await store.create(make_job(f"job-{i}", i))
+        second, cursor = await store.list(limit=3, cursor=cursor)
+        return [job["job_id"] for job in first + second], cursor
+
+    seen, cursor = asyncio.run(run())
+    assert seen == ["job-5", "job-4", "job-3", "job-2", "job-1", "job-0"]
+    assert cursor is None
+
+
+def test_status_listing_follows_updated_at(store):
+    async def run():
+        for i in range(4):
+            await store.create(make_job(f"job-{i}", i))
+        # The oldest job finished last
+        done = make_job("job-0", 0, status=JobStatus.COMPLETED)
+        done.updated_at = START + timedelta(seconds=10)
+        await store.save(done)
+        await store.save(make_job("job-2", 2, status=JobStatus.COMPLETED))
+        by_status, _ = await store.list(status=JobStatus.COMPLETED)
+        by_user, cursor = await store.list(user_id="u1", limit=1)
+        with pytest.raises(ValueError):
+            await store.list(status=JobStatus.COMPLETED, cursor=cursor)
+        return [job["job_id"] for job in by_status]
+
+    assert asyncio.run(run()) == ["job-0", "job-2"]
+
+
+def test_bad_cursor_is_rejected_by_both_stores(store):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        asyncio.run(store.list(cursor="garbage"))
+
+
+def test_list_endpoint_pages_and_validates(main_client):
+    import main
+
+    for i in range(3):
+        main_client.portal.call(main.job_manager.create_job, JobRequest(user_id="u1", text_prompt=f"Post {i}"))
+
+    first = main_client.get("/api/v1/jobs", params={"user_id": "u1", "limit": 2, "fields": "job_id,status"})
+    assert first.status_code == 200
+    body = first.json()
+    assert body["count"] == 2 and set(body["jobs"][0]) == {"job_id", "status"}
+
+    rest = main_client.get("/api/v1/jobs", params={"user_id": "u1", "limit": 2, "cursor": body["next_cursor"]})
+    assert rest.json()["count"] == 1 and rest.json()["next_cursor"] is None
+
+    assert main_client.get("/api/v1/jobs", params={"cursor": "garbage"}).status_code == 400
+    unknown = main_client.get("/api/v1/jobs", params={"fields": "job_id,results"})
+    assert unknown.status_code == 400 and "results" in unknown.json()["detail"]
+    for limit in (0, 1001):
+        assert main_client.get("/api/v1/jobs", params={"limit": limit}).status_code == 422
@@ -0,0 +1,53 @@
+"""Metric rendering and merging across worker processes."""
+import json
+import os
+
+import pytest
+
+from services.metrics import Counter, Gauge, Histogram, Metric, MetricsRegistry
+
+
+def test_metric_requires_samples_dump_and_merge():
+    with pytest.raises(TypeError):
+        Metric("orca_base", "Base")
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("orca_latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="agent")
+    histogram.observe(0.5, stage="agent")
+    histogram.observe(5.0, stage="agent")
+
+    lines = histogram.render()
+    assert 'orca_latency_seconds_bucket{stage="agent",le="0.1"} 1' in lines
+    assert 'orca_latency_seconds_bucket{stage="agent",le="1"} 2' in lines
+    assert 'orca_latency_seconds_bucket{stage="agent",le="+Inf"} 3' in lines
+    assert 'orca_latency_seconds_count{stage="agent"} 3' in lines
+
+
+def test_merge_adds_dumped_values():
+    counter = Counter("orca_requests_total", "Requests", ["status"])
+    counter.inc(status="200")
+    other = counter.blank()
+    other.inc(2, status="200")
+    other.inc(status="500")
+
+    counter.merge(other.dump())
+    assert counter.dump() == [[["200"], 3.0], [["500"], 1.0]]
+
+
+def test_registry_drops_gauges_of_exited_workers(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    requests = registry.register(Counter("orca_requests_total", "Requests"))
+    in_flight = registry.register(Gauge("orca_in_flight", "In flight"))
+    requests.inc()
+    in_flight.set(1)
+
+    # A worker that has exited; no process has this pid
+    dead_pid = 2 ** 22 + 1
+    with open(os.path.join(tmp_path, f"metrics-{dead_pid}.json"), "w") as f:
+        json.dump({"orca_requests_total": [[[], 4.0]], "orca_in_flight": [[[], 3.0]]}, f)
+
+    text = registry.render()
+    assert "orca_requests_total 5" in text
+    assert "orca_in_flight 1" in text
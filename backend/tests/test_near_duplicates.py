@@ -0,0 +1,170 @@
+"""BK-tree lookup, fingerprint matching and the shared index file."""
+import asyncio
+import io
+import json
+import random
+
+from PIL import Image, ImageDraw
+
+from services.image_ingest import ImageFile
+from services.near_duplicates import (
+    BKTree, Fingerprint, NearDuplicateIndex, fingerprint, hamming, perceptual_hash
+)
+
+
+def png(image: Image.Image) -> io.BytesIO:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def gradient(size=(64, 48), color=(200, 80, 40)) -> Image.Image:
+    image = Image.new("RGB", size, color)
+    draw = ImageDraw.Draw(image)
+    for x in range(0, size[0], 8):
+        draw.rectangle([x, 0, x + 3, size[1]], fill=(x * 3 % 256, 120, 60))
+    return image
+
+
+def test_bk_tree_search_matches_brute_force():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, i)
+    assert tree.size == len(values)
+
+    for query in values[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        # Flip a few bits so there are matches at non-zero distances
+        query ^= rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64)
+        expected = sorted((hamming(query, v), i) for i, v in enumerate(values) if hamming(query, v) <= 12)
+        assert sorted(tree.search(query, 12)) == expected
+
+
+def test_bk_tree_keeps_items_with_equal_hashes():
+    tree = BKTree()
+    tree.add(0b1010, "a")
+    tree.add(0b1010, "b")
+    tree.add(0b1011, "c")
+    assert sorted(tree.search(0b1010, 0)) == [(0, "a"), (0, "b")]
+    assert sorted(tree.search(0b1010, 1)) == [(0, "a"), (0, "b"), (1, "c")]
+    assert sorted(item for _, item in tree.items()) == ["a", "b", "c"]
+    assert BKTree().search(0, 64) == []
+
+
+def test_fingerprint_survives_recompression():
+    image = gradient()
+    original = fingerprint(png(image))
+
+    buffer = io.BytesIO()
+    image.resize((128, 96)).save(buffer, format="JPEG", quality=70)
+    buffer.seek(0)
+    copy = fingerprint(buffer)
+
+    assert hamming(original.hash, copy.hash) <= 6
+    assert NearDuplicateIndex().similar(original, copy.colors, copy.aspect)
+
+
+def test_solid_colours_do_not_match():
+    red = fingerprint(png(Image.new("RGB", (32, 32), (255, 0, 0))))
+    blue = fingerprint(png(Image.new("RGB", (32, 32), (0, 0, 255))))
+    # The gradient hash of any flat image is 0
+    assert red.hash == blue.hash == 0
+
+    async def run():
+        index = NearDuplicateIndex()
+        await index.add(red, "red", "agent")
+        return await index.find(blue, "agent"), await index.find(red, "agent")
+
+    assert asyncio.run(run()) == (None, ("red", 0))
+
+
+def test_different_aspect_ratios_do_not_match():
+    index = NearDuplicateIndex()
+    square = Fingerprint(0, [10] * 12, 1.0)
+    wide = Fingerprint(0, [10] * 12, 2.0)
+    assert not index.similar(square, wide.colors, wide.aspect)
+    assert index.similar(square, square.colors, 1.05)
+
+
+def test_perceptual_hash_reads_the_file(tmp_path):
+    path = tmp_path / "image.png"
+    gradient().save(path)
+
+    result = asyncio.run(perceptual_hash(ImageFile(str(path), "image.png", "image/png")))
+    with open(path, "rb") as f:
+        assert result.hash == fingerprint(f).hash
+    assert result.aspect == 64 / 48
+
+
+def test_lookups_are_scoped():
+    async def run():
+        index = NearDuplicateIndex()
+        value = Fingerprint(0xFF, [0] * 12, 1.0)
+        await index.add(value, "key", "agent-a")
+        return await index.find(value, "agent-b")
+
+    assert asyncio.run(run()) is None
+
+
+def test_workers_share_the_index_file(tmp_path):
+    path = str(tmp_path / "index.jsonl")
+    value = Fingerprint(0xF0F0, [50] * 12, 1.5)
+
+    async def run():
+        first = NearDuplicateIndex(path=path)
+        second = NearDuplicateIndex(path=path)
+        await first.add(value, "key", "agent")
+        return await second.find(Fingerprint(0xF0F1, [55] * 12, 1.5), "agent")
+
+    assert asyncio.run(run()) == ("key", 1)
+
+
+def test_eviction_keeps_live_entries_from_other_workers(tmp_path):
+    path = tmp_path / "index.jsonl"
+    # An expired entry and one without colours, from before they were recorded
+    path.write_text(
+        json.dumps({"scope": "agent", "hash": "00ff", "colors": [0] * 12, "aspect": 1.0,
+                    "key": "old", "added_at": 0}) + "\n"
+        + json.dumps({"scope": "agent", "hash": "00ff", "key": "legacy", "added_at": 2e9}) + "\n"
+    )
+
+    async def run():
+        first = NearDuplicateIndex(path=str(path), ttl=3600)
+        second = NearDuplicateIndex(path=str(path), ttl=3600)
+        await first.refresh()
+        await second.add(Fingerprint(0xFF, [0] * 12, 1.0), "new", "agent")
+        removed = await first.evict()
+        return removed, await first.find(Fingerprint(0xFF, [0] * 12, 1.0), "agent")
+
+    assert asyncio.run(run()) == (2, ("new", 0))
+    assert [json.loads(line)["key"] for line in path.read_text().splitlines()] == ["new"]
+    # Only the index and its lock file; no temporary files left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index.jsonl", "index.jsonl.lock"]
+
+
+def test_lookups_reread_the_index_only_when_it_changed(tmp_path):
+    path = str(tmp_path / "index.jsonl")
+    value = Fingerprint(0xF0F0, [50] * 12, 1.5)
+
+    async def run():
+        first = NearDuplicateIndex(path=path)
+        second = NearDuplicateIndex(path=path)
+        await first.add(value, "key", "agent")
+
+        reads = []
+        read_new_entries = second._read_new_entries
+        second._read_new_entries = lambda: reads.append(1) or read_new_entries()
+        for _ in range(5):
+            await second.find(value, "agent")
+        unchanged = len(reads)
+
+        await first.add(Fingerprint(0x0F0F, [90] * 12, 1.0), "other", "agent")
+        found = await second.find(Fingerprint(0x0F0F, [90] * 12, 1.0), "agent")
+        return unchanged, len(reads), found, second.stats()
+
+    unchanged, total, found, stats = asyncio.run(run())
+    assert (unchanged, total) == (1, 2)
+    assert found == ("other", 0)
+    assert stats["lookups"] == 6
@@ -0,0 +1,101 @@
+"""Step outcomes of posting flows, without a browser."""
+import asyncio
+import time
+
+import pytest
+
+from services.flow_tracing import FlowTrace
+from services.posting_flow import (
+    AnyOf, Condition, ConditionTimeout, ResponseCapture, ResponseCaptured, Step, run_flow
+)
+from services.text_input import TextInsertionError
+
+
+class Never(Condition):
+    async def wait(self, run, timeout):
+        raise ConditionTimeout(f"not met after {timeout:g} ms")
+
+
+async def noop(run):
+    pass
+
+
+def test_condition_requires_wait():
+    with pytest.raises(TypeError):
+        Condition()
+
+
+def test_action_errors_end_the_step_and_propagate():
+    async def insert(run):
+        raise TextInsertionError("text did not appear")
+
+    trace = FlowTrace("linkedin")
+    steps = [Step("open", noop), Step("type", insert), Step("post", noop)]
+    with pytest.raises(TextInsertionError):
+        asyncio.run(run_flow(None, "linkedin", steps, trace=trace))
+
+    assert [(span.name, span.outcome) for span in trace.spans] == [("open", "ok"), ("type", "failed")]
+    assert trace.spans[1].error == "TextInsertionError: text did not appear"
+
+
+def test_required_step_timeout_raises_its_error():
+    trace = FlowTrace("instagram")
+    steps = [Step("share", noop, ready=Never(), timeout=5, error="Share button not found")]
+    with pytest.raises(ValueError, match="Share button not found"):
+        asyncio.run(run_flow(None, "instagram", steps, trace=trace))
+    assert trace.spans[0].outcome == "failed"
+
+
+def test_optional_step_timeout_is_skipped():
+    trace = FlowTrace("instagram")
+    steps = [Step("dismiss", noop, ready=Never(), timeout=5, optional=True), Step("post", noop)]
+    run = asyncio.run(run_flow(None, "instagram", steps, trace=trace))
+    assert [span.outcome for span in trace.spans] == ["skipped", "ok"]
+    assert set(run.durations) == {"dismiss", "post"}
+
+
+class FakeResponse:
+    ok = True
+    url = "https://www.linkedin.com/voyager/api/contentcreation/normShares"
+    headers = {}
+
+    class request:
+        method = "POST"
+
+    async def text(self):
+        return '{"urn": "urn:li:share:1"}'
+
+
+class Slow(Condition):
+    async def wait(self, run, timeout):
+        await asyncio.sleep(timeout / 1000)
+        raise ConditionTimeout(f"not met after {timeout:g} ms")
+
+
+def test_captured_response_ends_a_wait_early():
+    capture = ResponseCapture("normShares", "POST")
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.02, capture._on_response, FakeResponse())
+        steps = [Step("feed_updated", ready=AnyOf(Slow(), ResponseCaptured(capture)), timeout=5000, optional=True)]
+        started = time.perf_counter()
+        await run_flow(None, "linkedin", steps, trace=FlowTrace("linkedin"))
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 1
+    assert capture.body == '{"urn": "urn:li:share:1"}'
+
+
+def test_step_is_skipped_once_the_response_was_captured():
+    capture = ResponseCapture("normShares", "POST")
+
+    async def run():
+        capture._on_response(FakeResponse())
+        await capture.wait(1000)
+        trace = FlowTrace("linkedin")
+        steps = [Step("feed_updated", ready=Slow(), timeout=5000, optional=True, until=ResponseCaptured(capture))]
+        await run_flow(None, "linkedin", steps, trace=trace)
+        return trace.spans[0]
+
+    span = asyncio.run(run())
+    assert span.attempts == 0 and span.outcome == "ok"
@@ -0,0 +1,240 @@
+"""Token buckets, rate limit parsing and the publish workers."""
+import asyncio
+import time
+
+import pytest
+
+from services.publish_queue import (
+    DEAD, PUBLISHED, QUEUED, PublishQueue, PublishWorkers, RateLimit, parse_rate_limits
+)
+
+
+@pytest.fixture
+def queue_factory(tmp_path):
+    queues = []
+
+    def make(**options):
+        queue = PublishQueue(str(tmp_path / "queue.db"), str(tmp_path / "media"), **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "media" / "image.png"
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b"image")
+    return str(path)
+
+
+def test_parse_rate_limits():
+    limits = parse_rate_limits(" instagram=50/86400:5, linkedin=10/3600 ,")
+    assert set(limits) == {"instagram", "linkedin"}
+    assert limits["instagram"].rate == pytest.approx(50 / 86400)
+    assert limits["instagram"].burst == 5
+    assert limits["linkedin"].burst == 1
+    assert parse_rate_limits("") == {}
+
+
+@pytest.mark.parametrize("spec", ["instagram", "instagram=5", "instagram=a/60", "instagram=5/60:x"])
+def test_parse_rate_limits_rejects_malformed(spec):
+    with pytest.raises(ValueError, match="Invalid rate limit"):
+        parse_rate_limits(spec)
+
+
+def test_rate_limit_refill_and_wait():
+    limit = RateLimit(1, 10, burst=3)
+    assert limit.refill(0.0, 100.0, 105.0) == pytest.approx(0.5)
+    # Never above the burst
+    assert limit.refill(2.5, 100.0, 200.0) == 3
+    assert limit.wait(0.5) == pytest.approx(5.0)
+    assert limit.wait(1.0) == 0.0
+
+
+def test_claim_respects_platform_bucket(queue_factory, image):
+    queue = queue_factory(platform_limits=parse_rate_limits("instagram=1/3600:2"))
+
+    async def run():
+        for i in range(3):
+            await queue.enqueue("instagram", f"post {i}", image)
+        first, _ = await queue.claim()
+        second, _ = await queue.claim()
+        third, wait = await queue.claim()
+        return first, second, third, wait
+
+    first, second, third, wait = asyncio.run(run())
+    assert first and second and third is None
+    # One token refills in an hour
+    assert wait == pytest.approx(3600, rel=0.01)
+
+
+def test_claim_buckets_per_account_skip_blocked_jobs(queue_factory, image):
+    queue = queue_factory(account_limits=parse_rate_limits("linkedin=1/3600"))
+
+    async def run():
+        await queue.enqueue("linkedin", "a1", image, account="a")
+        await queue.enqueue("linkedin", "a2", image, account="a")
+        await queue.enqueue("linkedin", "b1", image, account="b")
+        claimed = []
+        while True:
+            job, _ = await queue.claim()
+            if job is None:
+                return claimed
+            claimed.append(job["text"])
+
+    # a2 waits for account a's bucket without holding back account b
+    assert asyncio.run(run()) == ["a1", "b1"]
+
+
+def test_buckets_are_shared_through_the_database(queue_factory, image):
+    limits = parse_rate_limits("instagram=1/3600")
+    first = queue_factory(platform_limits=limits)
+    second = queue_factory(platform_limits=limits)
+
+    async def run():
+        await first.enqueue("instagram", "one", image)
+        await first.enqueue("instagram", "two", image)
+        return (await first.claim())[0], (await second.claim())[0]
+
+    claimed, blocked = asyncio.run(run())
+    assert claimed is not None and blocked is None
+
+
+def test_immediate_posts_take_tokens_from_every_platform_or_none(queue_factory, image):
+    queue = queue_factory(platform_limits=parse_rate_limits("instagram=1/3600,linkedin=1/60:2"))
+
+    async def run():
+        first = await queue.take_tokens(["instagram", "linkedin"])
+        # Instagram's bucket is empty, so linkedin keeps its second token
+        second = await queue.take_tokens(["instagram", "linkedin"])
+        third = await queue.take_tokens(["linkedin"])
+        # Queued posts draw from the same buckets
+        await queue.enqueue("linkedin", "post", image)
+        job, wait = await queue.claim()
+        return first, second, third, job, wait
+
+    first, second, third, job, wait = asyncio.run(run())
+    assert first is None and third is None
+    assert second == pytest.approx(3600, rel=0.01)
+    assert job is None and wait == pytest.approx(60, rel=0.05)
+
+
+def test_expired_leases_count_as_failed_attempts(queue_factory, image):
+    queue = queue_factory(lease=0.05, max_attempts=2, base_delay=0.01, max_delay=0.01)
+
+    async def run():
+        publish_id = await queue.enqueue("instagram", "post", image)
+        first, _ = await queue.claim()
+        # The worker dies without completing or failing the post
+        await asyncio.sleep(0.1)
+        second, _ = await queue.claim()
+        retried = await queue.get(publish_id)
+        await asyncio.sleep(0.1)
+        third, _ = await queue.claim()
+        await asyncio.sleep(0.1)
+        fourth, _ = await queue.claim()
+        return first, second, retried, third, fourth, await queue.get(publish_id)
+
+    first, second, retried, third, fourth, dead = asyncio.run(run())
+    assert first["attempts"] == 0
+    # Backed off rather than handed straight to another worker
+    assert second is None and retried["status"] == QUEUED and retried["attempts"] == 1
+    assert third is not None and third["attempts"] == 1
+    assert fourth is None and dead["status"] == DEAD and dead["attempts"] == 2
+    assert dead["last_error"].startswith("Lease expired")
+
+
+def test_immediate_posts_take_tokens_per_account(queue_factory):
+    queue = queue_factory(account_limits=parse_rate_limits("linkedin=1/3600"))
+
+    async def run():
+        return [
+            await queue.take_tokens(["linkedin"], "a"),
+            await queue.take_tokens(["linkedin"], "a"),
+            await queue.take_tokens(["linkedin"], "b"),
+        ]
+
+    first, second, other = asyncio.run(run())
+    assert first is None and other is None
+    assert second == pytest.approx(3600, rel=0.01)
+
+
+def test_enqueue_rejects_invalid_account(queue_factory, image):
+    queue = queue_factory()
+    with pytest.raises(ValueError):
+        asyncio.run(queue.enqueue("instagram", "text", image, account="../other"))
+
+
+def test_workers_publish_as_the_queued_account(queue_factory, image):
+    queue = queue_factory()
+    calls = []
+
+    async def publish(platform, text, image_path, account):
+        calls.append((platform, account))
+        return f"https://example.com/{platform}/{account}"
+
+    async def run():
+        brand = await queue.enqueue("instagram", "text", image, account="brand")
+        default = await queue.enqueue("linkedin", "text", image)
+        workers = PublishWorkers(queue, publish, workers=1, poll_interval=0.05)
+        workers.start()
+        deadline = time.monotonic() + 5
+        while workers.published < 2 and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        await workers.close()
+        return await queue.get(brand), await queue.get(default)
+
+    brand, default = asyncio.run(run())
+    assert sorted(calls) == [("instagram", "brand"), ("linkedin", "default")]
+    assert brand["status"] == default["status"] == PUBLISHED
+    assert brand["post_url"] == "https://example.com/instagram/brand"
+
+
+def test_workers_time_out_slow_posts(queue_factory, image):
+    queue = queue_factory(max_attempts=1)
+
+    async def publish(platform, text, image_path, account):
+        await asyncio.sleep(10)
+
+    async def run():
+        publish_id = await queue.enqueue("instagram", "text", image)
+        workers = PublishWorkers(queue, publish, workers=1, poll_interval=0.05, timeout=0.1)
+        workers.start()
+        deadline = time.monotonic() + 5
+        while workers.failed < 1 and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        await workers.close()
+        return await queue.get(publish_id)
+
+    job = asyncio.run(run())
+    assert job["status"] == DEAD
+    assert job["last_error"] == "Timed out after 0.1s"
+
+
+def test_workers_timeout_must_be_shorter_than_the_lease(queue_factory):
+    queue = queue_factory(lease=60)
+
+    async def publish(platform, text, image_path, account):
+        return ""
+
+    with pytest.raises(ValueError):
+        PublishWorkers(queue, publish, timeout=60)
+    assert PublishWorkers(queue, publish, timeout=59).timeout == 59
+
+
+def test_failed_post_is_retried_later(queue_factory, image):
+    queue = queue_factory(base_delay=3600)
+
+    async def run():
+        await queue.enqueue("instagram", "text", image)
+        job, _ = await queue.claim()
+        status = await queue.fail(job["id"], "boom")
+        return status, await queue.claim()
+
+    status, (job, wait) = asyncio.run(run())
+    assert status == QUEUED
+    assert job is None and wait > 1000
@@ -0,0 +1,59 @@
+"""Platform selection of immediate posts."""
+import asyncio
+
+import pytest
+
+from services.publisher import Publisher
+
+RESULT = {
+    "data": {
+        "strategies": {
+            "instagram": {"content": "Insta", "hashtags": ["#a"]},
+            "linkedin": {"content": "Linked"},
+            "blog": {"content": "Blog"},
+        }
+    }
+}
+
+
+@pytest.fixture
+def publisher(tmp_path, monkeypatch):
+    publisher = Publisher(selector_cache=None, auth_dir=str(tmp_path))
+    published = []
+
+    async def publish_timed(platform, text, image_path, timeout, account=None):
+        published.append(platform)
+        return {"url": f"https://{platform}/post", "latency_ms": 1.0, "error": None}
+
+    monkeypatch.setattr(publisher, "_publish_timed", publish_timed)
+    publisher.published = published
+    return publisher
+
+
+def test_select_defaults_to_supported_strategies(publisher):
+    selected, skipped = publisher.select(RESULT)
+    assert selected == ["instagram", "linkedin"]
+    assert skipped == {}
+
+
+def test_select_reports_requested_platforms_that_cannot_be_published(publisher):
+    selected, skipped = publisher.select({"strategies": {"linkedin": {}}}, ["linkedin", "instagram", "blog"])
+    assert selected == ["linkedin"]
+    assert skipped["instagram"]["error"] == "No strategy for platform"
+    assert skipped["blog"]["error"] == "Unsupported platform"
+
+
+def test_explicit_empty_selection_publishes_nothing(publisher):
+    selected, skipped = publisher.select(RESULT, ["blog"])
+    assert selected == [] and list(skipped) == ["blog"]
+
+    outcomes = asyncio.run(publisher.publish_all(RESULT, "image.png", selected))
+    assert outcomes == {}
+    assert publisher.published == []
+
+
+def test_publish_all_publishes_selected_platforms(publisher):
+    outcomes = asyncio.run(publisher.publish_all(RESULT, "image.png", ["linkedin", "blog"]))
+    assert publisher.published == ["linkedin"]
+    assert outcomes["linkedin"]["url"] == "https://linkedin/post"
+    assert outcomes["blog"]["error"] == "Unsupported platform"
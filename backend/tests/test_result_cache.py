@@ -0,0 +1,105 @@
+"""Result cache tiers, expiry, bounds and the bypass flag."""
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from benchmarks.upload_stubs import AgentWebhookStub
+from services.result_cache import ResultCache
+
+
+def test_keys_depend_on_digest_and_parameters():
+    key = ResultCache.make_key("abc", agent_url="http://agent", normalization=None)
+    assert key == ResultCache.make_key("abc", normalization=None, agent_url="http://agent")
+    assert key != ResultCache.make_key("abd", agent_url="http://agent", normalization=None)
+    assert key != ResultCache.make_key("abc", agent_url="http://other", normalization=None)
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    async def run():
+        await ResultCache(str(tmp_path)).set("k1", {"strategies": {}})
+        restarted = ResultCache(str(tmp_path))
+        return await restarted.get("k1"), await restarted.get("k1"), await restarted.get("k2"), restarted.stats()
+
+    first, second, missing, stats = asyncio.run(run())
+    assert first == second == {"strategies": {}} and missing is None
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = ResultCache(str(tmp_path), ttl=60)
+
+    async def run():
+        await cache.set("k", 1)
+        now[0] += 59
+        fresh = await cache.get("k")
+        now[0] += 2
+        return fresh, await cache.get("k")
+
+    assert asyncio.run(run()) == (1, None)
+    # The expired entry was dropped from memory, and the sweep deletes its file
+    assert cache.stats()["memory_entries"] == 0
+    os.utime(cache._path("k"), (now[0] - 61, now[0] - 61))
+    assert cache.evict() == 1 and not list(tmp_path.glob("*/*.json"))
+
+
+def test_memory_tier_is_bounded_by_entry_count():
+    cache = ResultCache(max_entries=2)
+
+    async def run():
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")  # Now most recently used
+        await cache.set("c", 3)
+        return [await cache.get(key) for key in "abc"]
+
+    assert asyncio.run(run()) == [1, None, 3]
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_tier_is_bounded_by_size(tmp_path):
+    cache = ResultCache(str(tmp_path))
+
+    async def run():
+        for i, key in enumerate(("a", "b", "c")):
+            await cache.set(key, "x" * 100)
+            os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+
+    asyncio.run(run())
+    entry_size = cache._path("a").stat().st_size
+    cache.max_disk_bytes = entry_size * 2
+    assert cache.evict() == 1
+    assert [cache._path(key).exists() for key in "abc"] == [False, True, True]
+
+
+def test_failed_disk_write_leaves_no_temp_file(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    with pytest.raises(TypeError):
+        asyncio.run(cache.set("k", {"value": object()}))
+    assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+
+def test_repeat_uploads_are_served_from_the_cache_unless_bypassed(main_app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), (10, 120, 200)).save(buffer, format="PNG")
+    files = {"file": ("photo.png", buffer.getvalue(), "image/png")}
+
+    monkeypatch.setattr(main_app.settings, "public_base_url", "http://testserver")
+    with TestClient(main_app.app) as client, AgentWebhookStub(latency=0) as agent:
+        monkeypatch.setattr(main_app.settings, "external_agent_url", agent.url)
+        first = client.post("/api/upload-temp-image", files=files).json()
+        repeat = client.post("/api/upload-temp-image", files=files).json()
+        bypassed = client.post("/api/upload-temp-image", params={"bypass_cache": "true"}, files=files).json()
+        stats = client.get("/api/v1/cache/stats").json()
+
+    assert (first["cached"], repeat["cached"], bypassed["cached"]) == (False, True, False)
+    assert repeat["data"] == first["data"]
+    assert agent.requests == 2
+    assert stats["memory_hits"] == 1
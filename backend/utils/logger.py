@@ -0,0 +1,28 @@
+"""Logging setup for the Orca orchestrator."""
+import logging
+import sys
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# The orchestrator's own logger; services log under their module names
+logger = logging.getLogger("orca")
+
+
+def setup_logger(name: str = "orca", level: str = "INFO") -> logging.Logger:
+    """
+    Send log records to stderr at the given level.
+
+    The handler goes on the root logger so ``services.*`` module loggers are
+    configured too. Calling it again only changes the level.
+    """
+    root = logging.getLogger()
+    if not any(getattr(handler, "_orca", False) for handler in root.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler._orca = True
+        root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    named = logging.getLogger(name)
+    named.setLevel(level.upper())
+    return named
@@ -1 +1,15 @@
-cd backend && python -m uvicorn api.img_temp:app --host 0.0.0.0 --port $PORT
+#!/bin/sh
+# WORKERS (default 1) sets the number of uvicorn worker processes. With more
+# than one, the workers share the agent concurrency limit and metrics through
+# files under WORKER_STATE_DIR; jobs and caches are already shared on disk.
+cd backend
+WORKERS="${WORKERS:-1}"
+if [ "$WORKERS" -gt 1 ]; then
+  WORKER_STATE_DIR="${WORKER_STATE_DIR:-worker_state}"
+  export AGENT_SLOTS_PATH="${AGENT_SLOTS_PATH:-$WORKER_STATE_DIR/agent_slots.db}"
+  export METRICS_DIR="${METRICS_DIR:-$WORKER_STATE_DIR/metrics}"
+  mkdir -p "$(dirname "$AGENT_SLOTS_PATH")" "$METRICS_DIR"
+  # Metrics of a previous run would count toward this one
+  rm -f "$METRICS_DIR"/metrics-*.json
+fi
+exec python -m uvicorn api.img_temp:app --host 0.0.0.0 --port $PORT --workers "$WORKERS"